@@ -1,123 +1,205 @@
 from PyQt5.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QScrollArea, QCheckBox
+    QWidget, QVBoxLayout, QLabel, QPushButton, QListView
 )
-from PyQt5.QtCore import pyqtSignal
-from matplotlib.backends.backend_qt5agg import FigureCanvas
-from matplotlib.figure import Figure
-import numpy as np
-import mne
-from mne.preprocessing import ICA
+from PyQt5.QtCore import pyqtSignal, Qt, QThread, QTimer, QSize, QAbstractListModel, QModelIndex
+from PyQt5.QtGui import QImage, QPixmap
+
+from Backend.ica_backend import IcaComponentCache, score_ica_components, fit_or_update_ica_cancellable, save_ica_snapshot
+
+THUMBNAIL_SIZE = QSize(480, 120)
+
+class IcaFitWorker(QThread):
+    """Fits (or updates the stored) ICA and labels its components off the GUI thread so the widget opens immediately.
+
+    The fit runs in a separate process that requestInterruption cancels, the stored ICA is then left as it was.
+    """
+    icaFitted = pyqtSignal(object, dict, object)  # The ICA, the scores of score_ica_components and the update report
+    icaFailed = pyqtSignal(str)
+
+    def __init__(self, raw, n_components, ica_file=None, parent=None):
+        super().__init__(parent)
+        self.raw = raw
+        self.n_components = n_components
+        self.ica_file = ica_file
+
+    def run(self):
+        try:
+            result = fit_or_update_ica_cancellable(self.raw, self.n_components, self.ica_file, random_state=42,
+                                                   stop_requested=self.isInterruptionRequested)
+            if result is None:
+                return
+            ica, report = result
+            scores = score_ica_components(ica, self.raw)
+            if not self.isInterruptionRequested():
+                self.icaFitted.emit(ica, scores, report)
+        except Exception as e:
+            if not self.isInterruptionRequested():
+                self.icaFailed.emit(str(e))
+
+class IcaComponentModel(QAbstractListModel):
+    """List model of the ICA components with a checkbox (checked = excluded), the automatic label and a lazily
+    rendered thumbnail per row.
+
+    The view only asks for the decoration of the rows it paints. Rows without a thumbnail yet get a blank
+    placeholder and are rendered one per event loop pass, so scrolling stays responsive.
+    """
+
+    def __init__(self, cache, checked=None, labels=None, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.checked = list(checked) if checked is not None else [True] * cache.n_components
+        self.labels = labels
+        self.pending = []
+        self.placeholder = QPixmap(THUMBNAIL_SIZE)
+        self.placeholder.fill(Qt.white)
+        self.render_timer = QTimer(self)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.timeout.connect(self.render_next)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.cache.n_components
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role == Qt.DisplayRole:
+            return f"IC {row}" if self.labels is None else f"IC {row}: {self.labels[row]}"
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if self.checked[row] else Qt.Unchecked
+        if role == Qt.DecorationRole:
+            if self.cache.has_thumbnail(row, THUMBNAIL_SIZE.width(), THUMBNAIL_SIZE.height()):
+                return self.pixmap(row)
+            if row not in self.pending:
+                self.pending.append(row)
+                self.render_timer.start(0)
+            return self.placeholder
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.CheckStateRole or not index.isValid():
+            return False
+        self.checked[index.row()] = value == Qt.Checked
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        return True
+
+    def pixmap(self, row):
+        image = self.cache.thumbnail(row, THUMBNAIL_SIZE.width(), THUMBNAIL_SIZE.height())
+        height, width = image.shape[:2]
+        return QPixmap.fromImage(QImage(image.data, width, height, 4 * width, QImage.Format_RGBA8888).copy())
+
+    def render_next(self):
+        """Render the most recently requested thumbnail and schedule the next one."""
+        if not self.pending:
+            return
+        row = self.pending.pop()
+        self.cache.thumbnail(row, THUMBNAIL_SIZE.width(), THUMBNAIL_SIZE.height())
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+        if self.pending:
+            self.render_timer.start(0)
+
+    def checked_components(self):
+        return [i for i, checked in enumerate(self.checked) if checked]
 
 class IcaWidget(QWidget):
-    icaComponentsSelected = pyqtSignal(list)  # Signal emitting indices of selected components
+    icaComponentsSelected = pyqtSignal(list, str)  # Indices of the selected components and the snapshot file ('' if none)
 
-    def __init__(self, raw, num_channels, parent=None):
+    def __init__(self, raw, num_channels, parent=None, ica_file=None, snapshot_dir=None):
         super().__init__(parent)
         self.setWindowTitle("Perform Independent Component Analysis")
         self.setMinimumSize(1000, 700)
         self.raw = raw  # Store MNE Raw object
+        self.ica_file = ica_file  # Stored ICA that is updated instead of refitted, None to always fit
+        self.snapshot_dir = snapshot_dir  # Folder the accepted decomposition is saved to, None to not save it
         self.ica = None  # To store ICA object
-        self.component_checkboxes = []  # Store checkboxes for components
+        self.component_model = None  # List model of the components, created once ICA is fitted
+        self.scores = None  # Automatic artifact features and labels of the components
+        self.fit_worker = None
 
-        # Main layout with scroll area
         main_layout = QVBoxLayout()
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_widget = QWidget()
-        self.scroll_layout = QVBoxLayout(scroll_widget)
 
         # Metadata label
         self.metadata_label = QLabel("No ICA performed")
-        self.scroll_layout.addWidget(self.metadata_label)
+        main_layout.addWidget(self.metadata_label)
+
+        # Component list, only the rows scrolled into view are rendered
+        self.component_view = QListView()
+        self.component_view.setUniformItemSizes(True)
+        self.component_view.setIconSize(THUMBNAIL_SIZE)
+        self.component_view.setVerticalScrollMode(QListView.ScrollPerPixel)
+        main_layout.addWidget(self.component_view)
 
         # Save components button
         self.save_button = QPushButton("Save Selected Components")
         self.save_button.clicked.connect(self.save_selected_components)
-        self.scroll_layout.addWidget(self.save_button)
-
-        # Add stretch to push content to top
-        self.scroll_layout.addStretch()
+        main_layout.addWidget(self.save_button)
 
-        # Set up scroll area
-        scroll_area.setWidget(scroll_widget)
-        main_layout.addWidget(scroll_area)
         self.setLayout(main_layout)
 
         # Automatically run ICA and plot
         self.run_ica_and_plot(num_channels)
 
     def run_ica_and_plot(self, num_channels):
-        """Run ICA and display component plots with checkboxes on the left."""
+        """Fit ICA in the background and list the components once it is done."""
         if self.raw is None:
             self.metadata_label.setText("No EEG data loaded")
             return
 
-        try:
-            # Determine number of components
-            n_channels = len(self.raw.ch_names)
-            n_components = min(num_channels, n_channels if num_channels > 20 else num_channels)
-
-            # Run ICA
-            self.ica = ICA(n_components=n_components, random_state=42)
-            self.ica.fit(self.raw)
-            self.metadata_label.setText(f"ICA computed with {n_components} components")
-
-            # Clear previous plots and checkboxes
-            self.component_checkboxes.clear()
-
-            # Create a new figure for plots
-            self.figure = Figure()
-            self.canvas = FigureCanvas(self.figure)
-            self.canvas.setMinimumHeight(200 * n_components)  # Dynamic height
-            self.scroll_layout.insertWidget(0, self.canvas)  # Insert canvas at top
-
-            # Plot components
-            n_cols = 3  # Checkbox, time series, topography
-            n_rows = n_components
-            gs = self.figure.add_gridspec(n_rows, n_cols, width_ratios=[0.5, 3, 1])
-
-            for i in range(n_components):
-                # Create layout for checkbox and plots
-                component_layout = QHBoxLayout()
-                
-                # Checkbox on the left
-                checkbox = QCheckBox(f"IC {i}")
-                checkbox.setChecked(True)  # Default: all components selected
-                component_layout.addWidget(checkbox)
-                self.component_checkboxes.append(checkbox)
-
-                # Time series plot
-                ax_time = self.figure.add_subplot(gs[i, 1])
-                time = np.arange(min(1000, self.ica.n_samples_)) / self.raw.info['sfreq']  # Limit to 1000 samples
-                ax_time.plot(time, self.ica.get_components()[:, i][:len(time)])
-                ax_time.set_title(f"Component {i}")
-                ax_time.set_ylabel("Amplitude")
-                ax_time.grid(True)
-                if i == n_components - 1:
-                    ax_time.set_xlabel("Time (s)")
-
-                # Topography plot
-                ax_topo = self.figure.add_subplot(gs[i, 2])
-                mne.viz.plot_ica_components(self.ica, picks=[i], axes=ax_topo, show=False)
-                ax_topo.set_title("")
-
-                # Add stretch to component layout
-                component_layout.addStretch()
-                self.scroll_layout.insertLayout(self.scroll_layout.count() - 2, component_layout)  # Before save button and stretch
-
-            self.figure.tight_layout()
-            self.canvas.draw()
+        # Determine number of components
+        n_channels = len(self.raw.ch_names)
+        n_components = min(num_channels, n_channels if num_channels > 20 else num_channels)
 
+        self.metadata_label.setText(f"Computing ICA with {n_components} components...")
+        self.save_button.setEnabled(False)
+        self.fit_worker = IcaFitWorker(self.raw, n_components, self.ica_file, parent=self)
+        self.fit_worker.icaFitted.connect(self.on_ica_fitted)
+        self.fit_worker.icaFailed.connect(lambda error: self.metadata_label.setText(f"Error running ICA: {error}"))
+        self.fit_worker.start()
+
+    def on_ica_fitted(self, ica, scores, report):
+        """Show the components of the fitted ICA in the virtualized list, the likely artifacts preselected."""
+        try:
+            self.ica = ica
+            self.scores = scores
+            cache = IcaComponentCache(ica, self.raw)
+            checked = [i in scores["exclude"] for i in range(cache.n_components)]
+            self.component_model = IcaComponentModel(cache, checked, scores["labels"], parent=self)
+            self.component_view.setModel(self.component_model)
+            self.save_button.setEnabled(True)
+            if report is None:
+                computed = f"ICA computed with {cache.n_components} components"
+            else:
+                computed = (f"ICA updated from the stored decomposition in {report['n_iter']} iterations "
+                            f"({report['iterations_saved']} saved)")
+            self.metadata_label.setText(f"{computed}, {len(scores['exclude'])} likely artifacts preselected")
         except Exception as e:
             self.metadata_label.setText(f"Error running ICA: {str(e)}")
 
     def save_selected_components(self):
-        """Emit selected component indices."""
+        """Save the decomposition with its selected components as a snapshot and emit them."""
         if self.ica is None:
             self.metadata_label.setText("No ICA performed")
             return
 
-        selected_components = [i for i, checkbox in enumerate(self.component_checkboxes) if checkbox.isChecked()]
-        self.icaComponentsSelected.emit(selected_components)
+        selected_components = self.component_model.checked_components()
+        snapshot_file = ""
+        if self.snapshot_dir is not None:
+            try:
+                snapshot_file = save_ica_snapshot(self.ica, self.snapshot_dir, selected_components)
+            except Exception as e:
+                self.metadata_label.setText(f"Error saving ICA: {str(e)}")
+                return
+        self.icaComponentsSelected.emit(selected_components, snapshot_file)
         self.metadata_label.setText(f"Selected {len(selected_components)} components")
-        self.close()  # Close widget after saving
\ No newline at end of file
+        self.close()  # Close widget after saving
+
+    def closeEvent(self, event):
+        if self.fit_worker is not None and self.fit_worker.isRunning():
+            # Cancels the fit, so this only waits for the fit process to be terminated
+            self.fit_worker.requestInterruption()
+            self.fit_worker.wait()
+        super().closeEvent(event)
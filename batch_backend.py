@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from Backend.feature_backend import source_fingerprint
+from Backend.model_backend import ModelRegistry, model_slug
+from Backend.streaming_backend import InferenceService, log_variance
+
+"""
+Offline prediction over every recording of a project. Each .edf file is read chunk by chunk through
+the same streaming preprocessing and sliding windows as live inference, on a pool of worker processes.
+Predictions are written per file as columns under
+
+project
+|
+|-data--predictions--<model>_v<version>--<recording>_<path hash>.npz   (columns: sample, time, label)
+                                       |-manifest.jsonl
+
+Every finished file is appended to the manifest with the settings it was predicted with, so an interrupted
+run resumes with the files left and a run with other settings predicts every file again.
+"""
+
+def project_recordings(project_json_filepath):
+    """Helper function that lists the .edf files of a project.
+
+    Entries of project_files can be files or folders (e.g. data/input_data), relative paths are looked
+    up from the project folder.
+    """
+    with open(project_json_filepath, 'r') as f:
+        project_data = json.load(f)
+    project_dir = os.path.dirname(os.path.abspath(project_json_filepath))
+    recordings = []
+    for entry in project_data.get("project_files", []):
+        path = entry if os.path.exists(entry) else os.path.join(project_dir, entry)
+        if os.path.isdir(path):
+            recordings.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.lower().endswith('.edf'))
+        elif path.lower().endswith('.edf') and os.path.exists(path):
+            recordings.append(path)
+    return list(dict.fromkeys(os.path.abspath(path) for path in recordings))
+
+def prediction_filename(recording):
+    """Output file name of a recording, the hash of its full path keeps same-named files apart."""
+    path = os.path.abspath(recording)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}_{hashlib.sha1(path.encode()).hexdigest()[:8]}.npz"
+
+def _load_manifest(manifest_path):
+    done = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    done[record["file"]] = record
+    return done
+
+def _predict_file(filepath, output_path, models_dir, model_name, version, transformations, window, step, features,
+                  chunk_seconds):
+    """Worker task: predict every window of one recording and write the columns atomically."""
+    import mne
+    start = time.perf_counter()
+    try:
+        raw = mne.io.read_raw_edf(filepath, preload=False, verbose=False)
+        sfreq = raw.info['sfreq']
+        model, _ = ModelRegistry(models_dir, mmap_mode='r').load(model_name, version)
+        service = InferenceService(model, sfreq, raw.ch_names, transformations, window=window, step=step,
+                                   features=features, max_latency=float('inf'))
+        samples, labels = [], []
+        chunk = int(chunk_seconds * sfreq)
+        for first in range(0, raw.n_times, chunk):
+            for prediction in service.process_chunk(raw.get_data(start=first, stop=min(first + chunk, raw.n_times))):
+                samples.append(prediction["sample"])
+                labels.append(prediction["label"])
+        tmp_path = output_path + ".tmp.npz"
+        np.savez_compressed(tmp_path, sample=np.asarray(samples, dtype=np.int64),
+                            time=np.asarray(samples, dtype=np.float64) / service.sfreq, label=np.asarray(labels))
+        os.replace(tmp_path, output_path)
+        return {"file": filepath, "source": source_fingerprint(filepath), "output": output_path,
+                "n_windows": len(samples), "hours": raw.n_times / sfreq / 3600.0,
+                "seconds": time.perf_counter() - start, "error": None}
+    except Exception as e:
+        # The file itself may be the problem (e.g. deleted), failed files are never skipped so no fingerprint is needed
+        return {"file": filepath, "source": None, "output": None, "n_windows": 0,
+                "hours": 0.0, "seconds": time.perf_counter() - start, "error": str(e)}
+
+def batch_predict(project_json_filepath, model_name, version=None, window=1.0, step=0.1, features=log_variance,
+                  chunk_seconds=60.0, n_jobs=None, files=None, callback=None):
+    """Predict every sliding window of every recording of a project with a registered model.
+
+    Parameters:
+    project_json_filepath (str): Path to the project.json file.
+    model_name (str): Name of the model in the project's registry.
+    version (int or None): Model version, the latest when None.
+    window (float): Window length in seconds.
+    step (float): Time between windows in seconds.
+    features (callable): Top-level function mapping a window to the model's features (must be picklable).
+    chunk_seconds (float): Length of the chunks read from each file.
+    n_jobs (int or None): Number of worker processes.
+    files (list or None): Recordings to predict, defaults to project_recordings(project_json_filepath).
+    callback (function or None): Called with each file record as soon as it finishes.
+
+    Returns:
+    dict: "output_dir", "files" (records of this run), "skipped" (files already done), "hours",
+        "elapsed" (s) and "hours_per_minute" (hours of EEG predicted per minute of wall time).
+    """
+    with open(project_json_filepath, 'r') as f:
+        transformations = json.load(f).get("preprocessing_settings", [])
+    project_dir = os.path.dirname(os.path.abspath(project_json_filepath))
+    models_dir = os.path.join(project_dir, 'models')
+    entry = ModelRegistry(models_dir).entry(model_name, version)
+    output_dir = os.path.join(project_dir, 'data', 'predictions', f"{model_slug(model_name)}_v{entry['version']}")
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, "manifest.jsonl")
+    done = _load_manifest(manifest_path)
+    # Normalized through JSON so it compares equal to the settings read back from the manifest
+    settings = json.loads(json.dumps({"window": window, "step": step,
+                                      "features": f"{features.__module__}.{features.__qualname__}",
+                                      "preprocessing_settings": transformations}))
+
+    pending, skipped = [], []
+    for filepath in (map(os.path.abspath, files) if files is not None else project_recordings(project_json_filepath)):
+        record = done.get(filepath)
+        # A file is only skipped if neither it nor the settings changed since its predictions were written
+        if record and record["error"] is None and record.get("settings") == settings \
+                and record["source"] == source_fingerprint(filepath) and os.path.exists(record["output"]):
+            skipped.append(filepath)
+        else:
+            pending.append(filepath)
+
+    start = time.perf_counter()
+    records = []
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        futures = []
+        for filepath in pending:
+            output_path = os.path.join(output_dir, prediction_filename(filepath))
+            futures.append(executor.submit(_predict_file, filepath, output_path, models_dir, model_name, entry['version'],
+                                           transformations, window, step, features, chunk_seconds))
+        for future in as_completed(futures):
+            record = {**future.result(), "settings": settings}
+            with open(manifest_path, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+            records.append(record)
+            if callback is not None:
+                elapsed = time.perf_counter() - start
+                callback({**record, "done": len(records), "total": len(pending),
+                          "hours_per_minute": sum(r["hours"] for r in records) / max(elapsed / 60.0, 1e-9)})
+    elapsed = time.perf_counter() - start
+    hours = sum(record["hours"] for record in records)
+    return {"output_dir": output_dir, "files": records, "skipped": skipped, "hours": hours, "elapsed": elapsed,
+            "hours_per_minute": hours / (elapsed / 60.0) if elapsed > 0 else float('nan')}
+
+def load_predictions(output_dir, recording):
+    """Load the prediction columns of one recording as a dict of arrays."""
+    path = os.path.join(output_dir, prediction_filename(recording))
+    with np.load(path, allow_pickle=False) as columns:
+        return {name: columns[name] for name in columns.files}
@@ -0,0 +1,218 @@
+import numpy as np
+from scipy.special import logsumexp
+from sklearn.cluster import MiniBatchKMeans
+
+from Backend.feature_backend import iter_batches
+
+"""
+Out-of-core clustering for microstate and sleep-stage discovery. Both models read their data batch by
+batch (e.g. from a memory-mapped FeatureStore matrix) and can be updated with partial_fit when new
+recordings arrive, so memory use does not grow with the size of the dataset.
+"""
+
+def streaming_kmeans(X, n_clusters, init='k-means++', batch_size=10000, n_passes=3, random_state=None):
+    """Fit mini-batch K-means reading X one batch at a time.
+
+    Parameters:
+    X (array-like): Feature matrix of shape (n_samples, n_features), may be a memmap.
+    n_clusters (int): Number of clusters.
+    init (str): Initialization method ('k-means++', 'random'), applied to the first batch.
+    batch_size (int): Number of samples read per batch.
+    n_passes (int): Number of passes over the data (batches are visited in a new random order each pass,
+        the tail batch last so the initialization always sees a full batch).
+    random_state (int or None): Seed for initialization and batch order.
+
+    Returns:
+    MiniBatchKMeans: The trained model, can be updated further with partial_fit_batches.
+    """
+    model = MiniBatchKMeans(n_clusters=n_clusters, init=init, batch_size=batch_size, random_state=random_state)
+    rng = np.random.default_rng(random_state)
+    for _ in range(n_passes):
+        for batch in iter_batches(X, batch_size, shuffle=True, random_state=rng):
+            model.partial_fit(batch)
+    return model
+
+def partial_fit_batches(model, X, batch_size=10000):
+    """Update a streaming clustering model with new data (e.g. a newly recorded session) batch by batch.
+
+    Parameters:
+    model (MiniBatchKMeans or StreamingGaussianMixture): A model supporting partial_fit.
+    X (array-like): New feature matrix, may be a memmap.
+    batch_size (int): Number of samples read per batch.
+
+    Returns:
+    object: The updated model.
+    """
+    for batch in iter_batches(X, batch_size):
+        model.partial_fit(batch)
+    return model
+
+class StreamingGaussianMixture:
+    """Gaussian mixture model fitted by chunked EM.
+
+    Every EM iteration makes one pass over the data, accumulating the sufficient statistics
+    (soft counts, sums and sums of squares) batch by batch, so only one batch is ever in memory.
+    partial_fit adds the statistics of new data to the running totals and re-estimates the
+    parameters (incremental EM), without revisiting the data seen before.
+
+    Parameters:
+    n_components (int): Number of mixture components.
+    covariance_type (str): 'full', 'tied', 'diag' or 'spherical'.
+    reg_covar (float): Non-negative regularization added to the diagonal of the covariances.
+    max_iter (int): Maximum number of EM passes in fit.
+    tol (float): Convergence threshold on the change of the mean log-likelihood.
+    batch_size (int): Number of samples read per batch.
+    random_state (int or None): Seed for the K-means initialization.
+    """
+
+    def __init__(self, n_components=1, covariance_type='full', reg_covar=1e-6, max_iter=100, tol=1e-3,
+                 batch_size=10000, random_state=None):
+        if covariance_type not in ('full', 'tied', 'diag', 'spherical'):
+            raise ValueError(f"Unknown covariance type {covariance_type}")
+        self.n_components = n_components
+        self.covariance_type = covariance_type
+        self.reg_covar = reg_covar
+        self.max_iter = max_iter
+        self.tol = tol
+        self.batch_size = batch_size
+        self.random_state = random_state
+        self.stats_ = None
+
+    ### Sufficient statistics ###
+
+    def _empty_stats(self, n_features):
+        k = self.n_components
+        if self.covariance_type == 'full':
+            second = np.zeros((k, n_features, n_features))
+        elif self.covariance_type == 'tied':
+            second = np.zeros((n_features, n_features))
+        else:
+            second = np.zeros((k, n_features))
+        return {"n": 0.0, "nk": np.zeros(k), "sx": np.zeros((k, n_features)), "sxx": second}
+
+    def _accumulate(self, stats, X, resp):
+        stats["n"] += len(X)
+        stats["nk"] += resp.sum(axis=0)
+        stats["sx"] += resp.T @ X
+        if self.covariance_type == 'full':
+            for k in range(self.n_components):
+                stats["sxx"][k] += (X * resp[:, k:k + 1]).T @ X
+        elif self.covariance_type == 'tied':
+            stats["sxx"] += X.T @ X
+        else:
+            stats["sxx"] += resp.T @ (X ** 2)
+
+    def _m_step(self, stats):
+        nk = stats["nk"] + 10 * np.finfo(float).eps
+        self.weights_ = nk / nk.sum()
+        self.means_ = stats["sx"] / nk[:, None]
+        n_features = self.means_.shape[1]
+        if self.covariance_type == 'full':
+            outer = np.einsum('ki,kj->kij', self.means_, self.means_)
+            self.covariances_ = stats["sxx"] / nk[:, None, None] - outer + self.reg_covar * np.eye(n_features)
+        elif self.covariance_type == 'tied':
+            outer = (self.means_.T * nk) @ self.means_
+            self.covariances_ = (stats["sxx"] - outer) / nk.sum() + self.reg_covar * np.eye(n_features)
+        else:
+            variances = stats["sxx"] / nk[:, None] - self.means_ ** 2 + self.reg_covar
+            self.covariances_ = variances if self.covariance_type == 'diag' else variances.mean(axis=1)
+
+    ### E-step ###
+
+    def _estimate_weighted_log_prob(self, X):
+        n_features = X.shape[1]
+        const = n_features * np.log(2 * np.pi)
+        if self.covariance_type in ('full', 'tied'):
+            covariances = self.covariances_ if self.covariance_type == 'full' else [self.covariances_] * self.n_components
+            log_prob = np.empty((len(X), self.n_components))
+            for k, cov in enumerate(covariances):
+                chol = np.linalg.cholesky(cov)
+                solved = np.linalg.solve(chol, (X - self.means_[k]).T)
+                log_det = 2 * np.log(np.diag(chol)).sum()
+                log_prob[:, k] = -0.5 * (const + log_det + (solved ** 2).sum(axis=0))
+        else:
+            variances = self.covariances_ if self.covariance_type == 'diag' else np.repeat(
+                self.covariances_[:, None], n_features, axis=1)
+            precisions = 1.0 / variances
+            maha = ((X ** 2) @ precisions.T - 2 * X @ (self.means_ * precisions).T
+                    + (self.means_ ** 2 * precisions).sum(axis=1))
+            log_prob = -0.5 * (const + np.log(variances).sum(axis=1) + maha)
+        return log_prob + np.log(self.weights_)
+
+    def _e_step(self, X):
+        weighted = self._estimate_weighted_log_prob(X)
+        log_norm = logsumexp(weighted, axis=1)
+        return np.exp(weighted - log_norm[:, None]), log_norm
+
+    ### Public interface ###
+
+    def _initialize(self, X):
+        """Initialize the parameters from a streaming K-means pass (hard assignments)."""
+        kmeans = streaming_kmeans(X, self.n_components, batch_size=self.batch_size, n_passes=1,
+                                  random_state=self.random_state)
+        stats = self._empty_stats(X.shape[1])
+        for batch in iter_batches(X, self.batch_size):
+            resp = np.zeros((len(batch), self.n_components))
+            resp[np.arange(len(batch)), kmeans.predict(batch)] = 1.0
+            self._accumulate(stats, batch, resp)
+        self._m_step(stats)
+
+    def fit(self, X, y=None):
+        """Fit the mixture with chunked EM passes over X.
+
+        Parameters:
+        X (array-like): Feature matrix of shape (n_samples, n_features), may be a memmap.
+
+        Returns:
+        StreamingGaussianMixture: self.
+        """
+        self._initialize(X)
+        self.converged_ = False
+        self.lower_bound_ = -np.inf
+        for n_iter in range(1, self.max_iter + 1):
+            stats = self._empty_stats(X.shape[1])
+            total_log_likelihood = 0.0
+            for batch in iter_batches(X, self.batch_size):
+                resp, log_norm = self._e_step(batch)
+                self._accumulate(stats, batch, resp)
+                total_log_likelihood += log_norm.sum()
+            self._m_step(stats)
+            self.stats_ = stats
+            previous, self.lower_bound_ = self.lower_bound_, total_log_likelihood / len(X)
+            self.n_iter_ = n_iter
+            if abs(self.lower_bound_ - previous) < self.tol:
+                self.converged_ = True
+                break
+        return self
+
+    def partial_fit(self, X, y=None):
+        """Add a batch of new samples to the model (incremental EM step).
+
+        Parameters:
+        X (array-like): New samples of shape (n_samples, n_features).
+
+        Returns:
+        StreamingGaussianMixture: self.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if self.stats_ is None:
+            return self.fit(X)
+        resp, _ = self._e_step(X)
+        self._accumulate(self.stats_, X, resp)
+        self._m_step(self.stats_)
+        return self
+
+    def score_samples(self, X):
+        """Log-likelihood of every sample."""
+        return np.concatenate([logsumexp(self._estimate_weighted_log_prob(batch), axis=1)
+                               for batch in iter_batches(X, self.batch_size)])
+
+    def score(self, X, y=None):
+        """Mean log-likelihood of X, same as GaussianMixture.score."""
+        return float(self.score_samples(X).mean())
+
+    def predict_proba(self, X):
+        return np.concatenate([self._e_step(batch)[0] for batch in iter_batches(X, self.batch_size)])
+
+    def predict(self, X):
+        return self.predict_proba(X).argmax(axis=1)
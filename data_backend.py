@@ -12,6 +12,7 @@ project
 |
 |-data--input_data
 |     |-preprocessed_data
+|     |-features
 |-models
 |-visualizations
 |-project.json
@@ -0,0 +1,1549 @@
+import os
+import re
+import copy
+import json
+import time
+import io
+import shutil
+import hashlib
+import warnings
+import queue
+import socket
+import tempfile
+import threading
+import traceback
+import numpy as np
+import torch
+from torch import nn
+from numpy.lib.format import open_memmap
+from Backend.tfr_backend import spectrogram_input
+from Backend.model_backend import feature_hash
+
+"""
+Training engine for the models designed in DeepLearningConfigWidget. A config (as emitted by
+add_model or written by save_configuration) is compiled into a torch network and trained on CPU from
+epochs stored as float32 .npy files, which are read memory-mapped one batch at a time.
+
+Input shapes are channels-first, per epoch: (channels, time_steps) or (channels, freq, time).
+"""
+
+DEEP_LEARNING_MODELS = ("Multi-layer Perceptron", "Convolutional Neural Network", "Recurrent Neural Network",
+                        "LSTM Network")
+RECURRENT_MODELS = ("Recurrent Neural Network", "LSTM Network")
+
+ACTIVATIONS = {"relu": nn.ReLU, "sigmoid": nn.Sigmoid, "tanh": nn.Tanh, "linear": nn.Identity}
+
+### Configs ###
+
+def is_deep_learning_config(model_config):
+    """Returns True for configs coming from DeepLearningConfigWidget."""
+    return model_config.get("model") in DEEP_LEARNING_MODELS and (
+        "architecture" in model_config or "architecture" in model_config.get("params", {}))
+
+def normalize_config(model_config):
+    """Helper function that accepts both the add_model format {"model", "input_shape", "params": {..., "architecture"}}
+    and the save_configuration format {"model", "input_shape", "hyperparams", "architecture"}.
+
+    Returns:
+    dict: {"model", "input_shape", "hyperparams", "architecture"}.
+    """
+    if "params" in model_config:
+        hyperparams = {k: v for k, v in model_config["params"].items() if k != "architecture"}
+        architecture = model_config["params"].get("architecture", [])
+    else:
+        hyperparams = dict(model_config.get("hyperparams", {}))
+        architecture = model_config.get("architecture", [])
+    return {"model": model_config["model"], "input_shape": model_config.get("input_shape", ""),
+            "hyperparams": hyperparams, "architecture": architecture}
+
+def _shape_tokens(text):
+    return [token.strip() for token in re.split(r'[,x]', text.strip().strip('()[]')) if token.strip()]
+
+def parse_input_shape(text, sample_shape=None, placeholder=None):
+    """Resolve an input shape such as "(channels, 1000)" or "(channels, 128, 128)".
+
+    Named placeholders (channels, time_steps...) take the size of the data, numbers must match it.
+
+    Parameters:
+    text (str): Input shape from the dialog.
+    sample_shape (tuple or None): Shape of one epoch of the training data.
+    placeholder (int or None): Size assumed for placeholders when there is no data (e.g. for estimates).
+
+    Returns:
+    tuple: The shape as integers.
+
+    Raises:
+    ValueError: If the shape does not fit the data or a placeholder cannot be resolved.
+    """
+    tokens = _shape_tokens(text)
+    if not tokens:
+        if sample_shape is None:
+            raise ValueError("No input shape given")
+        return tuple(sample_shape)
+    if sample_shape is not None and len(tokens) != len(sample_shape):
+        raise ValueError(f"Input shape {text} has {len(tokens)} dimensions but the epochs have shape {tuple(sample_shape)}")
+    shape = []
+    for i, token in enumerate(tokens):
+        if token.isdigit():
+            size = int(token)
+            if sample_shape is not None and sample_shape[i] != size:
+                raise ValueError(f"Input shape {text} does not match the epochs of shape {tuple(sample_shape)}")
+        elif sample_shape is not None:
+            size = int(sample_shape[i])
+        elif placeholder is not None:
+            size = int(placeholder)
+        else:
+            raise ValueError(f"Cannot resolve '{token}' in {text} without data")
+        shape.append(size)
+    return tuple(shape)
+
+def input_sample_shape(model_config, sample_shape):
+    """Shape of one model input built from epochs of sample_shape.
+
+    An input shape with one dimension more than (channels, time) epochs, such as "(channels, 128, 128)", asks
+    for spectrograms of the epochs (see model_inputs). Sizes given as numbers are kept, placeholders default
+    to 128 frequencies and 128 time steps (at most the epoch length).
+
+    Parameters:
+    model_config (dict): Config in either DeepLearningConfigWidget format.
+    sample_shape (tuple or None): Shape of one epoch.
+
+    Returns:
+    tuple or None: The input shape, sample_shape itself when the epochs are used as they are.
+    """
+    tokens = _shape_tokens(normalize_config(model_config)["input_shape"])
+    if sample_shape is None or len(sample_shape) != 2 or len(tokens) != 3:
+        return None if sample_shape is None else tuple(sample_shape)
+    n_freqs = int(tokens[1]) if tokens[1].isdigit() else 128
+    n_times = int(tokens[2]) if tokens[2].isdigit() else min(128, int(sample_shape[1]))
+    return (int(sample_shape[0]), n_freqs, n_times)
+
+def model_inputs(model_config, X, sfreq=None, store=None, source=None):
+    """Inputs of a model for epochs of shape (n_epochs, channels, time): the epochs themselves, or their
+    log-power spectrograms (see tfr_backend.spectrogram_input) for a (channels, freq, time) input shape.
+
+    Parameters:
+    model_config (dict): Config in either DeepLearningConfigWidget format.
+    X (array-like): Epochs, or inputs already of the model's shape.
+    sfreq (float or None): Sampling frequency of the epochs, needed for spectrograms.
+    store (FeatureStore or None): Feature store the spectrograms are cached in.
+    source (object or None): Identity of the epochs for the cache, defaults to their content.
+
+    Returns:
+    array-like: X or the spectrograms of shape (n_epochs, channels, freq, time).
+
+    Raises:
+    ValueError: If spectrograms are needed without a sampling frequency.
+    """
+    sample_shape = input_sample_shape(model_config, X.shape[1:])
+    if sample_shape == tuple(X.shape[1:]):
+        return X
+    if sfreq is None:
+        raise ValueError("Spectrogram inputs need the sampling frequency of the epochs")
+    return spectrogram_input(X, sfreq, n_freqs=sample_shape[1], n_times_out=sample_shape[2], store=store, source=source)
+
+### Layers ###
+
+class AddPlane(nn.Module):
+    """(batch, channels, time) -> (batch, 1, channels, time), so 2D convolutions see the epoch as an image."""
+
+    def forward(self, x):
+        return x.unsqueeze(1)
+
+class ToSequence(nn.Module):
+    """(batch, channels, [freq,] time) -> (batch, time, features) for recurrent layers."""
+
+    def forward(self, x):
+        return x.flatten(1, -2).transpose(1, 2)
+
+class Recurrent(nn.Module):
+    """SimpleRNN, GRU or LSTM layer that returns the whole sequence or only its last step."""
+
+    def __init__(self, kind, input_size, units, activation='tanh', return_sequences=False):
+        super().__init__()
+        if kind == "SimpleRNN Layer":
+            if activation not in ('tanh', 'relu'):
+                raise ValueError(f"SimpleRNN supports tanh and relu activations, got {activation}")
+            self.rnn = nn.RNN(input_size, units, nonlinearity=activation, batch_first=True)
+        elif activation != 'tanh':
+            raise ValueError(f"{kind} only supports the tanh activation, got {activation}")
+        elif kind == "GRU Layer":
+            self.rnn = nn.GRU(input_size, units, batch_first=True)
+        else:
+            self.rnn = nn.LSTM(input_size, units, batch_first=True)
+        self.return_sequences = return_sequences
+
+    def forward(self, x):
+        out, _ = self.rnn(x)
+        return out if self.return_sequences else out[:, -1]
+
+class SelfAttention(nn.Module):
+    """Single-head self-attention over a sequence, projected to units features."""
+
+    def __init__(self, input_size, units):
+        super().__init__()
+        self.projection = nn.Linear(input_size, units)
+        self.attention = nn.MultiheadAttention(units, num_heads=1, batch_first=True)
+
+    def forward(self, x):
+        x = self.projection(x)
+        out, _ = self.attention(x, x, x, need_weights=False)
+        return out
+
+def _as_bool(value):
+    return value is True or str(value).lower() == 'true'
+
+def _output_shape(module, shape):
+    with torch.no_grad():
+        return tuple(module.eval()(torch.zeros((1,) + tuple(shape))).shape[1:])
+
+def _layer_modules(model_name, layer_type, params, shape):
+    """Torch modules implementing one architecture entry for an input of the given shape (without batch)."""
+    params = params or {}
+    activation = ACTIVATIONS.get(params.get("activation", "linear"), nn.Identity)
+    recurrent_model = model_name in RECURRENT_MODELS
+    modules = []
+    if layer_type == "Dense Layer":
+        # Recurrent models apply Dense to every time step of a sequence, the others flatten first
+        if len(shape) > 1 and not (recurrent_model and len(shape) == 2):
+            modules.append(nn.Flatten())
+            shape = (int(np.prod(shape)),)
+        modules += [nn.Linear(shape[-1], int(params.get("units", 64))), activation()]
+    elif layer_type == "Dropout Layer":
+        modules.append(nn.Dropout(float(params.get("rate", 0.2))))
+    elif layer_type == "Batch Normalization":
+        modules.append(nn.BatchNorm2d(shape[0]) if len(shape) == 3 else nn.BatchNorm1d(shape[0]))
+    elif layer_type == "LayerNormalization":
+        modules.append(nn.GroupNorm(1, shape[0]) if len(shape) == 3 else nn.LayerNorm(shape[-1]))
+    elif layer_type == "Flatten Layer":
+        modules.append(nn.Flatten())
+    elif layer_type in ("Conv2D Layer", "DepthwiseConv2D Layer"):
+        if len(shape) == 2:
+            modules.append(AddPlane())
+            shape = (1,) + tuple(shape)
+        # Like the pools, kernels are clipped to the (few) channel rows of an EEG epoch
+        kernel_size = tuple(min(int(params.get("kernel_size", 3)), size) for size in shape[1:])
+        padding = 'same' if params.get("padding", "same") == "same" else 0
+        if layer_type == "Conv2D Layer":
+            conv = nn.Conv2d(shape[0], int(params.get("filters", 32)), kernel_size, padding=padding)
+        else:
+            conv = nn.Conv2d(shape[0], shape[0], kernel_size, padding=padding, groups=shape[0])
+        modules += [conv, activation()]
+    elif layer_type in ("MaxPooling2D Layer", "AveragePooling2D Layer"):
+        if len(shape) != 3:
+            raise ValueError(f"{layer_type} needs a (filters, height, width) input, got {shape}")
+        # Pools larger than a (short) spatial dimension are clipped to it
+        pool = tuple(min(int(params.get("pool_size", 2)), size) for size in shape[1:])
+        stride = tuple(min(int(params.get("strides", 2)), size) for size in shape[1:])
+        pool_class = nn.MaxPool2d if layer_type == "MaxPooling2D Layer" else nn.AvgPool2d
+        modules.append(pool_class(pool, stride))
+    elif layer_type in ("SimpleRNN Layer", "GRU Layer", "LSTM Layer"):
+        if len(shape) != 2:
+            raise ValueError(f"{layer_type} needs a sequence input, the previous layer returned {shape} "
+                             f"(set return_sequences=True on it)")
+        modules.append(Recurrent(layer_type, shape[-1], int(params.get("units", 50)),
+                                 params.get("activation", "tanh"), _as_bool(params.get("return_sequences", False))))
+    elif layer_type == "Attention Layer":
+        if len(shape) != 2:
+            raise ValueError(f"Attention Layer needs a sequence input, got {shape}")
+        modules.append(SelfAttention(shape[-1], int(params.get("units", 64))))
+    else:
+        raise ValueError(f"Unknown layer type {layer_type}")
+    return modules
+
+def build_network(model_config, sample_shape, n_classes):
+    """Compile a DeepLearningConfigWidget config into a torch network.
+
+    A recurrent model first turns the epoch into a sequence over time. A linear output layer with one
+    unit per class is appended (flattening first if needed), its softmax is part of the loss.
+
+    Parameters:
+    model_config (dict): Config in either DeepLearningConfigWidget format.
+    sample_shape (tuple): Shape of one epoch.
+    n_classes (int): Number of classes.
+
+    Returns:
+    tuple: (network, layers) where layers lists (layer_type, output_shape) for every compiled entry.
+
+    Raises:
+    ValueError: If the architecture cannot be built for this input shape.
+    """
+    config = normalize_config(model_config)
+    shape = parse_input_shape(config["input_shape"], sample_shape)
+    modules, layers = [], [("Input", shape)]
+    if config["model"] in RECURRENT_MODELS:
+        modules.append(ToSequence())
+        shape = _output_shape(modules[-1], shape)
+    for layer in config["architecture"]:
+        layer_modules = _layer_modules(config["model"], layer["layer_type"], layer.get("parameters"), shape)
+        modules += layer_modules
+        shape = _output_shape(nn.Sequential(*layer_modules), shape)
+        layers.append((layer["layer_type"], shape))
+    if len(shape) > 1:
+        modules.append(nn.Flatten())
+        shape = (int(np.prod(shape)),)
+    modules.append(nn.Linear(shape[0], n_classes))
+    layers.append(("Output", (n_classes,)))
+    return nn.Sequential(*modules), layers
+
+### Cost estimation ###
+
+def _layer_cost(model_name, layer_type, params, shape):
+    """Analytic counterpart of _layer_modules: output shape, parameters, forward FLOPs per sample and
+    the kind of operation ('dense', 'conv' or 'recurrent'), without allocating anything."""
+    params = params or {}
+    size = int(np.prod(shape))
+    if layer_type == "Dense Layer":
+        if len(shape) > 1 and not (model_name in RECURRENT_MODELS and len(shape) == 2):
+            shape = (size,)
+        units = int(params.get("units", 64))
+        positions = int(np.prod(shape[:-1]))
+        return shape[:-1] + (units,), shape[-1] * units + units, 2 * positions * shape[-1] * units, 'dense'
+    if layer_type in ("Dropout Layer", "Flatten Layer"):
+        return (shape if layer_type == "Dropout Layer" else (size,)), 0, 0, 'dense'
+    if layer_type in ("Batch Normalization", "LayerNormalization"):
+        features = shape[-1] if layer_type == "LayerNormalization" and len(shape) != 3 else shape[0]
+        return shape, 2 * features, 4 * size, 'dense'
+    if layer_type in ("Conv2D Layer", "DepthwiseConv2D Layer"):
+        if len(shape) == 2:
+            shape = (1,) + tuple(shape)
+        kernel = [min(int(params.get("kernel_size", 3)), dim) for dim in shape[1:]]
+        if params.get("padding", "same") == "same":
+            spatial = tuple(shape[1:])
+        else:
+            spatial = tuple(dim - k + 1 for dim, k in zip(shape[1:], kernel))
+        channels = shape[0]
+        if layer_type == "Conv2D Layer":
+            filters = int(params.get("filters", 32))
+            n_params = channels * filters * kernel[0] * kernel[1] + filters
+            flops = 2 * channels * kernel[0] * kernel[1] * filters * spatial[0] * spatial[1]
+        else:
+            filters = channels
+            n_params = channels * kernel[0] * kernel[1] + channels
+            flops = 2 * kernel[0] * kernel[1] * channels * spatial[0] * spatial[1]
+        return (filters,) + spatial, n_params, flops, 'conv'
+    if layer_type in ("MaxPooling2D Layer", "AveragePooling2D Layer"):
+        if len(shape) != 3:
+            raise ValueError(f"{layer_type} needs a (filters, height, width) input, got {shape}")
+        pool = [min(int(params.get("pool_size", 2)), dim) for dim in shape[1:]]
+        stride = [min(int(params.get("strides", 2)), dim) for dim in shape[1:]]
+        spatial = tuple((dim - p) // s + 1 for dim, p, s in zip(shape[1:], pool, stride))
+        out_shape = (shape[0],) + spatial
+        return out_shape, 0, int(np.prod(out_shape)) * pool[0] * pool[1], 'conv'
+    if layer_type in ("SimpleRNN Layer", "GRU Layer", "LSTM Layer"):
+        if len(shape) != 2:
+            raise ValueError(f"{layer_type} needs a sequence input, the previous layer returned {shape} "
+                             f"(set return_sequences=True on it)")
+        steps, inputs = shape
+        units = int(params.get("units", 50))
+        gates = {"SimpleRNN Layer": 1, "GRU Layer": 3, "LSTM Layer": 4}[layer_type]
+        out_shape = (steps, units) if _as_bool(params.get("return_sequences", False)) else (units,)
+        return out_shape, gates * (units * (inputs + units) + 2 * units), 2 * gates * units * (inputs + units) * steps, \
+            'recurrent'
+    if layer_type == "Attention Layer":
+        if len(shape) != 2:
+            raise ValueError(f"Attention Layer needs a sequence input, got {shape}")
+        steps, inputs = shape
+        units = int(params.get("units", 64))
+        n_params = inputs * units + units + 4 * units * units + 4 * units
+        flops = 2 * steps * units * (inputs + 4 * units) + 4 * steps * steps * units
+        return (steps, units), n_params, flops, 'dense'
+    raise ValueError(f"Unknown layer type {layer_type}")
+
+def estimate_cost(model_config, sample_shape=None, n_classes=2, batch_size=None, channels=64):
+    """Estimate the size and cost of a configured network before building it.
+
+    Follows the same shape rules as build_network, but analytically, so even a network too large for
+    memory can be estimated.
+
+    Parameters:
+    model_config (dict): Config in either DeepLearningConfigWidget format.
+    sample_shape (tuple or None): Shape of one epoch, when training data is loaded.
+    n_classes (int): Number of classes of the output layer.
+    batch_size (int or None): Defaults to the config's batch_size.
+    channels (int): Size assumed for placeholders such as "channels" when there is no data.
+
+    Returns:
+    dict: "layers" (layer_type, output_shape, params, flops per entry), "params", "flops" (forward FLOPs per
+        sample), "flops_by_kind", "activations" (values per sample), "recurrent_steps" (sequential time steps),
+        "activation_bytes" (activations kept for the backward pass of one batch), "param_bytes" (weights,
+        gradients and optimizer state) and "memory_bytes" (their sum).
+
+    Raises:
+    ValueError: If the architecture cannot be built for this input shape.
+    """
+    config = normalize_config(model_config)
+    batch_size = batch_size or int(config["hyperparams"].get("batch_size", 32))
+    shape = parse_input_shape(config["input_shape"], input_sample_shape(config, sample_shape), placeholder=channels)
+    layers = [{"layer_type": "Input", "output_shape": shape, "params": 0, "flops": 0}]
+    flops_by_kind = {"dense": 0, "conv": 0, "recurrent": 0}
+    activations = int(np.prod(shape))
+    recurrent_steps = 0
+
+    if config["model"] in RECURRENT_MODELS:
+        shape = (shape[-1], int(np.prod(shape[:-1])))
+    entries = [(layer["layer_type"], layer.get("parameters")) for layer in config["architecture"]]
+    for layer_type, params in entries + [("Output", None)]:
+        if layer_type == "Output":
+            shape = (int(np.prod(shape)),)
+            shape, n_params, flops, kind = (n_classes,), shape[0] * n_classes + n_classes, 2 * shape[0] * n_classes, 'dense'
+        else:
+            if layer_type in ("SimpleRNN Layer", "GRU Layer", "LSTM Layer") and len(shape) == 2:
+                recurrent_steps += shape[0]
+            if layer_type == "Attention Layer" and len(shape) == 2:
+                activations += shape[0] * shape[0]    #Attention weights between every pair of time steps
+            shape, n_params, flops, kind = _layer_cost(config["model"], layer_type, params, tuple(shape))
+        layers.append({"layer_type": layer_type, "output_shape": shape, "params": n_params, "flops": flops})
+        flops_by_kind[kind] += flops
+        activations += int(np.prod(shape))
+    n_params = sum(layer["params"] for layer in layers)
+    # Adam-like optimizers keep two extra values per weight, on top of the weight and its gradient
+    state = 2 if config["hyperparams"].get("optimizer", "Adam") != "SGD" else 1
+    param_bytes = 4 * n_params * (2 + state)
+    activation_bytes = 4 * activations * batch_size
+    return {"layers": layers, "params": n_params, "flops": sum(flops_by_kind.values()), "flops_by_kind": flops_by_kind,
+            "activations": activations, "recurrent_steps": recurrent_steps, "state_per_param": 2 + state,
+            "activation_bytes": activation_bytes, "param_bytes": param_bytes,
+            "memory_bytes": param_bytes + activation_bytes, "batch_size": batch_size}
+
+_CALIBRATION = {}
+
+def _time_training_step(module, inputs, repeats):
+    module(inputs).sum().backward()    #Warm up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        module(inputs).sum().backward()
+    return (time.perf_counter() - start) / repeats
+
+def calibrate_throughput(n_threads=None, repeats=5):
+    """Microbenchmark of training steps (forward and backward) on this machine, measured once per thread
+    count and cached. Takes a fraction of a second.
+
+    Returns:
+    dict: Achieved FLOP/s of "dense", "conv" and "recurrent" layers, "elements" (values per second through
+        elementwise layers), "call_overhead" (seconds per layer call) and "step_overhead" (seconds per
+        recurrent time step).
+    """
+    n_threads = n_threads or os.cpu_count()
+    if n_threads in _CALIBRATION:
+        return _CALIBRATION[n_threads]
+    previous_threads = torch.get_num_threads()
+    torch.set_num_threads(n_threads)
+    try:
+        # Training costs about 3x the forward FLOPs (forward, gradient of the inputs and of the weights)
+        rates = {
+            "dense": 3 * 2 * 64 * 512 * 512 / _time_training_step(nn.Linear(512, 512), torch.randn(64, 512), repeats),
+            "conv": 3 * 2 * 16 * 8 * 9 * 8 * 16 * 128 / _time_training_step(
+                nn.Conv2d(8, 8, 3, padding='same'), torch.randn(16, 8, 16, 128), repeats),
+            "elements": 2 ** 20 / _time_training_step(nn.ReLU(), torch.randn(2 ** 20, requires_grad=True), repeats),
+            "call_overhead": _time_training_step(nn.Linear(2, 2), torch.randn(1, 2), 10 * repeats),
+        }
+        # Recurrent layers run step by step: a fixed cost per time step plus their FLOPs, fitted from a
+        # small and a large layer over the same 100 steps
+        small, large = (_time_training_step(Recurrent("LSTM Layer", units, units), torch.randn(32, 100, units), repeats)
+                        for units in (8, 128))
+        flops_small, flops_large = (3 * 2 * 4 * units * 2 * units * 100 * 32 for units in (8, 128))
+        rates["recurrent"] = (flops_large - flops_small) / max(large - small, 1e-9)
+        rates["step_overhead"] = max(small - flops_small / rates["recurrent"], 0.0) / 100
+    finally:
+        torch.set_num_threads(previous_threads)
+    _CALIBRATION[n_threads] = rates
+    return rates
+
+def estimate_epoch_time(cost, n_samples, n_threads=None):
+    """Projected time of one training pass over n_samples epochs in seconds, from estimate_cost and the
+    calibrated throughput (validation not included).
+
+    Per batch, every layer call and recurrent time step costs a fixed overhead and the optimizer updates
+    every weight; per sample, the FLOPs run at the calibrated rate of their kind of layer and the
+    activations at the elementwise rate.
+    """
+    rates = calibrate_throughput(n_threads)
+    n_batches = int(np.ceil(n_samples / cost["batch_size"]))
+    per_batch = (2 * len(cost["layers"]) * rates["call_overhead"] + cost["recurrent_steps"] * rates["step_overhead"]
+                 + cost["params"] * cost["state_per_param"] / rates["elements"])
+    per_sample = sum(3 * flops / rates[kind] for kind, flops in cost["flops_by_kind"].items()) \
+        + 3 * cost["activations"] / rates["elements"]
+    return n_batches * per_batch + n_samples * per_sample
+
+### Optimizers ###
+
+class Lookahead(torch.optim.Optimizer):
+    """Lookahead wrapper: every k steps the slow weights move alpha of the way to the fast weights of the inner optimizer."""
+
+    def __init__(self, optimizer, k=5, alpha=0.5):
+        self.optimizer = optimizer
+        self.k = k
+        self.alpha = alpha
+        self.param_groups = optimizer.param_groups
+        self.defaults = optimizer.defaults
+        self.state = optimizer.state
+        self.step_count = 0
+        self.slow_weights = [[p.detach().clone() for p in group['params']] for group in self.param_groups]
+
+    def zero_grad(self, set_to_none=True):
+        self.optimizer.zero_grad(set_to_none=set_to_none)
+
+    def step(self, closure=None):
+        loss = self.optimizer.step(closure)
+        self.step_count += 1
+        if self.step_count % self.k == 0:
+            with torch.no_grad():
+                for group, slow_group in zip(self.param_groups, self.slow_weights):
+                    for fast, slow in zip(group['params'], slow_group):
+                        slow.add_(fast - slow, alpha=self.alpha)
+                        fast.copy_(slow)
+        return loss
+
+    def state_dict(self):
+        return {"optimizer": self.optimizer.state_dict(), "step_count": self.step_count, "slow_weights": self.slow_weights}
+
+    def load_state_dict(self, state_dict):
+        self.optimizer.load_state_dict(state_dict["optimizer"])
+        self.step_count = state_dict["step_count"]
+        with torch.no_grad():
+            for slow_group, saved_group in zip(self.slow_weights, state_dict["slow_weights"]):
+                for slow, saved in zip(slow_group, saved_group):
+                    slow.copy_(saved)
+
+def make_optimizer(network, hyperparams):
+    """Build the optimizer named by the "optimizer" hyperparameter."""
+    name = hyperparams.get("optimizer", "Adam")
+    lr = float(hyperparams.get("learning_rate", 1e-3))
+    weight_decay = float(hyperparams.get("weight_decay", 0.0))
+    parameters = network.parameters()
+    if name == "SGD":
+        return torch.optim.SGD(parameters, lr=lr, momentum=0.9, weight_decay=weight_decay)
+    if name == "RMSprop":
+        return torch.optim.RMSprop(parameters, lr=lr, weight_decay=weight_decay)
+    if name == "AdamW":
+        return torch.optim.AdamW(parameters, lr=lr, weight_decay=weight_decay)
+    if name == "Lookahead":
+        return Lookahead(torch.optim.Adam(parameters, lr=lr, weight_decay=weight_decay))
+    return torch.optim.Adam(parameters, lr=lr, weight_decay=weight_decay)
+
+### Epoch store ###
+
+class EpochStore:
+    """Epochs and labels stored as float32/int64 .npy files and opened memory-mapped.
+
+    Parameters:
+    directory (str): Folder holding X.npy and y.npy, e.g. created by EpochStore.create.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.X = np.load(os.path.join(directory, "X.npy"), mmap_mode='r')
+        self.y = np.load(os.path.join(directory, "y.npy"), mmap_mode='r')
+
+    @classmethod
+    def create(cls, directory, X, y, chunk_size=256):
+        """Write epochs (any array-like, e.g. a memmap) chunk by chunk as float32 and return the store."""
+        os.makedirs(directory, exist_ok=True)
+        out = open_memmap(os.path.join(directory, "X.tmp.npy"), mode='w+', dtype=np.float32, shape=X.shape)
+        for start in range(0, len(X), chunk_size):
+            out[start:start + chunk_size] = X[start:start + chunk_size]
+        out.flush()
+        del out
+        os.replace(os.path.join(directory, "X.tmp.npy"), os.path.join(directory, "X.npy"))
+        np.save(os.path.join(directory, "y.npy"), np.asarray(y))
+        return cls(directory)
+
+    def __len__(self):
+        return len(self.X)
+
+def iter_minibatches(X, y, indices, batch_size):
+    """Yield (inputs, targets) tensors for consecutive batches of indices.
+
+    Indices are sorted inside each batch so the rows are read from the memmap in file order.
+    """
+    for start in range(0, len(indices), batch_size):
+        batch = np.sort(indices[start:start + batch_size])
+        inputs = torch.from_numpy(np.ascontiguousarray(X[batch], dtype=np.float32))
+        targets = torch.from_numpy(np.asarray(y[batch], dtype=np.int64))
+        yield inputs, targets
+
+class PrefetchLoader:
+    """Multi-threaded loader that prepares batches ahead of the training step.
+
+    Worker threads gather the epochs of a batch from the (memory-mapped) dataset straight into one of a
+    fixed set of preallocated float32 buffers, augment them in place and hand them over through a bounded
+    queue, so reading and augmenting overlap with the model step (numpy and the memmap reads release the GIL).
+    A buffer is only refilled after the training loop moved on to the next batch, the yielded tensors
+    must therefore not be kept across iterations.
+
+    Augmentation is vectorized over the batch:
+    time_shift - circular shift of every epoch by up to +-time_shift samples.
+    noise_std - additive gaussian noise.
+    channel_dropout - probability of zeroing each channel of each epoch.
+
+    Parameters:
+    X (array-like): Epochs of shape (n_epochs, channels, ..., time), ideally an EpochStore memmap.
+    y (array-like): Integer class codes.
+    batch_size (int): Number of epochs per batch.
+    n_workers (int): Number of worker threads.
+    prefetch (int): Number of batches prepared ahead (size of the queue).
+    time_shift (int): Maximum shift in samples, 0 disables it.
+    noise_std (float): Standard deviation of the noise, 0 disables it.
+    channel_dropout (float): Channel dropout probability, 0 disables it.
+    random_state (int): Seed of the augmentation, batch b of pass e always gets the same augmentation.
+    """
+
+    def __init__(self, X, y, batch_size, n_workers=2, prefetch=4, time_shift=0, noise_std=0.0, channel_dropout=0.0,
+                 random_state=0):
+        self.X = X
+        self.y = np.asarray(y, dtype=np.int64)
+        self.batch_size = batch_size
+        self.n_workers = max(1, n_workers)
+        self.prefetch = max(1, prefetch)
+        self.time_shift = int(time_shift)
+        self.noise_std = float(noise_std)
+        self.channel_dropout = float(channel_dropout)
+        self.random_state = random_state
+        self.n_passes = 0
+        # One buffer per queued batch, per worker filling and for the batch held by the training loop
+        n_slots = self.prefetch + self.n_workers + 1
+        self._inputs = np.empty((n_slots, batch_size) + tuple(X.shape[1:]), dtype=np.float32)
+        self._targets = np.empty((n_slots, batch_size), dtype=np.int64)
+        self._noise = np.empty_like(self._inputs[0]) if self.noise_std > 0 else None
+        self._input_tensors = [torch.from_numpy(buffer) for buffer in self._inputs]
+        self._target_tensors = [torch.from_numpy(buffer) for buffer in self._targets]
+        self._noise_lock = threading.Lock()
+
+    @property
+    def augments(self):
+        return self.time_shift > 0 or self.noise_std > 0 or self.channel_dropout > 0
+
+    def _augment(self, inputs, rng):
+        n, time_steps = len(inputs), inputs.shape[-1]
+        if self.time_shift > 0:
+            shifts = rng.integers(-self.time_shift, self.time_shift + 1, n)
+            source = (np.arange(time_steps) - shifts[:, None]) % time_steps
+            flat = inputs.reshape(n, -1, time_steps)
+            flat[...] = np.take_along_axis(flat, source[:, None, :], axis=2)
+        if self.channel_dropout > 0:
+            keep = rng.random((n, inputs.shape[1])) >= self.channel_dropout
+            inputs *= keep.reshape(keep.shape + (1,) * (inputs.ndim - 2))
+        if self.noise_std > 0:
+            with self._noise_lock:
+                noise = self._noise[:n]
+                rng.standard_normal(out=noise, dtype=np.float32)
+                noise *= self.noise_std
+                inputs += noise
+
+    def _fill(self, slot, batch, augment, seed):
+        n = len(batch)
+        inputs = self._inputs[slot, :n]
+        if self.X.dtype == np.float32:
+            np.take(self.X, batch, axis=0, out=inputs)
+        else:
+            inputs[...] = self.X[batch]
+        np.take(self.y, batch, out=self._targets[slot, :n])
+        if augment:
+            self._augment(inputs, np.random.default_rng(seed))
+
+    def _work(self, tasks, free_slots, ready, stop):
+        while not stop.is_set():
+            # A buffer is taken before the task, so batches always get buffers in order and the batch
+            # the training loop waits for can never be starved by later ones
+            try:
+                slot = free_slots.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                number, batch = tasks.get_nowait()
+            except queue.Empty:
+                free_slots.put(slot)
+                return
+            try:
+                self._fill(slot, batch, self._augment_pass, (self.random_state, self._pass, number))
+                ready.put((number, slot, len(batch), None))
+            except Exception as e:
+                ready.put((number, slot, 0, e))
+
+    def batches(self, indices, augment=True, first_batch=0):
+        """Yield (inputs, targets) tensors for consecutive batches of indices, prepared in the background.
+
+        Indices are sorted inside each batch so the rows are read from the memmap in file order.
+
+        Parameters:
+        indices (np.ndarray): Epochs to go through, in batch order (e.g. a permutation).
+        augment (bool): Whether to augment, e.g. False for validation.
+        first_batch (int): Batch to start from, to resume a pass (set n_passes to the pass being resumed).
+        """
+        self._pass = self.n_passes
+        self._augment_pass = augment and self.augments
+        self.n_passes += 1
+        tasks = queue.Queue()
+        n_batches = int(np.ceil(len(indices) / self.batch_size))
+        for number in range(first_batch, n_batches):
+            start = number * self.batch_size
+            tasks.put((number, np.sort(indices[start:start + self.batch_size])))
+        free_slots = queue.Queue()
+        for slot in range(len(self._inputs)):
+            free_slots.put(slot)
+        ready = queue.Queue(maxsize=self.prefetch + self.n_workers)
+        stop = threading.Event()
+        workers = [threading.Thread(target=self._work, args=(tasks, free_slots, ready, stop), daemon=True)
+                   for _ in range(self.n_workers)]
+        for worker in workers:
+            worker.start()
+        finished, held = {}, None
+        try:
+            for number in range(first_batch, n_batches):
+                while number not in finished:
+                    done, slot, n, error = ready.get()
+                    finished[done] = (slot, n, error)
+                slot, n, error = finished.pop(number)
+                if held is not None:
+                    free_slots.put(held)
+                held = slot
+                if error is not None:
+                    raise error
+                yield self._input_tensors[slot][:n], self._target_tensors[slot][:n]
+        finally:
+            stop.set()
+            for worker in workers:
+                while worker.is_alive():
+                    try:
+                        ready.get_nowait()
+                    except queue.Empty:
+                        pass
+                    worker.join(timeout=0.01)
+
+def benchmark_loader(model_config, X, y, batch_size=None, n_workers=2, prefetch=4, n_batches=50, n_threads=None,
+                     **augmentation):
+    """Compare the throughput of the loader with the model step time of a config.
+
+    Three passes over the same n_batches batches are timed: the loader alone, the model step alone
+    (forward and backward on a fixed batch) and training with the loader, once synchronously and once
+    with prefetching. Training is input-bound when the loader alone is not much faster than the model step.
+
+    Parameters:
+    model_config (dict): Config in either DeepLearningConfigWidget format.
+    X (array-like): Epochs, ideally an EpochStore memmap.
+    y (array-like): Labels.
+    batch_size (int or None): Defaults to the config's batch_size.
+    n_workers (int): Loader threads.
+    prefetch (int): Batches prepared ahead.
+    n_batches (int): Number of batches timed.
+    n_threads (int or None): Intra-op threads used by torch.
+    **augmentation: time_shift, noise_std and channel_dropout of the loader.
+
+    Returns:
+    dict: Samples per second of "loader", "model_step", "synchronous" and "prefetched" training, and the
+        "speedup" of prefetched over synchronous training.
+    """
+    config = normalize_config(model_config)
+    batch_size = batch_size or int(config["hyperparams"].get("batch_size", 32))
+    torch.set_num_threads(n_threads or os.cpu_count())
+    classes, y_codes = np.unique(np.asarray(y), return_inverse=True)
+    network, _ = build_network(config, X.shape[1:], len(classes))
+    optimizer = make_optimizer(network, config["hyperparams"])
+    loss_function = nn.CrossEntropyLoss()
+    indices = np.random.default_rng(0).permutation(len(X))
+    indices = np.resize(indices, n_batches * batch_size)
+    n_samples = len(indices)
+
+    def step(inputs, targets):
+        optimizer.zero_grad()
+        loss_function(network(inputs), targets).backward()
+        optimizer.step()
+
+    def timed(run):
+        start = time.perf_counter()
+        run()
+        return n_samples / (time.perf_counter() - start)
+
+    synchronous_loader = PrefetchLoader(X, y_codes, batch_size, n_workers=1, prefetch=1, **augmentation)
+    prefetch_loader = PrefetchLoader(X, y_codes, batch_size, n_workers=n_workers, prefetch=prefetch, **augmentation)
+    inputs, targets = next(iter(prefetch_loader.batches(indices[:batch_size])))
+    inputs, targets = inputs.clone(), targets.clone()
+    network.train()
+    results = {
+        "loader": timed(lambda: [None for _ in prefetch_loader.batches(indices)]),
+        "model_step": timed(lambda: [step(inputs, targets) for _ in range(n_batches)]),
+    }
+
+    def synchronous():
+        # Same work as the loader threads, done in the training loop
+        for start in range(0, n_samples, batch_size):
+            synchronous_loader._fill(0, np.sort(indices[start:start + batch_size]), synchronous_loader.augments,
+                                     (0, 0, start))
+            step(synchronous_loader._input_tensors[0], synchronous_loader._target_tensors[0])
+
+    results["synchronous"] = timed(synchronous)
+    results["prefetched"] = timed(lambda: [step(*batch) for batch in prefetch_loader.batches(indices)])
+    results["speedup"] = results["prefetched"] / results["synchronous"]
+    return results
+
+### Checkpoints ###
+
+def checkpoint_directory(root, model_config, X, y, random_state=0):
+    """Folder of the checkpoints of one training run, named after the model and a hash of its config,
+    the data, the labels and the seed, so a run only ever resumes from its own checkpoints."""
+    config = normalize_config(model_config)
+    labels = hashlib.sha1(np.ascontiguousarray(np.asarray(y)).data).hexdigest()
+    key = json.dumps([config, list(X.shape), feature_hash(X), labels, random_state], sort_keys=True, default=str)
+    return os.path.join(root, f"{config['model'].lower().replace(' ', '_')}_{hashlib.sha1(key.encode()).hexdigest()[:12]}")
+
+class CheckpointManager:
+    """Writes training checkpoints in the background and rotates them.
+
+    A checkpoint is snapshotted (copied) in the training thread, then written by a background thread to
+    a temporary file that is renamed into place, so training does not wait for the disk and a crash never
+    leaves a partial checkpoint. At most one write is in flight, the next snapshot waits for it.
+
+    Files are named epoch_<epoch>_batch_<batch>.pt after the position training continues from. The
+    keep_last most recent are kept, plus the one with the lowest validation loss when keep_best is set.
+
+    Parameters:
+    directory (str): Folder of the run's checkpoints, see checkpoint_directory.
+    keep_last (int): Number of recent checkpoints kept.
+    keep_best (bool): Whether the checkpoint with the best validation loss is also kept.
+    """
+
+    def __init__(self, directory, keep_last=3, keep_best=True):
+        self.directory = directory
+        self.keep_last = max(1, keep_last)
+        self.keep_best = keep_best
+        self._writer = None
+        self._error = None
+        os.makedirs(directory, exist_ok=True)
+
+    def paths(self):
+        """Checkpoint files, oldest first."""
+        return [os.path.join(self.directory, name) for name in sorted(os.listdir(self.directory))
+                if name.startswith("epoch_") and name.endswith(".pt")]
+
+    def latest(self):
+        """The most recent checkpoint (loaded), or None."""
+        self.wait()
+        paths = self.paths()
+        return torch.load(paths[-1], weights_only=False) if paths else None
+
+    def save(self, state, block=False):
+        """Write a checkpoint of a state dict holding at least "epoch", "batch" and "val_loss".
+
+        The state is deep-copied before returning, training can continue to modify the originals.
+        """
+        snapshot = copy.deepcopy(state)
+        self.wait()
+        self._writer = threading.Thread(target=self._write, args=(snapshot,), daemon=True)
+        self._writer.start()
+        if block:
+            self.wait()
+
+    def wait(self):
+        """Wait for the write in flight and raise its error, if any."""
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _write(self, snapshot):
+        try:
+            path = os.path.join(self.directory, f"epoch_{snapshot['epoch']:04d}_batch_{snapshot['batch']:05d}.pt")
+            torch.save(snapshot, path + ".tmp")
+            os.replace(path + ".tmp", path)
+            self._rotate(path, snapshot.get("val_loss"))
+        except Exception as e:
+            self._error = e
+
+    def _rotate(self, path, val_loss):
+        best_path = os.path.join(self.directory, "best.json")
+        best = None
+        if os.path.exists(best_path):
+            with open(best_path, 'r') as f:
+                best = json.load(f)
+        if self.keep_best and val_loss is not None and np.isfinite(val_loss) and (best is None or val_loss < best["val_loss"]):
+            best = {"file": os.path.basename(path), "val_loss": float(val_loss)}
+            with open(best_path + ".tmp", 'w') as f:
+                json.dump(best, f)
+            os.replace(best_path + ".tmp", best_path)
+        keep = set(self.paths()[-self.keep_last:])
+        if self.keep_best and best is not None:
+            keep.add(os.path.join(self.directory, best["file"]))
+        for old_path in self.paths():
+            if old_path not in keep:
+                os.remove(old_path)
+
+    def clear(self):
+        """Delete the run's checkpoints, e.g. once training completed."""
+        self.wait()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+### Training ###
+
+class DeepClassifier:
+    """Trained network with a scikit-learn style interface (predict, predict_proba, score).
+
+    Parameters:
+    network (nn.Module): The trained network.
+    classes (np.ndarray): Class labels in the order of the network outputs.
+    config (dict): Normalized config the network was built from.
+    sample_shape (tuple): Shape of one network input.
+    sfreq (float or None): Sampling frequency of the epochs, when the network takes their spectrograms.
+    """
+
+    def __init__(self, network, classes, config, sample_shape, history=None, best_epoch=None, sfreq=None):
+        self.network = network
+        self.classes_ = np.asarray(classes)
+        self.config = config
+        self.sample_shape = tuple(sample_shape)
+        self.history_ = history or []
+        self.best_epoch_ = best_epoch or len(self.history_)    #Epoch whose weights the network holds
+        self.sfreq = sfreq
+
+    def predict_proba(self, X, batch_size=256):
+        X = model_inputs(self.config, X, self.sfreq)  # Epochs of a spectrogram model are transformed first
+        self.network.eval()
+        outputs = []
+        with torch.no_grad():
+            for start in range(0, len(X), batch_size):
+                inputs = torch.from_numpy(np.array(X[start:start + batch_size], dtype=np.float32))
+                outputs.append(torch.softmax(self.network(inputs), dim=1).numpy())
+        return np.concatenate(outputs)
+
+    def predict(self, X, batch_size=256):
+        return self.classes_[self.predict_proba(X, batch_size).argmax(axis=1)]
+
+    def score(self, X, y):
+        return float(np.mean(self.predict(X) == np.asarray(y)))
+
+def _stratified_holdout(y, validation_fraction, rng):
+    train, validation = [], []
+    for label in np.unique(y):
+        members = rng.permutation(np.flatnonzero(y == label))
+        n_validation = int(round(len(members) * validation_fraction))
+        validation.append(members[:n_validation])
+        train.append(members[n_validation:])
+    return np.concatenate(train), np.sort(np.concatenate(validation))
+
+def _evaluate(network, loss_function, X, y_codes, indices, batch_size):
+    network.eval()
+    total_loss, correct = 0.0, 0
+    with torch.no_grad():
+        for inputs, targets in iter_minibatches(X, y_codes, indices, batch_size):
+            outputs = network(inputs)
+            total_loss += loss_function(outputs, targets).item() * len(targets)
+            correct += (outputs.argmax(dim=1) == targets).sum().item()
+    return total_loss / len(indices), correct / len(indices)
+
+def train_deep_model(model_config, X, y, n_threads=None, validation_fraction=0.2, n_workers=2, random_state=0,
+                     callback=None, stop_requested=None, checkpoint_dir=None, checkpoint_every=1, keep_last=3,
+                     resume=True):
+    """Compile and train a DeepLearningConfigWidget model.
+
+    Hyperparameters used: learning_rate, batch_size, epochs, optimizer, weight_decay, early_stopping
+    (patience in epochs on the validation loss, the best weights are restored) and gradient_clipping
+    (maximum gradient norm, 0 disables it). The optional time_shift, noise_std and channel_dropout
+    hyperparameters augment the training batches, see PrefetchLoader. With a "workers" hyperparameter above 1
+    the model is trained data-parallel on that many local processes, see train_data_parallel.
+
+    With a checkpoint_dir, a checkpoint (network, optimizer, random generators, loader position, history
+    and early stopping state) is written in the background every checkpoint_every epochs, and when
+    stop_requested interrupts an epoch. A later call with the same config, data shape and seed resumes
+    from the latest one and continues exactly as the uninterrupted run would have. The checkpoints of a
+    run are deleted once it completes.
+
+    Parameters:
+    model_config (dict): Config in either DeepLearningConfigWidget format.
+    X (array-like): Epochs of shape (n_epochs, *input_shape), ideally an EpochStore memmap.
+    y (array-like): Labels.
+    n_threads (int or None): Intra-op threads used by torch, defaults to the number of CPUs.
+    validation_fraction (float): Fraction of epochs held out (stratified) for early stopping and reporting.
+    n_workers (int): Threads of the PrefetchLoader preparing the training batches.
+    random_state (int): Seed for the split, the initialization and the batch order.
+    callback (function or None): Called after every epoch with "epoch", "epochs", "train_loss", "val_loss",
+        "val_accuracy", "epoch_time" and "samples_per_sec".
+    stop_requested (function or None): Checked after every batch, training stops when it returns True.
+        With data-parallel training it is checked after every epoch.
+    checkpoint_dir (str or None): Root folder of the checkpoints, e.g. the project's models/checkpoints.
+    checkpoint_every (int): Epochs between checkpoints.
+    keep_last (int): Number of recent checkpoints kept, besides the one with the best validation loss.
+    resume (bool): Whether to resume from the latest checkpoint of the same run.
+
+    Returns:
+    DeepClassifier: The trained model, with the per-epoch reports in history_.
+    """
+    config = normalize_config(model_config)
+    hyperparams = config["hyperparams"]
+    if int(hyperparams.get("workers", 1)) > 1:
+        # The "workers" hyperparameter switches to data-parallel training (without checkpoints)
+        return train_data_parallel(config, X, y, int(hyperparams["workers"]), validation_fraction=validation_fraction,
+                                   random_state=random_state, callback=callback, stop_requested=stop_requested)
+    torch.set_num_threads(n_threads or os.cpu_count())
+    torch.manual_seed(random_state)
+    rng = np.random.default_rng(random_state)
+
+    y = np.asarray(y)
+    classes, y_codes = np.unique(y, return_inverse=True)
+    network, _ = build_network(config, X.shape[1:], len(classes))
+    optimizer = make_optimizer(network, hyperparams)
+    loss_function = nn.CrossEntropyLoss()
+    batch_size = int(hyperparams.get("batch_size", 32))
+    epochs = int(hyperparams.get("epochs", 10))
+    patience = int(hyperparams["early_stopping"]) if hyperparams.get("early_stopping") else None
+    clipping = float(hyperparams.get("gradient_clipping", 0.0))
+    train_idx, val_idx = _stratified_holdout(y_codes, validation_fraction, rng)
+    loader = PrefetchLoader(X, y_codes, batch_size, n_workers=n_workers, random_state=random_state,
+                            time_shift=int(hyperparams.get("time_shift", 0)),
+                            noise_std=float(hyperparams.get("noise_std", 0.0)),
+                            channel_dropout=float(hyperparams.get("channel_dropout", 0.0)))
+
+    # Everything that changes during training, checkpointed as a whole
+    state = {"epoch": 0, "batch": 0, "permutation": None, "total_loss": 0.0, "train_time": 0.0, "history": [],
+             "best_loss": np.inf, "best_state": None, "best_epoch": None, "stale_epochs": 0, "val_loss": None}
+    checkpoints = None
+    if checkpoint_dir is not None:
+        checkpoints = CheckpointManager(checkpoint_directory(checkpoint_dir, config, X, y, random_state), keep_last)
+        saved = checkpoints.latest() if resume else None
+        if saved is not None:
+            network.load_state_dict(saved["network"])
+            optimizer.load_state_dict(saved["optimizer"])
+            rng.bit_generator.state = saved["numpy_rng"]
+            torch.set_rng_state(saved["torch_rng"])
+            state = saved["training"]
+
+    def save_checkpoint(block=False):
+        checkpoints.save({"epoch": state["epoch"], "batch": state["batch"], "val_loss": state["val_loss"],
+                          "network": network.state_dict(), "optimizer": optimizer.state_dict(),
+                          "numpy_rng": rng.bit_generator.state, "torch_rng": torch.get_rng_state(),
+                          "training": state}, block=block)
+
+    stopped = False
+    while state["epoch"] < epochs and not stopped:
+        epoch = state["epoch"]
+        if state["batch"] == 0:
+            state["permutation"] = rng.permutation(train_idx)
+            state["total_loss"], state["train_time"] = 0.0, 0.0
+        start = time.perf_counter()
+        network.train()
+        loader.n_passes = epoch
+        for number, (inputs, targets) in enumerate(loader.batches(state["permutation"], first_batch=state["batch"]),
+                                                   state["batch"]):
+            optimizer.zero_grad()
+            loss = loss_function(network(inputs), targets)
+            loss.backward()
+            if clipping > 0:
+                nn.utils.clip_grad_norm_(network.parameters(), clipping)
+            optimizer.step()
+            state["total_loss"] += loss.item() * len(targets)
+            state["batch"] = number + 1
+            if stop_requested is not None and stop_requested():
+                stopped = True
+                break
+        state["train_time"] += time.perf_counter() - start
+        if stopped and state["batch"] * batch_size < len(train_idx):
+            # Interrupted inside the epoch: save the position so the epoch can be finished later
+            if checkpoints is not None:
+                save_checkpoint(block=True)
+            break
+        start = time.perf_counter()
+        val_loss, val_accuracy = _evaluate(network, loss_function, X, y_codes, val_idx, batch_size) if len(val_idx) \
+            else (float('nan'), float('nan'))
+        report = {"epoch": epoch + 1, "epochs": epochs, "train_loss": state["total_loss"] / len(train_idx),
+                  "val_loss": val_loss, "val_accuracy": val_accuracy,
+                  "epoch_time": state["train_time"] + time.perf_counter() - start,
+                  "samples_per_sec": len(train_idx) / state["train_time"]}
+        state["history"].append(report)
+        if callback is not None:
+            callback(report)
+        if val_loss < state["best_loss"]:
+            state.update(best_loss=val_loss, best_state=copy.deepcopy(network.state_dict()), best_epoch=epoch + 1,
+                         stale_epochs=0)
+        else:
+            state["stale_epochs"] += 1
+        state.update(epoch=epoch + 1, batch=0, val_loss=val_loss)
+        if patience is not None and state["stale_epochs"] >= patience:
+            break
+        if checkpoints is not None and (stopped or state["epoch"] % max(1, checkpoint_every) == 0):
+            save_checkpoint(block=stopped)
+
+    history, best_epoch = state["history"], state["best_epoch"]
+    if patience is not None and state["best_state"] is not None:
+        network.load_state_dict(state["best_state"])
+    else:
+        best_epoch = len(history)
+    if checkpoints is not None and not stopped:
+        checkpoints.clear()
+    return DeepClassifier(network, classes, config, X.shape[1:], history, best_epoch)
+
+### Data-parallel training ###
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _shard(indices, rank, world_size):
+    """Every rank's share of the indices, padded by wrapping around so all ranks get the same number."""
+    padded = int(np.ceil(len(indices) / world_size)) * world_size
+    return np.resize(indices, padded)[rank::world_size]
+
+def _data_parallel_worker(rank, world_size, port, config, store_dir, n_threads, validation_fraction, random_state,
+                          messages, stop_event):
+    """Training process of train_data_parallel: same network and batch order on every rank, gradients
+    averaged over the ranks by all-reduce after every backward pass."""
+    import torch.distributed as dist
+    from torch.nn.parallel import DistributedDataParallel
+    try:
+        torch.set_num_threads(n_threads)
+        dist.init_process_group("gloo", init_method=f"tcp://127.0.0.1:{port}", rank=rank, world_size=world_size)
+        hyperparams = config["hyperparams"]
+        torch.manual_seed(random_state)
+        rng = np.random.default_rng(random_state)
+        store = EpochStore(store_dir)
+        X = store.X
+        classes, y_codes = np.unique(np.asarray(store.y), return_inverse=True)
+        network, _ = build_network(config, X.shape[1:], len(classes))
+        model = DistributedDataParallel(network)
+        optimizer = make_optimizer(network, hyperparams)
+        loss_function = nn.CrossEntropyLoss()
+        # The batch_size hyperparameter stays the global batch, each rank takes its share
+        batch_size = int(np.ceil(int(hyperparams.get("batch_size", 32)) / world_size))
+        epochs = int(hyperparams.get("epochs", 10))
+        patience = int(hyperparams["early_stopping"]) if hyperparams.get("early_stopping") else None
+        clipping = float(hyperparams.get("gradient_clipping", 0.0))
+        train_idx, val_idx = _stratified_holdout(y_codes, validation_fraction, rng)
+        loader = PrefetchLoader(X, y_codes, batch_size, n_workers=1, random_state=random_state * 1000 + rank,
+                                time_shift=int(hyperparams.get("time_shift", 0)),
+                                noise_std=float(hyperparams.get("noise_std", 0.0)),
+                                channel_dropout=float(hyperparams.get("channel_dropout", 0.0)))
+        val_shard = val_idx[rank::world_size]
+
+        history = []
+        best_loss, best_state, best_epoch, stale_epochs = np.inf, None, None, 0
+        for epoch in range(epochs):
+            start = time.perf_counter()
+            model.train()
+            totals = torch.zeros(2, dtype=torch.float64)
+            for inputs, targets in loader.batches(_shard(rng.permutation(train_idx), rank, world_size)):
+                optimizer.zero_grad()
+                loss = loss_function(model(inputs), targets)
+                loss.backward()
+                if clipping > 0:
+                    nn.utils.clip_grad_norm_(network.parameters(), clipping)
+                optimizer.step()
+                totals += torch.tensor([loss.item() * len(targets), len(targets)], dtype=torch.float64)
+            train_time = time.perf_counter() - start
+            # Validation loss and accuracy summed over the ranks' shares of the held-out epochs
+            network.eval()
+            validation = torch.zeros(3, dtype=torch.float64)
+            with torch.no_grad():
+                for inputs, targets in iter_minibatches(X, y_codes, val_shard, batch_size):
+                    outputs = network(inputs)
+                    validation += torch.tensor([loss_function(outputs, targets).item() * len(targets),
+                                                (outputs.argmax(dim=1) == targets).sum().item(), len(targets)],
+                                               dtype=torch.float64)
+            dist.all_reduce(totals)
+            dist.all_reduce(validation)
+            val_loss = float(validation[0] / validation[2]) if validation[2] else float('nan')
+            report = {"epoch": epoch + 1, "epochs": epochs, "train_loss": float(totals[0] / totals[1]),
+                      "val_loss": val_loss, "val_accuracy": float(validation[1] / validation[2]) if validation[2] else float('nan'),
+                      "epoch_time": time.perf_counter() - start, "samples_per_sec": float(totals[1]) / train_time,
+                      "workers": world_size}
+            history.append(report)
+            if rank == 0:
+                messages.put(("epoch", report))
+            if val_loss < best_loss:
+                best_loss, best_state, best_epoch, stale_epochs = val_loss, copy.deepcopy(network.state_dict()), epoch + 1, 0
+            else:
+                stale_epochs += 1
+            # All ranks must take the same decision to stop
+            stop = torch.tensor([float(stop_event.is_set())])
+            dist.all_reduce(stop, op=dist.ReduceOp.MAX)
+            if (patience is not None and stale_epochs >= patience) or stop.item() > 0:
+                break
+        if patience is not None and best_state is not None:
+            network.load_state_dict(best_state)
+        else:
+            best_epoch = len(history)
+        if rank == 0:
+            # Plain arrays, shared-memory tensors would not outlive this process
+            state = {name: tensor.detach().numpy().copy() for name, tensor in network.state_dict().items()}
+            messages.put(("done", {"state": state, "classes": classes, "history": history,
+                                   "best_epoch": best_epoch}))
+        dist.destroy_process_group()
+    except Exception:
+        messages.put(("error", rank, traceback.format_exc()))
+
+def train_data_parallel(model_config, X, y, n_workers=2, threads_per_worker=None, validation_fraction=0.2,
+                        random_state=0, callback=None, stop_requested=None):
+    """Train a DeepLearningConfigWidget model data-parallel on n_workers local processes.
+
+    Every process maps the epoch store and trains the same network on its own shard of every batch;
+    gradients are averaged with an all-reduce over gloo on the loopback interface, so the processes stay
+    in sync and the batch_size hyperparameter keeps its meaning as the global batch. Batch normalization
+    statistics are computed per process and those of the first one are kept.
+
+    Parameters:
+    model_config (dict): Config in either DeepLearningConfigWidget format.
+    X (array-like): Epochs. An EpochStore memmap (X.npy next to the same y.npy) is used in place,
+        anything else is first written to a temporary store.
+    y (array-like): Labels.
+    n_workers (int): Number of processes.
+    threads_per_worker (int or None): Intra-op threads per process, defaults to the CPUs divided among them.
+    validation_fraction (float): Fraction of epochs held out (stratified) for early stopping and reporting.
+    random_state (int): Seed for the split, the initialization and the batch order.
+    callback (function or None): Called after every epoch, as in train_deep_model (with "workers").
+    stop_requested (function or None): Checked while waiting, training stops after the current epoch.
+
+    Returns:
+    DeepClassifier: The trained model.
+
+    Raises:
+    RuntimeError: If a worker process fails.
+    """
+    config = normalize_config(model_config)
+    y = np.asarray(y)
+    filename = str(getattr(X, 'filename', '') or '')
+    store_dir = os.path.dirname(filename)
+    if not (isinstance(X, np.memmap) and os.path.basename(filename) == "X.npy"
+            and os.path.exists(os.path.join(store_dir, "y.npy"))
+            and np.array_equal(np.load(os.path.join(store_dir, "y.npy"), mmap_mode='r'), y)):
+        store_dir = EpochStore.create(tempfile.mkdtemp(prefix="pybci_epochs_"), X, y).directory
+    threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // n_workers)
+
+    import multiprocessing
+    context = multiprocessing.get_context("spawn")
+    messages = context.Queue()
+    stop_event = context.Event()
+    port = _free_port()
+    processes = [context.Process(target=_data_parallel_worker, daemon=True,
+                                 args=(rank, n_workers, port, config, store_dir, threads_per_worker,
+                                       validation_fraction, random_state, messages, stop_event))
+                 for rank in range(n_workers)]
+    for process in processes:
+        process.start()
+    result = None
+    try:
+        while result is None:
+            if stop_requested is not None and stop_requested():
+                stop_event.set()
+            try:
+                message = messages.get(timeout=0.5)
+            except queue.Empty:
+                failed = [process for process in processes if process.exitcode not in (None, 0)]
+                if failed:
+                    raise RuntimeError(f"Data-parallel worker exited with code {failed[0].exitcode}")
+                continue
+            if message[0] == "epoch" and callback is not None:
+                callback(message[1])
+            elif message[0] == "error":
+                raise RuntimeError(f"Data-parallel worker {message[1]} failed:\n{message[2]}")
+            elif message[0] == "done":
+                result = message[1]
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+    network, _ = build_network(config, X.shape[1:], len(result["classes"]))
+    network.load_state_dict({name: torch.from_numpy(array) for name, array in result["state"].items()})
+    return DeepClassifier(network, result["classes"], config, X.shape[1:], result["history"], result["best_epoch"])
+
+def benchmark_data_parallel(model_config, X, y, worker_counts=(1, 2, 4, 8), epochs=3):
+    """Scaling benchmark of data-parallel training.
+
+    Parameters:
+    model_config (dict): Config in either DeepLearningConfigWidget format.
+    X (array-like): Epochs, ideally an EpochStore memmap.
+    y (array-like): Labels.
+    worker_counts (tuple): Numbers of processes to compare.
+    epochs (int): Epochs per run, the first one (start-up) is not counted.
+
+    Returns:
+    dict: Per number of workers: "samples_per_sec", "speedup" over one worker and "efficiency" (speedup / workers).
+    """
+    config = normalize_config(model_config)
+    results = {}
+    for n_workers in worker_counts:
+        run_config = {**config, "hyperparams": {**config["hyperparams"], "epochs": epochs, "early_stopping": 0,
+                                                "workers": n_workers}}
+        if n_workers == 1:
+            model = train_deep_model(run_config, X, y, n_threads=max(1, (os.cpu_count() or 1)), n_workers=1)
+        else:
+            model = train_data_parallel(run_config, X, y, n_workers)
+        rates = [report["samples_per_sec"] for report in model.history_[1:] or model.history_]
+        results[n_workers] = {"samples_per_sec": float(np.median(rates))}
+    baseline = results[worker_counts[0]]["samples_per_sec"] / worker_counts[0]
+    for n_workers, result in results.items():
+        result["speedup"] = result["samples_per_sec"] / baseline
+        result["efficiency"] = result["speedup"] / n_workers
+    return results
+
+### Hyperparameter sweeps ###
+
+#Ranges of the hyperparameters of DeepLearningConfigWidget.model_configs, in the format of
+#training_backend.SEARCH_SPACES. Weight decay is searched on a log scale and batch sizes as powers of two;
+#epochs is the budget pruning cuts short, it is not searched
+DEEP_SEARCH_SPACE = {
+    "learning_rate": ("log", 1e-4, 1e-1),
+    "batch_size": [16, 32, 64, 128],
+    "optimizer": ["SGD", "Adam", "RMSprop", "AdamW", "Lookahead"],
+    "weight_decay": ("log", 1e-6, 1e-1),
+    "gradient_clipping": ("uniform", 0.1, 5.0),
+}
+
+def deep_search_space(model_config):
+    """Search space over the hyperparameters a deep learning config has (e.g. weight_decay for an MLP,
+    gradient_clipping for recurrent models)."""
+    hyperparams = normalize_config(model_config)["hyperparams"]
+    return {name: spec for name, spec in DEEP_SEARCH_SPACE.items() if name in hyperparams}
+
+def _run_trial(trial, config, store_dir, n_threads, random_state, curves, n_warmup_epochs, n_startup_trials):
+    """Worker task: train one sweep trial, reporting its validation curve and stopping it once it is
+    worse than the median of the other trials at the same epoch."""
+    store = EpochStore(store_dir)
+    curve, pruned = [], [False]
+
+    def report(epoch_report):
+        curve.append(epoch_report["val_loss"])
+        curves[trial] = list(curve)
+        epoch = len(curve)
+        others = [other[epoch - 1] for key, other in curves.items() if key != trial and len(other) >= epoch]
+        if epoch > n_warmup_epochs and len(others) >= n_startup_trials and curve[-1] > np.median(others):
+            pruned[0] = True
+
+    start = time.perf_counter()
+    try:
+        model = train_deep_model(config, store.X, store.y, n_threads=n_threads, n_workers=1, random_state=random_state,
+                                 callback=report, stop_requested=lambda: pruned[0])
+        # Without early stopping the network keeps its last weights, the trial is still ranked by its best epoch
+        best = min(model.history_, key=lambda epoch_report: epoch_report["val_loss"]) if model.history_ else {}
+        return {"trial": trial, "params": None, "score": best.get("val_loss"), "val_accuracy": best.get("val_accuracy"),
+                "epochs_run": len(model.history_), "pruned": pruned[0], "fit_time": time.perf_counter() - start,
+                "error": None}
+    except Exception as e:
+        return {"trial": trial, "params": None, "score": None, "val_accuracy": None, "epochs_run": len(curve),
+                "pruned": False, "fit_time": time.perf_counter() - start, "error": str(e)}
+
+def sweep_deep_model(model_config, X, y, search_space=None, n_trials=20, cpu_budget=None, threads_per_trial=1,
+                     n_warmup_epochs=3, n_startup_trials=3, random_state=0, results_path=None, callback=None,
+                     stop_requested=None):
+    """Random hyperparameter sweep of a deep learning config with median pruning.
+
+    Trials are sampled from the search space and trained concurrently on a process pool sized to the CPU
+    budget (cpu_budget // threads_per_trial processes). Every trial reports its validation loss after each
+    epoch; after n_warmup_epochs, a trial whose loss is above the median of the other trials at the same
+    epoch (once n_startup_trials have reached it) is stopped. Trials are ranked by their best validation
+    loss. Finished trials are appended to results_path, tagged with a fingerprint of X and y, so an
+    interrupted sweep on the same data resumes where it stopped.
+
+    Parameters:
+    model_config (dict): Config in either DeepLearningConfigWidget format, its hyperparameters are the defaults.
+    X (array-like): Epochs. An EpochStore memmap (X.npy next to the same y.npy) is used in place.
+    y (array-like): Labels.
+    search_space (dict or None): Search space, defaults to deep_search_space(model_config).
+    n_trials (int): Number of sampled trials.
+    cpu_budget (int or None): Cores the sweep may use, defaults to all of them.
+    threads_per_trial (int): Intra-op threads of every trial.
+    n_warmup_epochs (int): Epochs every trial runs before it can be pruned.
+    n_startup_trials (int): Number of other trials that must have reached an epoch before pruning at it.
+    random_state (int): Seed for sampling and training.
+    results_path (str or None): JSON lines file the trials are persisted to.
+    callback (function or None): Called with each trial record as soon as it finishes.
+    stop_requested (function or None): Polled while waiting, the sweep stops once it returns True (trials that
+        have not started are cancelled) and a later call with the same results_path resumes it.
+
+    Returns:
+    dict: "best_params", "best_score" (validation loss), "best_config" (save_configuration format),
+        "history" (every trial) and "n_pruned".
+
+    Raises:
+    InterruptedError: If stop_requested stopped the sweep.
+    """
+    from multiprocessing import get_context
+    from concurrent.futures import ProcessPoolExecutor
+    from Backend.training_backend import (make_candidates, completed_until_stopped, data_fingerprint,
+                                          _load_search_results, _append_search_result)
+
+    config = normalize_config(model_config)
+    search_space = search_space or deep_search_space(config)
+    candidates = make_candidates(search_space, 'random', n_trials, random_state=random_state)
+    y = np.asarray(y)
+    filename = str(getattr(X, 'filename', '') or '')
+    store_dir = os.path.dirname(filename)
+    # An EpochStore is reused in place only when its labels are the given ones
+    if not (isinstance(X, np.memmap) and os.path.basename(filename) == "X.npy"
+            and os.path.exists(os.path.join(store_dir, "y.npy"))
+            and np.array_equal(np.load(os.path.join(store_dir, "y.npy"), mmap_mode='r'), y)):
+        store_dir = EpochStore.create(tempfile.mkdtemp(prefix="pybci_epochs_"), X, y).directory
+    n_processes = max(1, (cpu_budget or os.cpu_count() or 1) // threads_per_trial)
+    done = _load_search_results(results_path)
+    data = data_fingerprint(X, y)
+    history = []
+
+    context = get_context("spawn")
+    with context.Manager() as manager, ProcessPoolExecutor(max_workers=n_processes, mp_context=context) as executor:
+        curves = manager.dict()
+        futures = {}
+        for trial, params in enumerate(candidates):
+            key = (json.dumps(params, sort_keys=True), len(X), data)
+            if key in done:
+                history.append(done[key])
+                continue
+            trial_config = {**config, "hyperparams": {**config["hyperparams"], **params, "workers": 1}}
+            futures[executor.submit(_run_trial, trial, trial_config, store_dir, threads_per_trial, random_state, curves,
+                                    n_warmup_epochs, n_startup_trials)] = params
+        for future in completed_until_stopped(futures, stop_requested):
+            record = {**future.result(), "params": futures[future], "n_samples": len(X), "data": data}
+            if results_path:
+                _append_search_result(results_path, record)
+            history.append(record)
+            if callback is not None:
+                callback({**record, "done": len(history), "n_trials": len(candidates)})
+
+    finished = [record for record in history if record["score"] is not None and np.isfinite(record["score"])]
+    if not finished:
+        errors = [record["error"] for record in history if record["error"]]
+        raise RuntimeError(f"Every trial failed, first error: {errors[0] if errors else 'no validation loss'}")
+    best = min(finished, key=lambda record: record["score"])
+    best_config = {"model": config["model"], "input_shape": config["input_shape"],
+                   "hyperparams": {**config["hyperparams"], **best["params"]}, "architecture": config["architecture"]}
+    return {"best_params": best["params"], "best_score": best["score"], "best_config": best_config, "history": history,
+            "n_pruned": sum(record.get("pruned", False) for record in history)}
+
+def save_deep_config(file_name, model_config):
+    """Write a config in the JSON format of DeepLearningConfigWidget.save_configuration, so it can be loaded in the dialog."""
+    config = normalize_config(model_config)
+    with open(file_name, 'w') as f:
+        json.dump({"model": config["model"], "input_shape": config["input_shape"], "hyperparams": config["hyperparams"],
+                   "architecture": config["architecture"]}, f, indent=4)
+    return file_name
+
+### Quantization ###
+
+QUANTIZABLE_LAYERS = (nn.Linear, nn.LSTM, nn.GRU)
+
+def _quantize_layers(network, layer_names):
+    """Copy of the network with the named Dense/LSTM/GRU modules quantized to int8 weights (dynamic quantization)."""
+    from torch.ao.quantization import quantize_dynamic, default_dynamic_qconfig
+    network = copy.deepcopy(network).eval()
+    if not layer_names:
+        return network
+    with warnings.catch_warnings():
+        # Eager-mode quantization is deprecated in favour of torchao, but it is what runs the LSTM/GRU kernels
+        warnings.simplefilter("ignore")
+        return quantize_dynamic(network, {name: default_dynamic_qconfig for name in layer_names}, dtype=torch.qint8)
+
+def _logits(network, X, batch_size=256):
+    network.eval()
+    with torch.no_grad():
+        return torch.cat([network(torch.from_numpy(np.array(X[start:start + batch_size], dtype=np.float32)))
+                          for start in range(0, len(X), batch_size)])
+
+def quantize_model(model, X_val, y_val=None, max_accuracy_drop=0.01):
+    """Post-training dynamic int8 quantization of the Dense, LSTM and GRU layers of a DeepClassifier.
+
+    Every layer is first quantized on its own and checked against the float model on the held-out
+    epochs: layers that cost more than max_accuracy_drop (or, without labels, change more than that
+    fraction of the predictions) stay in float32. The selected layers are then quantized together and,
+    while the whole network still loses too much, the most sensitive one is put back in float32.
+    Convolutions, SimpleRNN and attention layers are not quantized.
+
+    Parameters:
+    model (DeepClassifier): The trained float model.
+    X_val (array-like): Held-out epochs.
+    y_val (array-like or None): Their labels.
+    max_accuracy_drop (float): Accuracy (or agreement with the float model) that may be lost.
+
+    Returns:
+    tuple: (quantized DeepClassifier, report) where report holds "layers" (per layer: "layer", "type",
+        "accuracy" or "agreement", "drop", "max_logit_error", "quantized") and the "float" and "int8" scores.
+    """
+    network = model.network.eval()
+    float_logits = _logits(network, X_val)
+    float_predictions = float_logits.argmax(dim=1).numpy()
+    if y_val is not None:
+        targets = np.searchsorted(model.classes_, np.asarray(y_val))
+        metric = "accuracy"
+    else:
+        targets = float_predictions
+        metric = "agreement"
+
+    def evaluate(quantized_network):
+        logits = _logits(quantized_network, X_val)
+        return float(np.mean(logits.argmax(dim=1).numpy() == targets)), float((logits - float_logits).abs().max())
+
+    float_score = float(np.mean(float_predictions == targets))
+    layers = []
+    for name, module in network.named_modules():
+        if type(module) in QUANTIZABLE_LAYERS:
+            score, error = evaluate(_quantize_layers(network, [name]))
+            layers.append({"layer": name, "type": type(module).__name__, metric: score, "drop": float_score - score,
+                           "max_logit_error": error, "quantized": float_score - score <= max_accuracy_drop})
+    selected = sorted((layer for layer in layers if layer["quantized"]), key=lambda layer: layer["drop"])
+    while True:
+        quantized_network = _quantize_layers(network, [layer["layer"] for layer in selected])
+        int8_score, _ = evaluate(quantized_network)
+        if float_score - int8_score <= max_accuracy_drop or not selected:
+            break
+        selected.pop()["quantized"] = False
+    quantized = DeepClassifier(quantized_network, model.classes_, model.config, model.sample_shape, model.history_,
+                               model.best_epoch_)
+    quantized.quantized_layers_ = [layer["layer"] for layer in selected]
+    return quantized, {"metric": metric, "layers": layers, "float": float_score, "int8": int8_score}
+
+def quantize_registered_model(models_dir, model_name, X_val, y_val=None, version=None, max_accuracy_drop=0.01):
+    """Quantize a registered deep learning model and save the result as its next version.
+
+    The index entry records the float version it came from ("parent_version"), "quantization" and the
+    per-layer report, so the int8 model can be loaded like any other version.
+
+    Returns:
+    dict: "version", "path", "model" and the "report" of quantize_model.
+    """
+    from Backend.model_backend import ModelRegistry
+    registry = ModelRegistry(models_dir, mmap_mode=None)
+    model, entry = registry.load(model_name, version)
+    quantized, report = quantize_model(model, X_val, y_val, max_accuracy_drop)
+    metrics = {report["metric"]: report["int8"]}
+    new_version, path = registry.save(model_name, quantized, {"parent_version": entry["version"], "quantization": "dynamic int8",
+                                                              "quantization_report": report, "metrics": metrics})
+    return {"version": new_version, "path": path, "model": quantized, "report": report}
+
+def benchmark_quantization(float_model, int8_model, X, repeats=200, n_threads=1):
+    """Compare float32 and int8 latency at batch size 1 and model size.
+
+    Parameters:
+    float_model (DeepClassifier): The float model.
+    int8_model (DeepClassifier): Its quantized copy, see quantize_model.
+    X (array-like): Epochs, one is predicted per call.
+    repeats (int): Number of timed predictions.
+    n_threads (int): Intra-op threads, 1 as on a laptop running acquisition at the same time.
+
+    Returns:
+    dict: Per model ("float32", "int8"): "p50_ms", "p95_ms" and "size_mb" (serialized weights), and the
+        "speedup" and "compression" of int8.
+    """
+    previous_threads = torch.get_num_threads()
+    torch.set_num_threads(n_threads)
+    results = {}
+    try:
+        for name, model in (("float32", float_model), ("int8", int8_model)):
+            network = model.network.eval()
+            buffer = io.BytesIO()
+            torch.save(network.state_dict(), buffer)
+            samples = [torch.from_numpy(np.array(X[i % len(X)][None], dtype=np.float32)) for i in range(repeats)]
+            timings = []
+            with torch.no_grad():
+                network(samples[0])    #Warm up
+                for sample in samples:
+                    start = time.perf_counter()
+                    network(sample)
+                    timings.append(time.perf_counter() - start)
+            results[name] = {"p50_ms": float(np.percentile(timings, 50) * 1e3),
+                             "p95_ms": float(np.percentile(timings, 95) * 1e3),
+                             "size_mb": buffer.getbuffer().nbytes / 1e6}
+    finally:
+        torch.set_num_threads(previous_threads)
+    results["speedup"] = results["float32"]["p50_ms"] / results["int8"]["p50_ms"]
+    results["compression"] = results["float32"]["size_mb"] / results["int8"]["size_mb"]
+    return results
+
@@ -6,14 +6,21 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import pyqtSignal, Qt, QMimeData
 from PyQt5.QtGui import QDrag
 import json
+import os
+
+from Backend.deeplearning_backend import estimate_cost, estimate_epoch_time
 
 class DeepLearningConfigWidget(QDialog):
     """Unified deep learning model configuration widget with drag-and-drop layer design and enhanced flexibility."""
     
     modelConfigured = pyqtSignal(dict)
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, sample_shape=None, n_samples=None, n_classes=2):
         super().__init__(parent)
+        # Shape of the loaded epochs, used to resolve the input shape and estimate the network's cost
+        self.sample_shape = sample_shape
+        self.n_samples = n_samples
+        self.n_classes = n_classes
         self.setWindowTitle("Configure Deep Learning Model")
         self.setMinimumSize(1000, 700)
         
@@ -24,6 +31,7 @@ class DeepLearningConfigWidget(QDialog):
                     ("learning_rate", "float", 0.001, 0.0001, 0.1),
                     ("batch_size", "int", 32, 1, 1024),
                     ("epochs", "int", 100, 1, 1000),
+                    ("workers", "int", 1, 1, 64),
                     ("optimizer", "combo", ["SGD", "Adam", "RMSprop", "AdamW", "Lookahead"]),
                     ("weight_decay", "float", 0.01, 0.0, 1.0)
                 ],
@@ -43,6 +51,7 @@ class DeepLearningConfigWidget(QDialog):
                     ("learning_rate", "float", 0.001, 0.0001, 0.1),
                     ("batch_size", "int", 16, 1, 1024),
                     ("epochs", "int", 50, 1, 1000),
+                    ("workers", "int", 1, 1, 64),
                     ("optimizer", "combo", ["SGD", "Adam", "RMSprop", "AdamW", "Lookahead"]),
                     ("early_stopping", "int", 10, 1, 100)
                 ],
@@ -82,18 +91,19 @@ class DeepLearningConfigWidget(QDialog):
                     ("learning_rate", "float", 0.001, 0.0001, 0.1),
                     ("batch_size", "int", 32, 1, 1024),
                     ("epochs", "int", 100, 1, 1000),
+                    ("workers", "int", 1, 1, 64),
                     ("optimizer", "combo", ["SGD", "Adam", "RMSprop", "AdamW", "Lookahead"]),
                     ("gradient_clipping", "float", 0.5, 0.0, 10.0)
                 ],
                 "layers": {
                     "SimpleRNN Layer": {
                         "units": {"type": "int", "default": 50, "min": 1, "max": 512},
-                        "activation": {"type": "combo", "default": "tanh", "options": ["tanh", "relu", "sigmoid"]},
+                        "activation": {"type": "combo", "default": "tanh", "options": ["tanh", "relu"]},
                         "return_sequences": {"type": "combo", "default": "False", "options": ["True", "False"]}
                     },
                     "GRU Layer": {
                         "units": {"type": "int", "default": 50, "min": 1, "max": 512},
-                        "activation": {"type": "combo", "default": "tanh", "options": ["tanh", "relu", "sigmoid"]},
+                        "activation": {"type": "combo", "default": "tanh", "options": ["tanh"]},
                         "return_sequences": {"type": "combo", "default": "False", "options": ["True", "False"]}
                     },
                     "Attention Layer": {
@@ -113,18 +123,19 @@ class DeepLearningConfigWidget(QDialog):
                     ("learning_rate", "float", 0.001, 0.0001, 0.1),
                     ("batch_size", "int", 32, 1, 1024),
                     ("epochs", "int", 100, 1, 1000),
+                    ("workers", "int", 1, 1, 64),
                     ("optimizer", "combo", ["SGD", "Adam", "RMSprop", "AdamW", "Lookahead"]),
                     ("gradient_clipping", "float", 0.5, 0.0, 10.0)
                 ],
                 "layers": {
                     "LSTM Layer": {
                         "units": {"type": "int", "default": 50, "min": 1, "max": 512},
-                        "activation": {"type": "combo", "default": "tanh", "options": ["tanh", "relu", "sigmoid"]},
+                        "activation": {"type": "combo", "default": "tanh", "options": ["tanh"]},
                         "return_sequences": {"type": "combo", "default": "False", "options": ["True", "False"]}
                     },
                     "GRU Layer": {
                         "units": {"type": "int", "default": 50, "min": 1, "max": 512},
-                        "activation": {"type": "combo", "default": "tanh", "options": ["tanh", "relu", "sigmoid"]},
+                        "activation": {"type": "combo", "default": "tanh", "options": ["tanh"]},
                         "return_sequences": {"type": "combo", "default": "False", "options": ["True", "False"]}
                     },
                     "Attention Layer": {
@@ -164,6 +175,7 @@ class DeepLearningConfigWidget(QDialog):
         input_shape_layout.addWidget(QLabel("Input Format:"))
         input_shape_layout.addWidget(self.input_format_combo)
         self.input_shape_input = QLineEdit()
+        self.input_shape_input.textChanged.connect(self.update_cost_estimate)
         input_shape_layout.addWidget(QLabel("Input Shape:"))
         input_shape_layout.addWidget(self.input_shape_input)
         input_shape_group.setLayout(input_shape_layout)
@@ -186,6 +198,12 @@ class DeepLearningConfigWidget(QDialog):
         for model_name, config in self.model_configs.items():
             hyperparam_widget = self.create_hyperparam_widget(config["hyperparams"])
             self.hyperparam_stack.addWidget(hyperparam_widget)
+            for param_name in ("batch_size", "optimizer"):
+                widget = hyperparam_widget.inputs.get(param_name)
+                if isinstance(widget, QComboBox):
+                    widget.currentTextChanged.connect(self.update_cost_estimate)
+                elif isinstance(widget, QSpinBox):
+                    widget.valueChanged.connect(self.update_cost_estimate)
         
         # Layer design area with splitter
         splitter = QSplitter(Qt.Horizontal)
@@ -210,6 +228,9 @@ class DeepLearningConfigWidget(QDialog):
         right_layout = QVBoxLayout()
         right_layout.addWidget(QLabel("Model Architecture:"))
         self.architecture_list = ArchitectureList()
+        for signal in (self.architecture_list.model().rowsInserted, self.architecture_list.model().rowsRemoved,
+                       self.architecture_list.model().rowsMoved, self.architecture_list.model().modelReset):
+            signal.connect(self.update_cost_estimate)
         right_layout.addWidget(self.architecture_list)
         
         # Architecture management buttons
@@ -222,6 +243,11 @@ class DeepLearningConfigWidget(QDialog):
         
         main_layout.addWidget(splitter)
         
+        # Live cost estimate of the architecture
+        self.cost_label = QLabel()
+        self.cost_label.setWordWrap(True)
+        main_layout.addWidget(self.cost_label)
+        
         # Save and Load buttons
         save_load_layout = QHBoxLayout()
         save_load_layout.addWidget(QPushButton("Save Configuration", clicked=self.save_configuration))
@@ -280,6 +306,7 @@ class DeepLearningConfigWidget(QDialog):
         model_index = list(self.model_configs.keys()).index(model_name)
         self.hyperparam_stack.setCurrentIndex(model_index)
         self.update_layer_palette(model_name)
+        self.update_cost_estimate()
     
     def update_layer_palette(self, model_name):
         """Populate layer palette with available layers."""
@@ -327,6 +354,41 @@ class DeepLearningConfigWidget(QDialog):
             architecture.append(item.data(Qt.UserRole))
         return architecture
     
+    def update_cost_estimate(self, *args):
+        """Show the parameters, FLOPs, memory and projected epoch time of the current architecture."""
+        architecture = self.get_architecture()
+        input_shape = self.input_shape_input.text().strip()
+        if not architecture or not input_shape:
+            self.cost_label.setText("Add layers and an input shape to see the estimated cost")
+            self.cost_label.setStyleSheet("")
+            return
+        config = {"model": self.model_combo.currentText(), "input_shape": input_shape,
+                  "hyperparams": self.get_hyperparameters(), "architecture": architecture}
+        try:
+            cost = estimate_cost(config, self.sample_shape, self.n_classes)
+        except (ValueError, KeyError) as e:
+            self.cost_label.setText(f"Cannot build this architecture: {e}")
+            self.cost_label.setStyleSheet("color: #c62828;")
+            return
+        n_samples = self.n_samples or 1000
+        epoch_time = estimate_epoch_time(cost, n_samples)
+        assumed = "" if self.sample_shape is not None else " (64 channels assumed)"
+        text = (f"Output: {cost['layers'][-2]['output_shape']} -> {self.n_classes} classes{assumed} | "
+                f"Parameters: {cost['params']:,} | FLOPs/sample: {cost['flops'] / 1e6:,.1f} M | "
+                f"Activations/batch of {cost['batch_size']}: {cost['activation_bytes'] / 1e6:,.1f} MB | "
+                f"Training memory: {cost['memory_bytes'] / 1e6:,.1f} MB | "
+                f"Epoch of {n_samples} samples: ~{epoch_time:.1f} s")
+        try:
+            physical_memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+        except (ValueError, OSError, AttributeError):
+            physical_memory = None
+        if physical_memory and cost["memory_bytes"] > physical_memory / 2:
+            text += f"\nWarning: needs more than half of this machine's {physical_memory / 1e9:.1f} GB of memory"
+            self.cost_label.setStyleSheet("color: #c62828;")
+        else:
+            self.cost_label.setStyleSheet("")
+        self.cost_label.setText(text)
+    
     def validate_architecture(self, model_name, architecture):
         """Validate the architecture based on model-specific rules."""
         if model_name == "Convolutional Neural Network":
@@ -595,17 +657,17 @@ class ArchitectureList(QListWidget):
             "Flatten Layer": {},
             "SimpleRNN Layer": {
                 "units": "Number of recurrent units",
-                "activation": "Activation function applied to the output",
+                "activation": "Activation of the hidden state, tanh or relu",
                 "return_sequences": "Whether to return the full sequence or last output"
             },
             "GRU Layer": {
                 "units": "Number of recurrent units",
-                "activation": "Activation function applied to the output",
+                "activation": "Activation of the candidate state, GRU layers only support tanh",
                 "return_sequences": "Whether to return the full sequence or last output"
             },
             "LSTM Layer": {
                 "units": "Number of recurrent units",
-                "activation": "Activation function applied to the output",
+                "activation": "Activation of the cell state, LSTM layers only support tanh",
                 "return_sequences": "Whether to return the full sequence or last output"
             },
             "Attention Layer": {
@@ -0,0 +1,580 @@
+import os
+import json
+import mmap
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from numpy.lib.format import open_memmap
+
+"""
+Feature extraction for the ML page. Feature matrices are cached per project in
+
+project
+|
+|-data--features
+
+so a matrix is computed once and reopened with memory-mapping afterwards.
+"""
+
+def source_fingerprint(source):
+    """Helper function that builds a JSON friendly identity for a feature source.
+
+    Parameters:
+    source (str, np.ndarray, list or other): File path, array or list of these that the features are computed from.
+
+    Returns:
+    object: File paths map to (path, size, mtime), arrays to (shape, dtype, sha1) and anything else is returned as is.
+        A whole memory-mapped .npy file (e.g. from a FeatureStore) maps to its file's identity, so it is not read.
+    """
+    if isinstance(source, str) and os.path.exists(source):
+        stat = os.stat(source)
+        return {"path": os.path.abspath(source), "size": stat.st_size, "mtime": stat.st_mtime}
+    # Only a whole mapped file (not a slice of one) is described by its filename
+    if isinstance(source, np.memmap) and isinstance(source.base, mmap.mmap) and source.filename:
+        return {**source_fingerprint(str(source.filename)), "shape": list(source.shape), "dtype": source.dtype.name}
+    if isinstance(source, np.ndarray):
+        # Hashed block by block, so large arrays are never copied at once
+        rows = source.reshape(1, -1) if source.ndim == 0 else source
+        step = max(1, (16 << 20) // max(rows[:1].nbytes, 1))
+        digest = hashlib.sha1()
+        for start in range(0, len(rows), step):
+            digest.update(np.ascontiguousarray(rows[start:start + step]).data)
+        return {"shape": list(source.shape), "dtype": source.dtype.name, "sha1": digest.hexdigest()}
+    if isinstance(source, (list, tuple)):
+        return [source_fingerprint(item) for item in source]
+    return source
+
+class FeatureStore:
+    """Disk cache of feature matrices stored as .npy files.
+
+    Entries are keyed by a hash of the feature name, the data source and the parameters
+    used, and are opened with memory-mapping so large matrices never have to sit fully in RAM.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, name, source, params=None):
+        """Build the cache key for a feature computed from source with params."""
+        payload = json.dumps({"name": name, "source": source_fingerprint(source), "params": params or {}},
+                             sort_keys=True, default=str)
+        return f"{name}_{hashlib.sha1(payload.encode()).hexdigest()[:16]}"
+
+    def path(self, key):
+        return os.path.join(self.root, f"{key}.npy")
+
+    def contains(self, key):
+        return os.path.exists(self.path(key))
+
+    def load(self, key, mmap_mode='r'):
+        """Open a stored matrix, memory-mapped read-only by default."""
+        return np.load(self.path(key), mmap_mode=mmap_mode)
+
+    def save(self, key, array):
+        """Write a matrix to the store. The file is renamed into place so readers never see partial writes."""
+        tmp_path = self.path(key) + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.asarray(array))
+        os.replace(tmp_path, self.path(key))
+        return self.path(key)
+
+    def write_chunks(self, key, shape, dtype, chunks):
+        """Write a matrix block by block so it never has to be held in memory at once.
+
+        Parameters:
+        key (str): Cache key to store the matrix under.
+        shape (tuple): Shape of the full matrix.
+        dtype (np.dtype): Data type of the full matrix.
+        chunks (iterable): Yields (start_row, block) pairs covering the matrix.
+
+        Returns:
+        np.memmap: The stored matrix, opened read-only.
+        """
+        tmp_path = self.path(key) + ".tmp"
+        out = open_memmap(tmp_path, mode='w+', dtype=dtype, shape=shape)
+        for start, block in chunks:
+            out[start:start + len(block)] = block
+        out.flush()
+        del out
+        os.replace(tmp_path, self.path(key))
+        return self.load(key)
+
+    def get_or_compute(self, name, source, params, compute):
+        """Return the cached matrix for (name, source, params), calling compute() only on a cache miss."""
+        key = self.key(name, source, params)
+        if not self.contains(key):
+            self.save(key, compute())
+        return self.load(key)
+
+    def get_or_compute_sessions(self, name, sources, params, compute):
+        """Feature matrix of several recording sessions, computing only the sessions not cached yet.
+
+        Each session is stored under its own key, so adding a new .edf file to a project only extracts
+        features for that file. The stacked matrix is written to the store block by block.
+
+        Parameters:
+        name (str): Feature name.
+        sources (list): One source per session, usually .edf filepaths.
+        params (dict): Parameters of the feature extraction.
+        compute (callable): compute(source) returns the feature matrix of one session.
+
+        Returns:
+        tuple: (X, new_sources) where X is the stacked matrix (memmap) and new_sources the sessions computed now.
+        """
+        new_sources = [source for source in sources if not self.contains(self.key(name, source, params))]
+        parts = [self.get_or_compute(name, source, params, lambda source=source: compute(source)) for source in sources]
+        key = self.key(f"{name}_sessions", list(sources), params)
+        if not self.contains(key):
+            offsets = np.cumsum([0] + [len(part) for part in parts])
+            shape = (int(offsets[-1]),) + parts[0].shape[1:]
+            self.write_chunks(key, shape, parts[0].dtype, zip(offsets[:-1], parts))
+        return self.load(key), new_sources
+
+    def iter_batches(self, key, batch_size, shuffle=False, random_state=None):
+        """Read a stored matrix batch by batch straight from the memory-mapped file, see iter_batches."""
+        return iter_batches(self.load(key), batch_size, shuffle, random_state)
+
+def iter_batches(X, batch_size, shuffle=False, random_state=None):
+    """Yield consecutive row blocks of X as in-memory float64 arrays.
+
+    Only one block is read at a time, so memory stays flat however large a memory-mapped X is.
+
+    Parameters:
+    X (array-like): Matrix of shape (n_samples, ...), usually a memmap from a FeatureStore.
+    batch_size (int): Number of rows per block.
+    shuffle (bool): Visit the blocks in random order (rows inside a block stay contiguous for fast reads).
+        The short tail block is always visited last, so the first block is a full one (estimators such as
+        MiniBatchKMeans initialize from it).
+    random_state (int, np.random.Generator or None): Seed for the block order.
+
+    Yields:
+    np.ndarray: Blocks of at most batch_size rows.
+    """
+    starts = np.arange(0, len(X), batch_size)
+    if shuffle:
+        n_full = len(X) // batch_size
+        np.random.default_rng(random_state).shuffle(starts[:n_full])
+    for start in starts:
+        yield np.asarray(X[start:start + batch_size], dtype=np.float64)
+
+def project_feature_store(project_filepath):
+    """Return the FeatureStore of a project given the path to its project.json."""
+    project_dir = os.path.dirname(project_filepath)
+    return FeatureStore(os.path.join(project_dir, 'data', 'features'))
+
+### Epochs ###
+
+def recording_windows(raw, window=1.0, step=None):
+    """Start samples and labels of the epochs cut from a recording.
+
+    Annotated recordings give one epoch per annotation, starting at its onset and labelled with its
+    description (BAD and EDGE annotations are skipped). Recordings without such annotations are cut
+    into unlabelled windows every step seconds.
+
+    Parameters:
+    raw (mne.io.Raw): The recording, its data does not have to be loaded.
+    window (float): Epoch length in seconds.
+    step (float or None): Time between unlabelled windows in seconds, defaults to window.
+
+    Returns:
+    tuple: (starts, labels) where starts are sample indices and labels an array of strings (None if unlabelled).
+    """
+    import mne
+    sfreq = raw.info['sfreq']
+    n_window = int(round(window * sfreq))
+    if len(raw.annotations):
+        events, event_id = mne.events_from_annotations(raw, verbose=False)
+        if len(events):
+            names = {code: description for description, code in event_id.items()}
+            starts = events[:, 0] - raw.first_samp
+            keep = (starts >= 0) & (starts + n_window <= raw.n_times)
+            return starts[keep], np.array([names[code] for code in events[keep, 2]])
+    n_step = int(round((step or window) * sfreq))
+    return np.arange(0, raw.n_times - n_window + 1, n_step), None
+
+def recording_epochs(filepath, window=1.0, step=None):
+    """Read an .edf recording and cut it into epochs, see recording_windows.
+
+    Returns:
+    tuple: (epochs, labels, sfreq) where epochs has shape (n_epochs, n_channels, n_times).
+    """
+    import mne
+    raw = mne.io.read_raw_edf(filepath, preload=False, verbose=False)
+    starts, labels = recording_windows(raw, window, step)
+    n_window = int(round(window * raw.info['sfreq']))
+    # Epochs are strided views of the recording, so overlapping windows are not copied
+    windows = np.lib.stride_tricks.sliding_window_view(raw.get_data(), n_window, axis=1)
+    return windows[:, starts].transpose(1, 0, 2), labels, raw.info['sfreq']
+
+def log_variance_features(epochs, chunk_size=256):
+    """Log-variance of every channel of every epoch, the features InferenceService computes by default."""
+    features = np.empty(epochs.shape[:2])
+    for start in range(0, len(epochs), chunk_size):
+        block = np.asarray(epochs[start:start + chunk_size], dtype=np.float64)
+        features[start:start + len(block)] = np.log(block.var(axis=2) + np.finfo(np.float64).tiny)
+    return features
+
+### Riemannian covariance features ###
+
+def _matrix_function(mats, func):
+    """Apply func to the eigenvalues of a stack of symmetric matrices with one batched eigh call."""
+    eigvals, eigvecs = np.linalg.eigh(mats)
+    return (eigvecs * func(eigvals)[..., None, :]) @ np.swapaxes(eigvecs, -1, -2)
+
+def _logm(mats):
+    return _matrix_function(mats, lambda w: np.log(np.maximum(w, np.finfo(w.dtype).tiny)))
+
+def _expm(mats):
+    return _matrix_function(mats, np.exp)
+
+def _sqrtm_pair(mat):
+    """Return (mat^1/2, mat^-1/2) for a single SPD matrix from one eigendecomposition."""
+    eigvals, eigvecs = np.linalg.eigh(mat)
+    root = np.sqrt(np.maximum(eigvals, np.finfo(eigvals.dtype).tiny))
+    return (eigvecs * root) @ eigvecs.T, (eigvecs / root) @ eigvecs.T
+
+def epoch_covariances(epochs, dtype=np.float64, chunk_size=256, shrinkage=0.0):
+    """Compute the spatial covariance matrix of every epoch.
+
+    Parameters:
+    epochs (array-like): Epoched EEG of shape (n_epochs, n_channels, n_times), may be a memmap.
+    dtype (np.dtype): Working precision, np.float32 halves memory use.
+    chunk_size (int): Number of epochs converted and processed at a time.
+    shrinkage (float): Amount of shrinkage towards a scaled identity (0 to 1), keeps matrices well conditioned.
+
+    Returns:
+    np.ndarray: Covariance matrices of shape (n_epochs, n_channels, n_channels).
+    """
+    n_epochs, n_channels, n_times = epochs.shape
+    covs = np.empty((n_epochs, n_channels, n_channels), dtype=dtype)
+    eye = np.eye(n_channels, dtype=dtype)
+    for start in range(0, n_epochs, chunk_size):
+        block = np.asarray(epochs[start:start + chunk_size], dtype=dtype)
+        block = block - block.mean(axis=2, keepdims=True)
+        cov = np.matmul(block, np.swapaxes(block, 1, 2)) / (n_times - 1)
+        if shrinkage:
+            mu = np.trace(cov, axis1=1, axis2=2)[:, None, None] / n_channels
+            cov = (1 - shrinkage) * cov + shrinkage * mu * eye
+        covs[start:start + len(block)] = cov
+    return covs
+
+class RiemannianMean:
+    """Geometric (Karcher) mean of SPD matrices that can be updated incrementally.
+
+    fit() runs the full Karcher iteration over all matrices. partial_fit() moves the current
+    mean along the geodesic towards each new batch, weighted by the number of matrices seen,
+    so the reference can follow new sessions without revisiting old data.
+    """
+
+    def __init__(self, dtype=np.float64, chunk_size=256, max_iter=50, tol=1e-7):
+        self.dtype = dtype
+        self.chunk_size = chunk_size
+        self.max_iter = max_iter
+        self.tol = tol
+        self.mean_ = None
+        self.n_samples_seen_ = 0
+
+    def _mean_tangent(self, covs, mean):
+        """Mean of log(M^-1/2 C M^-1/2) over covs, accumulated chunk by chunk."""
+        _, isqrt = _sqrtm_pair(mean)
+        total = np.zeros_like(mean)
+        for start in range(0, len(covs), self.chunk_size):
+            block = np.asarray(covs[start:start + self.chunk_size], dtype=self.dtype)
+            total += _logm(isqrt @ block @ isqrt).sum(axis=0)
+        return total / len(covs)
+
+    def fit(self, covs):
+        """Compute the Karcher mean of covs from scratch.
+
+        Parameters:
+        covs (array-like): SPD matrices of shape (n_matrices, C, C).
+
+        Returns:
+        RiemannianMean: self.
+        """
+        # Log-Euclidean mean is a close starting point, usually a few iterations are enough
+        total = 0
+        for start in range(0, len(covs), self.chunk_size):
+            total = total + _logm(np.asarray(covs[start:start + self.chunk_size], dtype=self.dtype)).sum(axis=0)
+        mean = _expm(total / len(covs))
+        for _ in range(self.max_iter):
+            tangent = self._mean_tangent(covs, mean)
+            sqrt, _ = _sqrtm_pair(mean)
+            mean = sqrt @ _expm(tangent) @ sqrt
+            if np.linalg.norm(tangent) < self.tol:
+                break
+        self.mean_ = mean
+        self.n_samples_seen_ = len(covs)
+        return self
+
+    def partial_fit(self, covs):
+        """Update the mean with a new batch of matrices.
+
+        Parameters:
+        covs (array-like): SPD matrices of shape (n_matrices, C, C).
+
+        Returns:
+        RiemannianMean: self.
+        """
+        if self.mean_ is None:
+            return self.fit(covs)
+        step = len(covs) / (self.n_samples_seen_ + len(covs))
+        tangent = self._mean_tangent(covs, self.mean_)
+        sqrt, _ = _sqrtm_pair(self.mean_)
+        self.mean_ = sqrt @ _expm(step * tangent) @ sqrt
+        self.n_samples_seen_ += len(covs)
+        return self
+
+def tangent_space(covs, reference, chunk_size=256):
+    """Project covariance matrices onto the tangent space at reference.
+
+    Parameters:
+    covs (array-like): SPD matrices of shape (n_epochs, C, C).
+    reference (np.ndarray): Reference SPD matrix of shape (C, C), usually a RiemannianMean.
+    chunk_size (int): Number of matrices processed at a time.
+
+    Returns:
+    np.ndarray: Feature matrix of shape (n_epochs, C * (C + 1) / 2) in the dtype of reference.
+    """
+    dtype = reference.dtype
+    n_channels = reference.shape[0]
+    _, isqrt = _sqrtm_pair(reference)
+    rows, cols = np.triu_indices(n_channels)
+    # Off-diagonal terms are weighted by sqrt(2) so the Euclidean norm matches the Riemannian one
+    weights = np.where(rows == cols, 1.0, np.sqrt(2)).astype(dtype)
+    features = np.empty((len(covs), len(rows)), dtype=dtype)
+    for start in range(0, len(covs), chunk_size):
+        block = np.asarray(covs[start:start + chunk_size], dtype=dtype)
+        logs = _logm(isqrt @ block @ isqrt)
+        features[start:start + len(block)] = logs[:, rows, cols] * weights
+    return features
+
+def tangent_space_features(epochs, store=None, source=None, reference=None, dtype=np.float64, chunk_size=256):
+    """Riemannian tangent-space features, an alternative to band power for the ai_backend classifiers.
+
+    With a store, the covariances, the estimated reference and the features are all cached, so a cache hit
+    reads the features back without computing covariances or refitting the mean.
+
+    Parameters:
+    epochs (array-like): Epoched EEG of shape (n_epochs, n_channels, n_times).
+    store (FeatureStore or None): Feature store used to cache covariances, reference and features.
+    source (str or None): Identity of the data for the cache, e.g. the .edf filepath. Defaults to the
+        fingerprint of epochs (a whole memory-mapped file is identified without reading it).
+    reference (np.ndarray or None): Reference matrix, estimated from the epochs when None.
+    dtype (np.dtype): Working precision (np.float64 or np.float32).
+    chunk_size (int): Number of epochs processed at a time.
+
+    Returns:
+    tuple: (X, reference) where X has shape (n_epochs, C * (C + 1) / 2) and can be passed as the
+    feature matrix of an ai_backend datafile.
+    """
+    dtype = np.dtype(dtype)
+
+    def compute_covs():
+        return epoch_covariances(epochs, dtype=dtype, chunk_size=chunk_size)
+
+    def compute_reference(covs):
+        return RiemannianMean(dtype=dtype, chunk_size=chunk_size).fit(covs).mean_
+
+    if store is None:
+        covs = compute_covs()
+        reference = compute_reference(covs) if reference is None else reference
+        reference = np.asarray(reference, dtype=dtype)
+        return tangent_space(covs, reference, chunk_size=chunk_size), reference
+
+    source = epochs if source is None else source
+    params = {"dtype": dtype.name}
+
+    def cached_covs():
+        return store.get_or_compute("covariance", source, params, compute_covs)
+
+    if reference is None:
+        reference = store.get_or_compute("riemannian_mean", source, params, lambda: compute_reference(cached_covs()))
+    reference = np.array(reference, dtype=dtype)
+    X = store.get_or_compute("tangent_space", source, {**params, "reference": source_fingerprint(reference)},
+                             lambda: tangent_space(cached_covs(), reference, chunk_size=chunk_size))
+    return X, reference
+
+def _iter_chunk_results(func, n_items, chunk_size, n_jobs=1):
+    """Helper generator that applies func(start, stop) to consecutive chunks and yields (start, result) in order.
+
+    With n_jobs > 1 chunks run on a thread pool (numpy releases the GIL in FFTs and BLAS calls),
+    keeping at most 2 * n_jobs chunks in flight so memory stays bounded.
+    """
+    starts = range(0, n_items, chunk_size)
+    if n_jobs is None or n_jobs <= 1:
+        for start in starts:
+            yield start, func(start, min(start + chunk_size, n_items))
+        return
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        for start in starts:
+            pending.append((start, executor.submit(func, start, min(start + chunk_size, n_items))))
+            if len(pending) >= 2 * n_jobs:
+                first, future = pending.popleft()
+                yield first, future.result()
+        while pending:
+            first, future = pending.popleft()
+            yield first, future.result()
+
+### Spectral connectivity features ###
+
+def connectivity_features(epochs, sfreq, bands=((8, 13), (13, 30)), method='coh', chunk_size=64, n_jobs=1,
+                          store=None, source=None, dtype=np.float64):
+    """Compute coherence or phase locking value between every pair of channels in each epoch.
+
+    Every epoch is transformed with a single FFT and the cross-spectra of all channel pairs in the
+    upper triangle are formed at once. Within a band the cross-spectrum is averaged over the frequency
+    bins of the epoch, giving one value per (band, pair).
+
+    Parameters:
+    epochs (array-like): Epoched EEG of shape (n_epochs, n_channels, n_times), may be a memmap.
+    sfreq (float): Sampling frequency in Hz.
+    bands (list of tuple): Frequency bands as (low, high) in Hz.
+    method (str): 'coh' for magnitude coherence or 'plv' for phase locking value.
+    chunk_size (int): Number of epochs processed at a time.
+    n_jobs (int): Number of threads used to process chunks.
+    store (FeatureStore or None): Feature store used to cache the result.
+    source (str or None): Identity of the data for the cache, e.g. the .edf filepath. Defaults to hashing epochs.
+    dtype (np.dtype): Precision of the output features.
+
+    Returns:
+    np.ndarray: Feature matrix of shape (n_epochs, n_bands * n_pairs), ordered band by band,
+    that can be passed as the feature matrix of an ai_backend datafile.
+    """
+    if method not in ('coh', 'plv'):
+        raise ValueError(f"Unknown connectivity method {method}")
+    n_epochs, n_channels, n_times = epochs.shape
+    rows, cols = np.triu_indices(n_channels, k=1)
+    n_pairs = len(rows)
+    freqs = np.fft.rfftfreq(n_times, d=1.0 / sfreq)
+    band_bins = [np.flatnonzero((freqs >= low) & (freqs <= high)) for low, high in bands]
+    if any(len(bins) == 0 for bins in band_bins):
+        raise ValueError("Every frequency band must contain at least one FFT bin")
+    window = np.hanning(n_times)
+    tiny = np.finfo(np.float64).tiny
+
+    def compute_chunk(start, stop):
+        block = np.asarray(epochs[start:stop], dtype=np.float64)
+        block = (block - block.mean(axis=2, keepdims=True)) * window
+        spectra = np.fft.rfft(block, axis=2)
+        out = np.empty((stop - start, len(bands), n_pairs), dtype=dtype)
+        for b, bins in enumerate(band_bins):
+            spec = spectra[:, :, bins]
+            if method == 'plv':
+                spec = spec / np.maximum(np.abs(spec), tiny)
+            cross = np.einsum('npf,npf->np', spec[:, rows], spec[:, cols].conj())
+            if method == 'plv':
+                out[:, b] = np.abs(cross) / len(bins)
+            else:
+                power = np.einsum('ncf,ncf->nc', spec, spec.conj()).real
+                out[:, b] = np.abs(cross) / np.sqrt(np.maximum(power[:, rows] * power[:, cols], tiny))
+        return out.reshape(stop - start, -1)
+
+    shape = (n_epochs, len(bands) * n_pairs)
+    chunks = _iter_chunk_results(compute_chunk, n_epochs, chunk_size, n_jobs)
+    if store is None:
+        features = np.empty(shape, dtype=dtype)
+        for start, block in chunks:
+            features[start:start + len(block)] = block
+        return features
+
+    source = epochs if source is None else source
+    params = {"sfreq": sfreq, "bands": [list(band) for band in bands], "method": method, "dtype": np.dtype(dtype).name}
+    key = store.key(f"connectivity_{method}", source, params)
+    if store.contains(key):
+        return store.load(key)
+    return store.write_chunks(key, shape, dtype, chunks)
+
+### Feature extraction ###
+
+FEATURE_METHODS = ("log_variance", "tangent_space", "coherence", "plv")
+
+def epoch_features(epochs, sfreq, method='log_variance', store=None, source=None):
+    """Feature matrix of epochs for the ai_backend classifiers.
+
+    Parameters:
+    epochs (array-like): Epoched EEG of shape (n_epochs, n_channels, n_times), may be a memmap.
+    sfreq (float): Sampling frequency in Hz.
+    method (str): One of FEATURE_METHODS. 'tangent_space' projects the epochs at their own Riemannian mean,
+        'coherence' and 'plv' are the alpha and beta band connectivity of every channel pair.
+    store (FeatureStore or None): Feature store used to cache the result.
+    source (str or None): Identity of the data for the cache, e.g. the .edf filepath.
+
+    Returns:
+    np.ndarray: Feature matrix of shape (n_epochs, n_features).
+
+    Raises:
+    ValueError: If the method is unknown.
+    """
+    if method == 'log_variance':
+        return log_variance_features(epochs)
+    if method == 'tangent_space':
+        return tangent_space_features(epochs, store=store, source=source)[0]
+    if method in ('coherence', 'plv'):
+        return connectivity_features(epochs, sfreq, method='coh' if method == 'coherence' else 'plv', store=store,
+                                     source=source)
+    raise ValueError(f"Unknown feature method {method}")
+
+### Project training data ###
+
+def project_training_files(project_json_filepath):
+    """Helper function that lists the recordings the ML page trains on: the .edf files in data/preprocessed_data,
+    or in data/input_data while nothing has been preprocessed yet."""
+    project_dir = os.path.dirname(os.path.abspath(project_json_filepath))
+    for folder in ('preprocessed_data', 'input_data'):
+        path = os.path.join(project_dir, 'data', folder)
+        if os.path.isdir(path):
+            files = [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.lower().endswith('.edf')]
+            if files:
+                return files
+    return []
+
+def project_training_data(project_json_filepath, method='log_variance', window=1.0, step=None, files=None, store=None):
+    """Epochs, features, labels and sessions of a project's recordings, computed through its FeatureStore.
+
+    Every recording is one session. Its epochs (float32) and features are cached per file with
+    FeatureStore.get_or_compute_sessions, so after adding a recording only that file is read and extracted.
+
+    Parameters:
+    project_json_filepath (str): Path to the project.json file.
+    method (str): Feature method, one of FEATURE_METHODS.
+    window (float): Epoch length in seconds.
+    step (float or None): Time between the windows of unannotated recordings, see recording_windows.
+    files (list or None): Recordings to use, defaults to project_training_files(project_json_filepath).
+    store (FeatureStore or None): Feature store, defaults to the project's.
+
+    Returns:
+    dict: "X" (features, memmap), "y" (labels, None unless every recording is annotated), "groups" (recording of
+        every row), "epochs" (memmap of shape (n_epochs, n_channels, n_times)), "sfreq", "files", "new_files"
+        (recordings extracted by this call), "method" and "window".
+
+    Raises:
+    ValueError: If there are no recordings or the method is unknown.
+    """
+    import mne
+    if method not in FEATURE_METHODS:
+        raise ValueError(f"Unknown feature method {method}")
+    files = [os.path.abspath(path) for path in (files if files is not None else project_training_files(project_json_filepath))]
+    if not files:
+        raise ValueError("The project has no .edf recordings")
+    store = store or project_feature_store(project_json_filepath)
+    params = {"window": window, "step": step}
+
+    def session_epochs(filepath):
+        return store.get_or_compute("epochs", filepath, params,
+                                    lambda: np.asarray(recording_epochs(filepath, window, step)[0], dtype=np.float32))
+
+    headers = [mne.io.read_raw_edf(filepath, preload=False, verbose=False) for filepath in files]
+    sfreq = headers[0].info['sfreq']
+    epochs, _ = store.get_or_compute_sessions("epochs", files, params, session_epochs)
+    X, new_files = store.get_or_compute_sessions(f"features_{method}", files, params,
+                                                 lambda filepath: epoch_features(session_epochs(filepath), sfreq, method))
+    # Labels only need the annotations, the data of cached recordings is not read again
+    windows = [recording_windows(raw, window, step) for raw in headers]
+    y = None if any(labels is None for _, labels in windows) else np.concatenate([labels for _, labels in windows])
+    groups = np.repeat(np.array(files), [len(starts) for starts, _ in windows])
+    return {"X": X, "y": y, "groups": groups, "epochs": epochs, "sfreq": sfreq,
+            "files": files, "new_files": new_files, "method": method, "window": window}
@@ -0,0 +1,532 @@
+import os
+import re
+import tempfile
+import multiprocessing
+import mne
+import numpy as np
+from collections import OrderedDict
+from scipy import linalg
+from scipy.spatial import Delaunay
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+"""
+Helpers for browsing fitted ICA decompositions. The mixing matrix, a short window of every source and
+the topographies of all components are computed once, with one matrix product for all the topographies.
+Thumbnails (source trace and topography) are then rendered on demand, one component at a time, and kept
+in a small LRU cache, so a list view only pays for the rows that are actually shown.
+
+Components are also labelled automatically from a handful of features computed for all sources at once
+on evenly spaced segments of the recording, so artifacts can be preselected without EOG channels.
+
+When recordings are added, a stored ICA is updated instead of refitted: the data are projected on its PCA
+basis, re-whitened within it, and the solver starts from the stored unmixing matrix, so it only iterates
+until it converges on the new data. OnlineIca does the same with natural-gradient infomax updates, chunk
+by chunk, for streams.
+"""
+
+# A component gets the first label whose feature crosses its threshold, "brain" when none does
+ARTIFACT_THRESHOLDS = {
+    "line_noise": ("line_noise_ratio", 10.0),      # Power at 50/60 Hz over the neighbouring frequencies
+    "eye": ("frontal_correlation", 0.5),           # Largest |correlation| with a frontal or EOG channel
+    "channel_noise": ("focality", 0.7),            # Share of the topography's energy on a single channel
+    "muscle": ("spectral_slope", -0.5),            # log-log slope of the spectrum between fmin and fmax
+    "transient": ("kurtosis", 10.0),               # Excess kurtosis of the source
+}
+
+FRONTAL_CHANNELS = re.compile(r'^(fp|af|f[78]$|f9$|f10$)', re.IGNORECASE)
+
+def sensor_positions_2d(info):
+    """Project the 3D sensor positions of an Info onto the plane of a topographic map.
+
+    A sphere is fitted to the positions and every sensor is placed at its azimuth, at a radius
+    proportional to its angle from the top of the sphere (0.5 on the equator).
+
+    Returns:
+    np.ndarray or None: Positions of shape (n_channels, 2), None when the channels have no positions.
+    """
+    pos = np.array([ch['loc'][:3] for ch in info['chs']], dtype=float)
+    if len(pos) < 4 or not np.isfinite(pos).all() or np.allclose(pos, 0.0):
+        return None
+    # Algebraic sphere fit: |p|^2 = 2 p.c + (r^2 - |c|^2)
+    A = np.c_[2.0 * pos, np.ones(len(pos))]
+    solution = np.linalg.lstsq(A, (pos ** 2).sum(axis=1), rcond=None)[0]
+    directions = pos - solution[:3]
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    radius = np.arccos(np.clip(directions[:, 2], -1.0, 1.0)) / np.pi
+    azimuth = np.arctan2(directions[:, 1], directions[:, 0])
+    return np.c_[radius * np.cos(azimuth), radius * np.sin(azimuth)]
+
+def topomap_interpolation(positions, resolution=48):
+    """Linear interpolation matrix from sensors to a square image grid.
+
+    Parameters:
+    positions (np.ndarray): 2D sensor positions of shape (n_channels, 2).
+    resolution (int): Number of pixels on each side of the image.
+
+    Returns:
+    tuple: (weights, inside, extent), weights of shape (resolution ** 2, n_channels) so that
+        weights @ values is the image of one map, inside marks the pixels within the sensor hull
+        and extent is the (left, right, bottom, top) of the grid for imshow.
+    """
+    limit = np.abs(positions).max() * 1.05
+    grid = np.linspace(-limit, limit, resolution)
+    gx, gy = np.meshgrid(grid, grid)
+    points = np.c_[gx.ravel(), gy.ravel()]
+    triangulation = Delaunay(positions)
+    simplex = triangulation.find_simplex(points)
+    inside = simplex >= 0
+    # Barycentric coordinates of the pixels inside the hull in their triangle
+    transform = triangulation.transform[simplex[inside]]
+    partial = np.einsum('nij,nj->ni', transform[:, :2], points[inside] - transform[:, 2])
+    barycentric = np.c_[partial, 1.0 - partial.sum(axis=1)]
+    weights = np.zeros((len(points), len(positions)))
+    rows = np.flatnonzero(inside)[:, None]
+    weights[rows, triangulation.simplices[simplex[inside]]] = barycentric
+    return weights, inside, (-limit, limit, -limit, limit)
+
+class IcaComponentCache:
+    """Precomputed data and cached thumbnails of the components of a fitted ICA.
+
+    Parameters:
+    ica (mne.preprocessing.ICA): The fitted ICA.
+    raw (mne.io.Raw): The recording the sources are shown for.
+    trace_seconds (float): Length of the source traces shown in the thumbnails.
+    resolution (int): Number of pixels on each side of the topographies.
+    max_thumbnails (int): Number of rendered thumbnails kept in memory.
+    """
+
+    def __init__(self, ica, raw, trace_seconds=10.0, resolution=48, max_thumbnails=128):
+        self.components = ica.get_components()  # (n_channels, n_components), computed once
+        self.n_components = self.components.shape[1]
+        sfreq = raw.info['sfreq']
+        stop = min(raw.n_times, max(1, int(trace_seconds * sfreq)))
+        self.times = np.arange(stop) / sfreq
+        self.sources = ica.get_sources(raw, start=0, stop=stop).get_data()
+        self.topomaps = None
+        self.positions = sensor_positions_2d(ica.info)
+        if self.positions is not None:
+            weights, inside, self.extent = topomap_interpolation(self.positions, resolution)
+            maps = (weights @ self.components).T
+            maps[:, ~inside] = np.nan
+            self.topomaps = maps.reshape(self.n_components, resolution, resolution)
+        self.max_thumbnails = max_thumbnails
+        self._thumbnails = OrderedDict()
+
+    def has_thumbnail(self, index, width, height):
+        return (index, width, height) in self._thumbnails
+
+    def thumbnail(self, index, width=480, height=120, dpi=100):
+        """Render the source trace and topography of a component, cached by (index, width, height).
+
+        Returns:
+        np.ndarray: RGBA image of shape (height, width, 4), dtype uint8.
+        """
+        key = (index, width, height)
+        if key in self._thumbnails:
+            self._thumbnails.move_to_end(key)
+            return self._thumbnails[key]
+        figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        canvas = FigureCanvasAgg(figure)
+        if self.topomaps is not None:
+            ax_time = figure.add_axes([0.06, 0.18, 0.66, 0.72])
+            ax_topo = figure.add_axes([0.76, 0.04, 0.22, 0.92])
+            topomap = self.topomaps[index]
+            limit = np.nanmax(np.abs(topomap)) or 1.0
+            ax_topo.imshow(topomap, origin='lower', extent=self.extent, cmap='RdBu_r', vmin=-limit, vmax=limit,
+                           interpolation='bilinear')
+            ax_topo.plot(self.positions[:, 0], self.positions[:, 1], 'k.', markersize=1)
+            ax_topo.set_axis_off()
+        else:
+            ax_time = figure.add_axes([0.06, 0.18, 0.92, 0.72])
+        # A couple of points per pixel are enough for the trace
+        step = max(1, len(self.times) // (2 * width))
+        ax_time.plot(self.times[::step], self.sources[index, ::step], linewidth=0.5)
+        ax_time.set_title(f"Component {index}", fontsize=8)
+        ax_time.tick_params(labelsize=6)
+        ax_time.set_yticks([])
+        canvas.draw()
+        image = np.asarray(canvas.buffer_rgba()).copy()
+        self._thumbnails[key] = image
+        if len(self._thumbnails) > self.max_thumbnails:
+            self._thumbnails.popitem(last=False)
+        return image
+
+def _scoring_segments(raw, segment_seconds, n_segments):
+    """Start samples and length of evenly spaced, non-overlapping segments of a recording."""
+    length = min(raw.n_times, max(1, int(round(segment_seconds * raw.info['sfreq']))))
+    n_segments = max(1, min(n_segments, raw.n_times // length))
+    starts = np.linspace(0, raw.n_times - length, n_segments).astype(int)
+    return starts, length
+
+def score_ica_components(ica, raw, segment_seconds=2.0, n_segments=120, fmin=2.0, fmax=40.0, line_freqs=(50.0, 60.0),
+                         thresholds=None):
+    """Compute artifact features for every component of a fitted ICA and label the likely artifacts.
+
+    All features come from one pass over n_segments evenly spaced segments of the recording:
+    spectral_slope - slope of log10 power against log10 frequency between fmin and fmax (flat for muscle).
+    kurtosis - excess kurtosis of the source (peaky for blinks and jumps).
+    frontal_correlation - largest |correlation| of the source with a frontal (Fp, AF, F7/F8...) or EOG channel.
+    line_noise_ratio - power at the line frequency over the median power 3 to 8 Hz away from it.
+    focality - largest share of the squared topography on one channel (bad electrodes).
+
+    Parameters:
+    ica (mne.preprocessing.ICA): The fitted ICA.
+    raw (mne.io.Raw): The recording the ICA was fitted on.
+    segment_seconds (float): Length of each segment in seconds.
+    n_segments (int): Number of segments, fewer when the recording is short.
+    fmin (float): Lowest frequency of the slope fit in Hz.
+    fmax (float): Highest frequency of the slope fit in Hz.
+    line_freqs (tuple): Candidate line frequencies in Hz, the one with the largest ratio is used.
+    thresholds (dict or None): Overrides of ARTIFACT_THRESHOLDS, {label: (feature, threshold)}.
+
+    Returns:
+    dict: One array of shape (n_components,) per feature, "labels" (list of str) and "exclude"
+        (indices of the components not labelled "brain").
+    """
+    thresholds = {**ARTIFACT_THRESHOLDS, **(thresholds or {})}
+    sfreq = raw.info['sfreq']
+    frontal = [name for name, kind in zip(raw.ch_names, raw.get_channel_types())
+               if kind == 'eog' or (kind == 'eeg' and FRONTAL_CHANNELS.match(name))]
+    picks = list(ica.ch_names) + [name for name in frontal if name not in ica.ch_names]
+    starts, length = _scoring_segments(raw, segment_seconds, n_segments)
+    data = np.concatenate([raw.get_data(picks=picks, start=start, stop=start + length) for start in starts], axis=1)
+    segments_raw = mne.io.RawArray(data[:len(ica.ch_names)], mne.pick_info(raw.info, mne.pick_channels(
+        raw.ch_names, list(ica.ch_names), ordered=True)), verbose=False)
+    sources = ica.get_sources(segments_raw).get_data()  # (n_components, n_segments * length)
+    n_components = len(sources)
+
+    # Standardized sources serve both the kurtosis and the correlations
+    z = sources - sources.mean(axis=1, keepdims=True)
+    z /= np.maximum(z.std(axis=1, keepdims=True), np.finfo(float).tiny)
+    kurtosis = (z ** 4).mean(axis=1) - 3.0
+    frontal_correlation = np.zeros(n_components)
+    if frontal:
+        reference = data[[picks.index(name) for name in frontal]]
+        reference = reference - reference.mean(axis=1, keepdims=True)
+        reference /= np.maximum(reference.std(axis=1, keepdims=True), np.finfo(float).tiny)
+        frontal_correlation = np.abs(z @ reference.T / z.shape[1]).max(axis=1)
+
+    # Averaged Hann-windowed periodograms of all segments of all sources
+    window = np.hanning(length)
+    psd = (np.abs(np.fft.rfft(sources.reshape(n_components, len(starts), length) * window, axis=2)) ** 2).mean(axis=1)
+    freqs = np.fft.rfftfreq(length, 1.0 / sfreq)
+    psd = np.maximum(psd, np.finfo(float).tiny)
+    line_noise_ratio = np.zeros(n_components)
+    near_line = np.zeros(len(freqs), dtype=bool)
+    for line_freq in line_freqs:
+        if line_freq + 8.0 >= sfreq / 2.0:
+            continue
+        distance = np.abs(freqs - line_freq)
+        near_line |= distance <= 2.0
+        peak = psd[:, distance <= 1.0].max(axis=1)
+        neighbours = np.median(psd[:, (distance >= 3.0) & (distance <= 8.0)], axis=1)
+        line_noise_ratio = np.maximum(line_noise_ratio, peak / neighbours)
+    band = (freqs >= fmin) & (freqs <= min(fmax, sfreq / 2.0)) & ~near_line
+    design = np.c_[np.log10(freqs[band]), np.ones(band.sum())]
+    spectral_slope = np.linalg.lstsq(design, np.log10(psd[:, band]).T, rcond=None)[0][0]
+
+    topographies = ica.get_components() ** 2
+    focality = topographies.max(axis=0) / topographies.sum(axis=0)
+
+    features = {"spectral_slope": spectral_slope, "kurtosis": kurtosis, "frontal_correlation": frontal_correlation,
+                "line_noise_ratio": line_noise_ratio, "focality": focality}
+    labels = ["brain"] * n_components
+    for label, (feature, threshold) in reversed(list(thresholds.items())):
+        for i in np.flatnonzero(features[feature] >= threshold):
+            labels[i] = label
+    return {**features, "labels": labels, "exclude": [i for i, label in enumerate(labels) if label != "brain"]}
+
+### Incremental ICA ###
+
+def _whitened_sources_space(ica, data):
+    """Project sensor data on the PCA basis of a fitted ICA and scale it to unit variance per component.
+
+    Parameters:
+    ica (mne.preprocessing.ICA): The fitted ICA.
+    data (np.ndarray): Data of shape (n_channels, n_samples) for the channels ica.ch_names.
+
+    Returns:
+    np.ndarray: Whitened data of shape (n_components, n_samples).
+    """
+    if ica.noise_cov is None:
+        data = data / ica.pre_whitener_
+    else:
+        data = ica.pre_whitener_ @ data
+    n_components = ica.n_components_
+    scores = ica.pca_components_[:n_components] @ (data - ica.pca_mean_[:, None])
+    return scores / np.sqrt(ica.pca_explained_variance_[:n_components])[:, None]
+
+def _stored_unmixing(ica):
+    """Unmixing matrix of a fitted ICA in its whitened space (mne stores it divided by the PCA norms)."""
+    return ica.unmixing_matrix_ * np.sqrt(ica.pca_explained_variance_[:ica.n_components_])[None, :]
+
+def _with_unmixing(ica, unmixing, n_iter):
+    """Copy of a fitted ICA with a new whitened-space unmixing matrix."""
+    updated = ica.copy()
+    updated.unmixing_matrix_ = unmixing / np.sqrt(ica.pca_explained_variance_[:ica.n_components_])[None, :]
+    updated.mixing_matrix_ = linalg.pinv(updated.unmixing_matrix_)
+    updated.n_iter_ = n_iter
+    return updated
+
+def _solve_ica(method, fit_params, z, w_init, random_state):
+    """Run the solver of the ICA's method on whitened data of shape (n_components, n_samples).
+
+    Returns:
+    tuple: (unmixing, n_iter), unmixing in the whitened space.
+    """
+    if method == 'fastica':
+        from sklearn.decomposition import fastica
+        params = {key: value for key, value in fit_params.items() if key not in ('w_init', 'whiten')}
+        _, unmixing, _, n_iter = fastica(z.T, whiten=False, w_init=w_init, random_state=random_state,
+                                         return_n_iter=True, **params)
+        return unmixing, n_iter
+    if method in ('infomax', 'extended-infomax'):
+        from mne.preprocessing import infomax
+        params = {key: value for key, value in fit_params.items() if key != 'weights'}
+        if w_init is not None and params.get('l_rate') is None:
+            # Infomax anneals from a large default step that throws a warm start back out, start a tenth of it
+            params['l_rate'] = 0.1 * 0.01 / np.log(len(z) ** 2.0)
+        return infomax(z.T, weights=w_init, rng=random_state, return_n_iter=True, verbose=False, **params)
+    raise ValueError(f"Incremental updates are not supported for ICA method {method}")
+
+def update_ica(ica, raw, compare_cold=False, random_state=0):
+    """Update a fitted ICA on new data, starting from its unmixing matrix instead of from scratch.
+
+    The data are projected on the stored PCA basis and re-whitened within it (the new covariance is never
+    exactly the identity), the stored unmixing matrix is mapped through that re-whitening and used as the
+    initial matrix of the ICA's solver (fastica or infomax), which then only iterates until convergence.
+
+    Parameters:
+    ica (mne.preprocessing.ICA): The fitted ICA, e.g. read with mne.preprocessing.read_ica. It is not modified.
+    raw (mne.io.Raw): The data to update on (the new recording, or the old and new ones concatenated).
+    compare_cold (bool): Also fit from scratch on the same data to measure the iterations saved exactly,
+        otherwise the iterations of the stored fit are the reference.
+    random_state (int): Seed of the cold fit.
+
+    Returns:
+    tuple: (updated_ica, report), report has "n_iter" (iterations of the update), "reference_iter",
+        "iterations_saved" and "unmixing_change" (relative Frobenius change of the whitened unmixing matrix).
+
+    Raises:
+    ValueError: If the method of the ICA has no warm-started solver (e.g. picard).
+    """
+    z = _whitened_sources_space(ica, raw.get_data(picks=list(ica.ch_names), reject_by_annotation='omit'))
+    z -= z.mean(axis=1, keepdims=True)
+    # Symmetric re-whitening within the stored basis: z = C^(1/2) z_white, so W z = (W C^(1/2)) z_white
+    eigenvalues, eigenvectors = linalg.eigh(np.cov(z))
+    eigenvalues = np.maximum(eigenvalues, np.finfo(float).eps)
+    sqrt_cov = (eigenvectors * np.sqrt(eigenvalues)) @ eigenvectors.T
+    inv_sqrt_cov = (eigenvectors / np.sqrt(eigenvalues)) @ eigenvectors.T
+    z_white = inv_sqrt_cov @ z
+    stored = _stored_unmixing(ica)
+    unmixing, n_iter = _solve_ica(ica.method, ica.fit_params, z_white, stored @ sqrt_cov, random_state)
+    unmixing = unmixing @ inv_sqrt_cov
+    reference_iter = getattr(ica, 'n_iter_', None)
+    if compare_cold:
+        _, reference_iter = _solve_ica(ica.method, ica.fit_params, z_white, None, random_state)
+    report = {"n_iter": int(n_iter), "reference_iter": reference_iter,
+              "iterations_saved": None if reference_iter is None else max(0, int(reference_iter) - int(n_iter)),
+              "unmixing_change": float(_unmixing_change(stored, unmixing))}
+    return _with_unmixing(ica, unmixing, n_iter), report
+
+def _unmixing_change(before, after):
+    """Relative change between two unmixing matrices, ignoring the order and sign of their rows."""
+    before = before / np.linalg.norm(before, axis=1, keepdims=True)
+    after = after / np.linalg.norm(after, axis=1, keepdims=True)
+    # Match every new row to the stored row it is most parallel to
+    similarity = np.abs(after @ before.T).max(axis=1)
+    return np.sqrt(np.mean(2.0 - 2.0 * np.minimum(similarity, 1.0)))
+
+class OnlineIca:
+    """Online extended infomax ICA for streams, warm-started from a fitted ICA.
+
+    Every chunk is projected on the ICA's PCA basis and split into blocks, each block makes one
+    natural-gradient step W += lr (I - K tanh(y) y^T / B - y y^T / B) W, where K holds the sign of the
+    kurtosis of each source (running estimate). The update is considered converged once the relative
+    change of W stays below tol for `patience` consecutive blocks.
+
+    Parameters:
+    ica (mne.preprocessing.ICA): The fitted ICA the stream starts from, it is not modified.
+    block_size (int): Number of samples per update.
+    learning_rate (float): Step size of the updates.
+    tol (float): Relative change of W under which a block counts as converged.
+    patience (int): Number of consecutive converged blocks needed to report convergence.
+    kurtosis_decay (float): Forgetting factor of the running moments used for the kurtosis signs.
+    """
+
+    def __init__(self, ica, block_size=256, learning_rate=1e-3, tol=1e-3, patience=10, kurtosis_decay=0.99):
+        self.ica = ica
+        self.block_size = block_size
+        self.learning_rate = learning_rate
+        self.tol = tol
+        self.patience = patience
+        self.kurtosis_decay = kurtosis_decay
+        self.unmixing = _stored_unmixing(ica)
+        n_components = len(self.unmixing)
+        self.second_moment = np.ones(n_components)
+        self.fourth_moment = np.full(n_components, 3.0)
+        self.n_updates_ = 0
+        self.n_stable_ = 0
+        self.converged_update_ = None   # Update at which convergence was first reached
+
+    @property
+    def converged(self):
+        return self.converged_update_ is not None
+
+    def partial_fit(self, data):
+        """Update the unmixing matrix with a chunk of the stream.
+
+        Parameters:
+        data (np.ndarray): Chunk of shape (n_channels, n_samples) for the channels ica.ch_names, samples
+            that do not fill a whole block are dropped.
+
+        Returns:
+        OnlineIca: self.
+        """
+        z = _whitened_sources_space(self.ica, np.asarray(data, dtype=float))
+        identity = np.eye(len(self.unmixing))
+        for start in range(0, z.shape[1] - self.block_size + 1, self.block_size):
+            y = self.unmixing @ z[:, start:start + self.block_size]
+            decay = self.kurtosis_decay
+            self.second_moment = decay * self.second_moment + (1.0 - decay) * (y ** 2).mean(axis=1)
+            self.fourth_moment = decay * self.fourth_moment + (1.0 - decay) * (y ** 4).mean(axis=1)
+            signs = np.sign(self.fourth_moment / self.second_moment ** 2 - 3.0)
+            gradient = identity - ((signs[:, None] * np.tanh(y)) @ y.T + y @ y.T) / self.block_size
+            step = self.learning_rate * gradient @ self.unmixing
+            self.unmixing += step
+            self.n_updates_ += 1
+            self.n_stable_ = self.n_stable_ + 1 if np.linalg.norm(step) < self.tol * np.linalg.norm(self.unmixing) else 0
+            if self.converged_update_ is None and self.n_stable_ >= self.patience:
+                self.converged_update_ = self.n_updates_
+        return self
+
+    def transform(self, data):
+        """Sources of a chunk of shape (n_channels, n_samples) with the current unmixing matrix."""
+        return self.unmixing @ _whitened_sources_space(self.ica, np.asarray(data, dtype=float))
+
+    def to_ica(self):
+        """Copy of the starting ICA with the current unmixing matrix, e.g. to save it or apply it."""
+        return _with_unmixing(self.ica, self.unmixing, self.n_updates_)
+
+    def report(self):
+        """Updates made, whether they converged, and the iterations of the stored batch fit.
+
+        Online steps on single blocks are not batch solver iterations, so unlike update_ica no
+        iterations_saved is computed (it is None).
+        """
+        return {"n_updates": self.n_updates_, "converged_update": self.converged_update_,
+                "reference_iter": getattr(self.ica, 'n_iter_', None), "iterations_saved": None,
+                "unmixing_change": float(_unmixing_change(_stored_unmixing(self.ica), self.unmixing))}
+
+def save_ica_snapshot(ica, directory, exclude=None):
+    """Save an accepted decomposition and its excluded components to a new versioned file.
+
+    The working file of fit_or_update_ica is overwritten by every later update or refit, so pipeline steps
+    refer to a snapshot instead: its exclude indices always belong to the decomposition they were chosen on.
+
+    Parameters:
+    ica (mne.preprocessing.ICA): The fitted ICA, it is not modified.
+    directory (str): Folder of the snapshots, files are named ica_v<n>-ica.fif.
+    exclude (list or None): Indices of the excluded components, defaults to ica.exclude.
+
+    Returns:
+    str: Path of the snapshot.
+    """
+    os.makedirs(directory, exist_ok=True)
+    snapshot = ica.copy()
+    if exclude is not None:
+        snapshot.exclude = [int(i) for i in exclude]
+    version = 1
+    while True:
+        path = os.path.join(directory, f"ica_v{version}-ica.fif")
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))  # Reserve the version
+            break
+        except FileExistsError:
+            version += 1
+    snapshot.save(path, overwrite=True, verbose=False)
+    return path
+
+def fit_or_update_ica(raw, n_components, ica_file=None, random_state=97, output_file=None, **kwargs):
+    """Update the ICA stored in ica_file on raw when it matches, fit a new one otherwise, and store the result.
+
+    Parameters:
+    raw (mne.io.Raw): The recording.
+    n_components (int): Number of components of a new fit.
+    ica_file (str or None): ICA saved with ICA.save (the name must end with -ica.fif), None fits without storing.
+    random_state (int): Seed of a new fit.
+    output_file (str or None): File the result is saved to, defaults to ica_file.
+    kwargs: Other parameters of mne.preprocessing.ICA for a new fit.
+
+    Returns:
+    tuple: (ica, report), report is None for a new fit, see update_ica otherwise.
+    """
+    ica, report = None, None
+    if ica_file is not None and os.path.exists(ica_file):
+        stored = mne.preprocessing.read_ica(ica_file, verbose=False)
+        if stored.n_components_ == n_components and set(stored.ch_names) <= set(raw.ch_names):
+            try:
+                ica, report = update_ica(stored, raw)
+            except ValueError:
+                ica = None
+    if ica is None:
+        ica = mne.preprocessing.ICA(n_components=n_components, random_state=random_state, **kwargs)
+        ica.fit(raw)
+    output_file = output_file or ica_file
+    if output_file is not None:
+        ica.save(output_file, overwrite=True, verbose=False)
+    return ica, report
+
+def _fit_ica_process(raw, n_components, ica_file, output_file, random_state, kwargs, sender):
+    """Process target of fit_or_update_ica_cancellable: fit, save to output_file and send (error, report)."""
+    try:
+        _, report = fit_or_update_ica(raw, n_components, ica_file, random_state, output_file=output_file, **kwargs)
+        sender.send((None, report))
+    except Exception as e:
+        sender.send((str(e), None))
+
+def fit_or_update_ica_cancellable(raw, n_components, ica_file=None, random_state=97, stop_requested=None, poll=0.1,
+                                  **kwargs):
+    """Run fit_or_update_ica in a separate process, so a long fit can be cancelled (e.g. when its window closes).
+
+    The solvers have no way to stop between iterations, the process is terminated instead. The result is
+    written to a temporary file and only stored in ica_file once the fit completed.
+
+    Parameters:
+    raw, n_components, ica_file, random_state, kwargs: See fit_or_update_ica.
+    stop_requested (function or None): Polled every poll seconds, the fit is cancelled once it returns True.
+    poll (float): Interval between checks of stop_requested in seconds.
+
+    Returns:
+    tuple or None: (ica, report) as fit_or_update_ica, None if the fit was cancelled.
+
+    Raises:
+    RuntimeError: If the fit failed.
+    """
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    with tempfile.TemporaryDirectory(prefix="pybci_ica_") as tmp_dir:
+        output_file = os.path.join(tmp_dir, "fit-ica.fif")
+        process = context.Process(target=_fit_ica_process, daemon=True,
+                                  args=(raw, n_components, ica_file, output_file, random_state, kwargs, sender))
+        process.start()
+        sender.close()  # Only the child writes, so a crashed child shows up as EOFError
+        try:
+            while not receiver.poll(poll):
+                if stop_requested is not None and stop_requested():
+                    process.terminate()
+                    return None
+            try:
+                error, report = receiver.recv()
+            except EOFError:
+                raise RuntimeError(f"The ICA process exited with code {process.exitcode}") from None
+        finally:
+            process.join()
+            receiver.close()
+        if error is not None:
+            raise RuntimeError(error)
+        ica = mne.preprocessing.read_ica(output_file, verbose=False)
+    if ica_file is not None:
+        ica.save(ica_file, overwrite=True, verbose=False)
+    return ica, report
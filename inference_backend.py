@@ -0,0 +1,162 @@
+import time
+import numpy as np
+
+"""
+Lightweight inference for real-time decoding. For the tiny windows of an online BCI, sklearn's
+predict spends most of its time validating the input rather than computing, so trained linear
+models are exported to a plain numpy predictor that only does the matrix product and the decision.
+"""
+
+class LinearPredictor:
+    """Numpy-only predictor for linear classifiers.
+
+    Supports three decision rules:
+    'binary' - one score per window, classes_[1] when it is positive (LDA, logistic regression, SGD, linear SVM).
+    'ovr' - one score per class, the highest wins (multiclass LDA, logistic regression, SGD, AdaptiveLDA).
+    'ovo' - one score per pair of classes followed by voting (multiclass SVC with a linear kernel).
+
+    All intermediate arrays are preallocated for max_batch windows, so predict does not allocate.
+    The returned labels are a view of an internal buffer that is overwritten by the next call,
+    copy them if they have to be kept.
+
+    Parameters:
+    coef (np.ndarray): Weights of shape (n_scores, n_features).
+    intercept (np.ndarray): Intercepts of shape (n_scores,).
+    classes (np.ndarray): Class labels.
+    rule (str): 'binary', 'ovr' or 'ovo'.
+    max_batch (int): Number of windows the buffers are allocated for (they grow once if a larger batch comes).
+    """
+
+    def __init__(self, coef, intercept, classes, rule, max_batch=64):
+        if rule not in ('binary', 'ovr', 'ovo'):
+            raise ValueError(f"Unknown decision rule {rule}")
+        self.coef_t = np.ascontiguousarray(np.asarray(coef, dtype=np.float64).T)
+        self.intercept = np.asarray(intercept, dtype=np.float64).ravel().copy()
+        self.classes = np.asarray(classes)
+        self.rule = rule
+        self.n_features, self.n_scores = self.coef_t.shape
+        if rule == 'ovo':
+            # Pair p = (i, j) votes for class i when its score is positive, for class j otherwise:
+            # votes = positive @ (first - second) + second.sum(axis=0)
+            n_classes = len(self.classes)
+            pairs = [(i, j) for i in range(n_classes) for j in range(i + 1, n_classes)]
+            first = np.zeros((len(pairs), n_classes))
+            second = np.zeros((len(pairs), n_classes))
+            for p, (i, j) in enumerate(pairs):
+                first[p, i] = 1.0
+                second[p, j] = 1.0
+            self.vote_matrix = first - second
+            self.vote_base = second.sum(axis=0)
+        self._allocate(max_batch)
+
+    def _allocate(self, max_batch):
+        self.max_batch = max_batch
+        self._scores = np.empty((max_batch, self.n_scores))
+        self._positive = np.empty((max_batch, self.n_scores))
+        self._index = np.empty(max_batch, dtype=np.intp)
+        self._labels = np.empty(max_batch, dtype=self.classes.dtype)
+        if self.rule == 'ovo':
+            self._votes = np.empty((max_batch, len(self.classes)))
+
+    def decision_function(self, X):
+        """Raw scores of shape (n_windows, n_scores), a view of an internal buffer."""
+        n = len(X)
+        if n > self.max_batch:
+            self._allocate(n)
+        scores = self._scores[:n]
+        np.matmul(X, self.coef_t, out=scores)
+        scores += self.intercept
+        return scores
+
+    def predict(self, X):
+        """Predict the labels of a batch of windows.
+
+        Parameters:
+        X (np.ndarray): Feature windows of shape (n_windows, n_features), float64 for exact parity with sklearn.
+
+        Returns:
+        np.ndarray: Labels of shape (n_windows,), a view of an internal buffer.
+        """
+        n = len(X)
+        scores = self.decision_function(X)
+        index = self._index[:n]
+        if self.rule == 'binary':
+            np.greater(scores[:, 0], 0.0, out=index, casting='unsafe')
+        elif self.rule == 'ovr':
+            np.argmax(scores, axis=1, out=index)
+        else:
+            positive = self._positive[:n]
+            votes = self._votes[:n]
+            np.greater(scores, 0.0, out=positive)
+            np.matmul(positive, self.vote_matrix, out=votes)
+            votes += self.vote_base
+            # Ties go to the lowest class index, as in libsvm
+            np.argmax(votes, axis=1, out=index)
+        return np.take(self.classes, index, out=self._labels[:n], mode='clip')
+
+    def predict_one(self, x):
+        """Predict the label of a single window of shape (n_features,)."""
+        return self.predict(x.reshape(1, -1))[0]
+
+def export_linear_model(model, max_batch=64):
+    """Extract the weights of a trained linear classifier into a LinearPredictor.
+
+    Parameters:
+    model (object): A fitted LinearDiscriminantAnalysis, SVC with a linear kernel, LinearSVC,
+        LogisticRegression, SGDClassifier or AdaptiveLDA.
+    max_batch (int): Number of windows the predictor buffers are allocated for.
+
+    Returns:
+    LinearPredictor: The exported predictor.
+
+    Raises:
+    ValueError: If the model is not a linear classifier.
+    """
+    if hasattr(model, '_coefficients'):
+        coef, intercept = model._coefficients()    #AdaptiveLDA computes its weights lazily
+    elif getattr(model, 'kernel', 'linear') == 'linear' and hasattr(model, 'coef_'):
+        coef, intercept = model.coef_, model.intercept_
+    else:
+        raise ValueError(f"{type(model).__name__} is not a linear classifier and cannot be exported")
+    classes = model.classes_
+    n_classes = len(classes)
+    if hasattr(model, 'support_vectors_') and n_classes > 2:
+        # libsvm-based SVC: one classifier per pair of classes in the order (0, 1), (0, 2)... (1, 2)...
+        if getattr(model, 'break_ties', False):
+            raise ValueError("SVC with break_ties=True ranks classes by confidence, only voting is supported")
+        rule = 'ovo'
+    elif coef.shape[0] == 1 and n_classes == 2:
+        rule = 'binary'
+    else:
+        rule = 'ovr'
+    return LinearPredictor(coef, intercept, classes, rule, max_batch)
+
+def benchmark_linear_predictor(model, X, batch_sizes=(1, 8, 64), repeats=2000):
+    """Compare the per-window latency of sklearn's predict and the exported LinearPredictor.
+
+    Parameters:
+    model (object): A fitted linear classifier, see export_linear_model.
+    X (np.ndarray): Windows to predict, of shape (n_windows, n_features).
+    batch_sizes (tuple): Number of windows per predict call.
+    repeats (int): Number of calls timed per batch size.
+
+    Returns:
+    dict: {"parity": bool, batch_size: {"sklearn_us": float, "numpy_us": float, "speedup": float}},
+        latencies in microseconds per window.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    predictor = export_linear_model(model, max_batch=max(batch_sizes))
+    results = {"parity": bool(np.array_equal(model.predict(X), np.concatenate(
+        [predictor.predict(X[start:start + 64]).copy() for start in range(0, len(X), 64)])))}
+    for batch_size in batch_sizes:
+        batches = [X[start:start + batch_size] for start in range(0, len(X) - batch_size + 1, batch_size)]
+        timings = {}
+        for name, predict in (("sklearn_us", model.predict), ("numpy_us", predictor.predict)):
+            predict(batches[0])
+            start = time.perf_counter()
+            for i in range(repeats):
+                predict(batches[i % len(batches)])
+            timings[name] = (time.perf_counter() - start) / (repeats * batch_size) * 1e6
+        timings["speedup"] = timings["sklearn_us"] / timings["numpy_us"]
+        results[batch_size] = timings
+    return results
@@ -2,12 +2,134 @@ from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, QLineEdit,
     QGroupBox, QListWidget, QProgressBar, QFileDialog, QDialog, QListWidgetItem, QStackedWidget
 )
-from PyQt5.QtCore import pyqtSignal, Qt
+import os
+import tempfile
+import numpy as np
+from PyQt5.QtCore import pyqtSignal, Qt, QThread
 from matplotlib.backends.backend_qt5agg import FigureCanvas
 from matplotlib.figure import Figure
 
 #Custom classes and scripts
 from deeplearning_widget import DeepLearningConfigWidget
+from Backend.training_backend import cross_validate_pipeline, successive_halving_search, retrain_with_new_sessions
+from Backend.feature_backend import project_training_data, project_feature_store
+import joblib
+from Backend.model_backend import model_slug, ModelRegistry
+from Backend.deeplearning_backend import (EpochStore, is_deep_learning_config, train_deep_model, sweep_deep_model,
+                                          save_deep_config, model_inputs, normalize_config)
+
+class FeatureWorker(QThread):
+    """Extracts the epochs and features of the project's recordings off the GUI thread."""
+    featuresLoaded = pyqtSignal(dict)  # Emitted with the result of project_training_data
+    featuresFailed = pyqtSignal(str)
+
+    def __init__(self, project_json_filepath, method, window, parent=None):
+        super().__init__(parent)
+        self.project_json_filepath = project_json_filepath
+        self.method = method
+        self.window = window
+
+    def run(self):
+        try:
+            self.featuresLoaded.emit(project_training_data(self.project_json_filepath, self.method, self.window))
+        except Exception as e:
+            self.featuresFailed.emit(str(e))
+
+class TrainingWorker(QThread):
+    """Runs cross-validated training of a pipeline off the GUI thread."""
+    foldFinished = pyqtSignal(dict)  # Emitted for every finished fold or refit
+    trainingFinished = pyqtSignal(list)  # Emitted with the per-model summaries
+    trainingFailed = pyqtSignal(str)
+
+    def __init__(self, pipeline, X, y=None, groups=None, n_splits=5, parent=None):
+        super().__init__(parent)
+        self.pipeline = pipeline
+        self.X = X
+        self.y = y
+        self.groups = groups
+        self.n_splits = n_splits
+
+    def run(self):
+        try:
+            summaries = cross_validate_pipeline(self.pipeline, self.X, self.y, self.groups, n_splits=self.n_splits,
+                                                callback=self.foldFinished.emit, stop_requested=self.isInterruptionRequested)
+            self.trainingFinished.emit(summaries)
+        except Exception as e:
+            if not self.isInterruptionRequested():
+                self.trainingFailed.emit(str(e))
+
+class SearchWorker(QThread):
+    """Runs a successive-halving hyperparameter search off the GUI thread."""
+    candidateFinished = pyqtSignal(dict)  # Emitted for every evaluated candidate
+    searchFinished = pyqtSignal(dict)
+    searchFailed = pyqtSignal(str)
+
+    def __init__(self, model_name, X, y, mode, results_path=None, parent=None):
+        super().__init__(parent)
+        self.model_name = model_name
+        self.X = X
+        self.y = y
+        self.mode = mode
+        self.results_path = results_path
+
+    def run(self):
+        try:
+            result = successive_halving_search(self.model_name, self.X, self.y, mode=self.mode,
+                                               results_path=self.results_path, callback=self.candidateFinished.emit,
+                                               stop_requested=self.isInterruptionRequested)
+            self.searchFinished.emit(result)
+        except Exception as e:
+            if not self.isInterruptionRequested():
+                self.searchFailed.emit(str(e))
+
+class DeepSweepWorker(QThread):
+    """Runs a pruned hyperparameter sweep of a deep learning config off the GUI thread."""
+    trialFinished = pyqtSignal(dict)  # Emitted for every finished or pruned trial
+    sweepFinished = pyqtSignal(dict)
+    sweepFailed = pyqtSignal(str)
+
+    def __init__(self, model_config, X, y, results_path=None, sfreq=None, feature_store=None, parent=None):
+        super().__init__(parent)
+        self.model_config = model_config
+        self.X = X
+        self.y = y
+        self.results_path = results_path
+        self.sfreq = sfreq
+        self.feature_store = feature_store
+
+    def run(self):
+        try:
+            X = model_inputs(self.model_config, self.X, self.sfreq, store=self.feature_store)
+            result = sweep_deep_model(self.model_config, X, self.y, results_path=self.results_path,
+                                      callback=self.trialFinished.emit, stop_requested=self.isInterruptionRequested)
+            self.sweepFinished.emit(result)
+        except Exception as e:
+            if not self.isInterruptionRequested():
+                self.sweepFailed.emit(str(e))
+
+class RetrainWorker(QThread):
+    """Updates the saved models with new sessions off the GUI thread."""
+    modelRetrained = pyqtSignal(dict)  # Emitted for every model saved as a new version
+    retrainFailed = pyqtSignal(str)
+
+    def __init__(self, models_dir, model_names, X, y, X_new, y_new, parent=None):
+        super().__init__(parent)
+        self.models_dir = models_dir
+        self.model_names = model_names
+        self.X = X
+        self.y = y
+        self.X_new = X_new
+        self.y_new = y_new
+
+    def run(self):
+        for model_name in self.model_names:
+            if self.isInterruptionRequested():
+                return  # The models not updated yet keep their previous version
+            try:
+                result = retrain_with_new_sessions(self.models_dir, model_name, self.X, self.y, self.X_new, self.y_new)
+                self.modelRetrained.emit({"model_name": model_name, **result})
+            except Exception as e:
+                self.retrainFailed.emit(f"{model_name}: {e}")
 
 class ModelConfigWidget:
     """Base class for model configuration widgets."""
@@ -79,18 +201,99 @@ class ModelConfigWidget:
                     params[param] = value
         return params
 
+class DeepTrainingWorker(QThread):
+    """Trains the deep learning models of a pipeline one after the other off the GUI thread."""
+    epochFinished = pyqtSignal(dict)  # Emitted after every epoch with its timing and losses
+    modelTrained = pyqtSignal(dict)  # Emitted with the trained model of every config
+    trainingFailed = pyqtSignal(str)
+    trainingInterrupted = pyqtSignal(str, bool)  # Emitted with the stopped model and whether its progress was checkpointed
+
+    def __init__(self, configs, X, y, work_dir, checkpoint_dir=None, sfreq=None, feature_store=None, parent=None):
+        super().__init__(parent)
+        self.configs = configs
+        self.X = X
+        self.y = y
+        self.work_dir = work_dir
+        self.checkpoint_dir = checkpoint_dir
+        self.sfreq = sfreq  # Sampling frequency of the epochs, for configs that take spectrograms
+        self.feature_store = feature_store  # Where those spectrograms are cached
+
+    def run(self):
+        try:
+            # Epochs are written once as float32 and read memory-mapped batch by batch
+            store = EpochStore.create(self.work_dir, self.X, self.y)
+        except Exception as e:
+            self.trainingFailed.emit(str(e))
+            return
+        for config in self.configs:
+            try:
+                X = model_inputs(config, self.X, self.sfreq, store=self.feature_store)
+                model = train_deep_model(config, store.X if X is self.X else X, store.y,
+                                         callback=lambda report: self.epochFinished.emit({"model": config["model"], **report}),
+                                         stop_requested=self.isInterruptionRequested, checkpoint_dir=self.checkpoint_dir)
+                model.sfreq = self.sfreq
+                if self.isInterruptionRequested():
+                    # Data-parallel training (workers above 1) writes no checkpoints
+                    workers = int(normalize_config(config)["hyperparams"].get("workers", 1))
+                    self.trainingInterrupted.emit(config["model"], self.checkpoint_dir is not None and workers <= 1)
+                    return
+                self.modelTrained.emit({"model": config["model"], "estimator": model})
+            except Exception as e:
+                self.trainingFailed.emit(f"{config['model']}: {e}")
+
 class MLPageWidget(QWidget, ModelConfigWidget):
     trainRequested = pyqtSignal(list)  # Signal for training actions (corrected to list)
-    saveModelRequested = pyqtSignal(str)  # Signal for saving model weights
+    saveModelRequested = pyqtSignal(str)  # Emits the models folder after a registry save, the file path outside a project
+
+    # Feature methods of feature_backend.project_training_data by display name
+    FEATURE_METHODS = {
+        "Log-Variance": "log_variance",
+        "Tangent Space (Riemannian)": "tangent_space",
+        "Coherence": "coherence",
+        "Phase Locking Value": "plv"
+    }
 
-    def __init__(self, parent=None):
+    def __init__(self, project_json_filepath=None, parent=None):
         super().__init__(parent)
+        # Trained models and search results are kept in the project's models/ folder
+        self.project_json_filepath = project_json_filepath
+        self.models_dir = os.path.join(os.path.dirname(project_json_filepath), 'models') if project_json_filepath else None
+        self.training_data = None  # (X, y, groups) used by the training engine
+        self.epoch_data = None  # (epochs, y, sfreq) of the project's recordings, used by the deep learning models
+        self.training_files = []  # Recordings whose features are in training_data
+        self.feature_settings = None  # (method, window) of the features in training_data
+        self.feature_worker = None
+        self.trained_models = {}  # Model name -> estimator refit on all data
+        self.saved_models = {}  # Model name -> id of the estimator last saved to the registry
+        self.registry = ModelRegistry(self.models_dir) if self.models_dir else None
+        self.training_worker = None
+        self.search_worker = None
+        self.retrain_worker = None
+        self.deep_training_worker = None
+        self.pending_deep_configs = []  # Deep learning configs trained once the other models are done
         layout = QVBoxLayout()
 
         # Status label
         self.status_label = QLabel("No model trained")
         layout.addWidget(self.status_label)
 
+        # Training data: epochs and features of the project's recordings
+        data_group = QGroupBox("Training Data")
+        data_layout = QHBoxLayout()
+        self.feature_combo = QComboBox()
+        self.feature_combo.addItems(self.FEATURE_METHODS.keys())
+        self.window_input = QLineEdit("1.0")
+        self.load_data_button = QPushButton("Load Project Recordings")
+        self.load_data_button.clicked.connect(self.load_project_data)
+        self.load_data_button.setEnabled(project_json_filepath is not None)
+        data_layout.addWidget(QLabel("Features:"))
+        data_layout.addWidget(self.feature_combo)
+        data_layout.addWidget(QLabel("Epoch Length (s):"))
+        data_layout.addWidget(self.window_input)
+        data_layout.addWidget(self.load_data_button)
+        data_group.setLayout(data_layout)
+        layout.addWidget(data_group)
+
         # Model selection section
         model_group = QGroupBox("Model Selection")
         model_layout = QVBoxLayout()
@@ -103,29 +306,42 @@ class MLPageWidget(QWidget, ModelConfigWidget):
             "Support Vector Machine (SVM)": [
                 ("Kernel", "combo", ["linear", "poly", "rbf", "sigmoid"]),
                 ("C", "line", "1.0"),
-                ("Gamma", "line", "scale")
+                ("Gamma", "line", "scale"),
+                ("approximation", "combo", ["exact", "nystroem", "random_fourier"]),
+                ("approximation_rank", "line", "1000")
             ],
             "Random Forest": [
                 ("n_estimators", "line", "100"),
                 ("max_depth", "line", "None"),
                 ("min_samples_split", "line", "2"),
                 ("min_samples_leaf", "line", "1"),
-                ("max_features", "combo", ["auto", "sqrt", "log2"])
+                ("max_features", "combo", ["auto", "sqrt", "log2"]),
+                ("mode", "combo", ["standard", "lean"]),
+                ("max_samples", "line", "None"),
+                ("ccp_alpha", "line", "0.0")
             ],
             "Gradient Boosting Machine (GBM)": [
                 ("n_estimators", "line", "100"),
                 ("learning_rate", "line", "0.1"),
                 ("max_depth", "line", "3"),
                 ("min_samples_split", "line", "2"),
-                ("subsample", "line", "1.0")
+                ("subsample", "line", "1.0"),
+                ("engine", "combo", ["exact", "histogram"])
+            ],
+            "Adaptive LDA (Online)": [
+                ("forgetting", "line", "1.0"),
+                ("reg", "line", "1e-3"),
+                ("checkpoint_every", "line", "100")
             ],
             "K-means Clustering": [
                 ("n_clusters", "line", "8"),
-                ("init", "combo", ["k-means++", "random"])
+                ("init", "combo", ["k-means++", "random"]),
+                ("batch_size", "line", "None")
             ],
             "Gaussian Mixture Model (GMM)": [
                 ("n_components", "line", "1"),
-                ("covariance_type", "combo", ["full", "tied", "diag", "spherical"])
+                ("covariance_type", "combo", ["full", "tied", "diag", "spherical"]),
+                ("batch_size", "line", "None")
             ],
         }
         self.setup_model_selection(model_layout, self.hyperparam_config.keys(), "Select Machine Learning Algorithms:")
@@ -140,9 +356,20 @@ class MLPageWidget(QWidget, ModelConfigWidget):
         add_model_layout.addWidget(self.add_DL_algo_button)
         layout.addLayout(add_model_layout)
 
+        # Hyperparameter search for the selected model
+        search_layout = QHBoxLayout()
+        self.search_mode_combo = QComboBox()
+        self.search_mode_combo.addItems(["Random Search", "Grid Search"])
+        self.search_button = QPushButton("Search Hyperparameters")
+        search_layout.addWidget(QLabel("Search Mode:"))
+        search_layout.addWidget(self.search_mode_combo)
+        search_layout.addWidget(self.search_button)
+        layout.addLayout(search_layout)
+
         # Connect buttons
         self.add_model_button.clicked.connect(self.add_model_to_pipeline)
         self.add_DL_algo_button.clicked.connect(self.open_deep_learning_page)
+        self.search_button.clicked.connect(self.search_hyperparameters)
 
         # Pipeline builder
         pipeline_group = QGroupBox("ML Pipeline")
@@ -188,7 +415,12 @@ class MLPageWidget(QWidget, ModelConfigWidget):
 
     def open_deep_learning_page(self):
         """Open the DeepLearningPageWidget as a dialog."""
-        dialog = DeepLearningConfigWidget(self)
+        if self.training_data is not None:
+            X, y = self.deep_learning_data()
+            dialog = DeepLearningConfigWidget(self, sample_shape=X.shape[1:], n_samples=len(X),
+                                              n_classes=len(np.unique(y)) if y is not None else 2)
+        else:
+            dialog = DeepLearningConfigWidget(self)
         dialog.modelConfigured.connect(self.add_deep_learning_model)
         dialog.exec_()
 
@@ -214,6 +446,322 @@ class MLPageWidget(QWidget, ModelConfigWidget):
         self.trainRequested.emit(pipeline)
         self.status_label.setText("Training pipeline...")
 
+    def load_project_data(self):
+        """Extract the epochs and features of the project's recordings in the background."""
+        if self.feature_worker is not None and self.feature_worker.isRunning():
+            self.status_label.setText("Recordings are already being loaded")
+            return
+        try:
+            window = float(self.window_input.text())
+        except ValueError:
+            self.status_label.setText("Error: Invalid epoch length")
+            return
+        method = self.FEATURE_METHODS[self.feature_combo.currentText()]
+        self.feature_worker = FeatureWorker(self.project_json_filepath, method, window, parent=self)
+        self.feature_worker.featuresLoaded.connect(self.on_features_loaded)
+        self.feature_worker.featuresFailed.connect(lambda error: self.status_label.setText(f"Loading recordings failed: {error}"))
+        self.feature_worker.start()
+        self.status_label.setText(f"Extracting {self.feature_combo.currentText()} features of the project recordings...")
+
+    def on_features_loaded(self, data):
+        """Train on the features of the project's recordings. When only recordings were added since the last load
+        (same features and labelling), just those are passed on, so the saved models are warm-started with them."""
+        self.epoch_data = (data["epochs"], data["y"], data["sfreq"])
+        settings = (data["method"], data["window"])
+        new_files = [filepath for filepath in data["files"] if filepath not in self.training_files]
+        if self.training_data is not None and settings == self.feature_settings \
+                and set(self.training_files) <= set(data["files"]) and (data["y"] is None) == (self.training_data[1] is None):
+            self.training_files = data["files"]
+            if not new_files:
+                self.status_label.setText(f"No new recordings, training data has {len(self.training_data[0])} samples")
+                return
+            rows = np.isin(data["groups"], new_files)
+            self.add_training_sessions(data["X"][rows], None if data["y"] is None else data["y"][rows], data["groups"][rows])
+            return
+        self.feature_settings, self.training_files = settings, data["files"]
+        self.set_training_data(data["X"], data["y"], data["groups"])
+
+    def deep_learning_data(self):
+        """Epochs and labels the deep learning models train on: the project's epochs once loaded, else the training data."""
+        if self.epoch_data is not None:
+            return self.epoch_data[:2]
+        X, y, _ = self.training_data
+        return X, y
+
+    def deep_learning_inputs(self):
+        """Sampling frequency and feature store that deep learning configs taking spectrograms need."""
+        sfreq = self.epoch_data[2] if self.epoch_data is not None else None
+        store = project_feature_store(self.project_json_filepath) if self.project_json_filepath else None
+        return sfreq, store
+
+    def set_training_data(self, X, y=None, groups=None):
+        """Set the feature matrix, labels and optional groups (e.g. sessions) used for training."""
+        self.training_data = (X, y, groups)
+        self.status_label.setText(f"Loaded training data with {len(X)} samples")
+
+    def add_training_sessions(self, X_new, y_new=None, groups_new=None):
+        """Append new sessions to the training data and warm-start the saved models on them."""
+        if self.training_data is None:
+            self.set_training_data(X_new, y_new, groups_new)
+            return
+        X, y, groups = self.training_data
+        self.training_data = (
+            np.concatenate([X, X_new]),
+            None if y is None else np.concatenate([y, y_new]),
+            None if groups is None else np.concatenate([groups, groups_new])
+        )
+        if self.models_dir is None or not self.trained_models:
+            self.status_label.setText(f"Added {len(X_new)} samples, train the pipeline to update the models")
+            return
+        if self.retrain_worker is not None and self.retrain_worker.isRunning():
+            self.status_label.setText("Retraining already in progress")
+            return
+        X, y, _ = self.training_data
+        self.retrain_worker = RetrainWorker(self.models_dir, list(self.trained_models), X, y, X_new, y_new, parent=self)
+        self.retrain_worker.modelRetrained.connect(self.on_model_retrained)
+        self.retrain_worker.retrainFailed.connect(lambda error: self.status_label.setText(f"Retraining failed: {error}"))
+        self.retrain_worker.start()
+        self.status_label.setText(f"Retraining {len(self.trained_models)} models with {len(X_new)} new samples...")
+
+    def on_model_retrained(self, result):
+        """Keep the updated model and report its score on the new sessions."""
+        self.trained_models[result["model_name"]] = result["model"]
+        self.saved_models[result["model_name"]] = id(result["model"])
+        metrics = ", ".join(f"{name}={value:.3f}" for name, value in result["metrics"].items())
+        self.status_label.setText(f"{result['model_name']} v{result['version']} ({result['strategy']}) "
+                                  f"in {result['fit_time']:.2f} s {metrics}")
+
+    def on_train(self, pipeline):
+        """Cross-validate every model of the pipeline in the background."""
+        if not pipeline:
+            self.status_label.setText("Pipeline is empty")
+            return
+        if self.training_data is None:
+            self.status_label.setText("No training data loaded, load the project recordings first")
+            return
+        if any(worker is not None and worker.isRunning() for worker in (self.training_worker, self.deep_training_worker)):
+            self.status_label.setText("Training already in progress")
+            return
+        X, y, groups = self.training_data
+        self.pending_deep_configs = [config for config in pipeline if is_deep_learning_config(config)]
+        pipeline = [config for config in pipeline if not is_deep_learning_config(config)]
+        if not pipeline:
+            self.train_deep_models()
+            return
+        self.fold_times = []
+        self.progress_bar.setValue(0)
+        self.training_worker = TrainingWorker(pipeline, X, y, groups, parent=self)
+        self.training_worker.foldFinished.connect(self.on_fold_finished)
+        self.training_worker.trainingFinished.connect(self.on_training_finished)
+        self.training_worker.trainingFailed.connect(lambda error: self.status_label.setText(f"Training failed: {error}"))
+        self.training_worker.start()
+
+    def search_hyperparameters(self):
+        """Run a successive-halving search over the selected model's hyperparameters, or a pruned sweep when
+        a deep learning model is selected in the pipeline."""
+        model_name = self.model_combo.currentText()
+        if self.training_data is None or self.training_data[1] is None:
+            self.status_label.setText("No labelled training data loaded, load annotated project recordings first")
+            return
+        if self.search_worker is not None and self.search_worker.isRunning():
+            self.status_label.setText("Search already in progress")
+            return
+        item = self.pipeline_list.currentItem()
+        if item is not None and is_deep_learning_config(item.data(Qt.UserRole)):
+            self.sweep_deep_model(item)
+            return
+        X, y, _ = self.training_data
+        mode = "grid" if self.search_mode_combo.currentText() == "Grid Search" else "random"
+        results_path = None
+        if self.models_dir is not None:
+            # Same file for the same model and mode, so an interrupted search resumes
+            file_name = f"search_{model_slug(model_name)}_{mode}.jsonl"
+            results_path = os.path.join(self.models_dir, file_name)
+        self.progress_bar.setValue(0)
+        self.search_worker = SearchWorker(model_name, X, y, mode, results_path, parent=self)
+        self.search_worker.candidateFinished.connect(self.on_candidate_finished)
+        self.search_worker.searchFinished.connect(self.on_search_finished)
+        self.search_worker.searchFailed.connect(lambda error: self.status_label.setText(f"Search failed: {error}"))
+        self.search_worker.start()
+        self.status_label.setText(f"Searching hyperparameters of {model_name}...")
+
+    def sweep_deep_model(self, item):
+        """Sweep the hyperparameters of the deep learning config of a pipeline item."""
+        model_config = item.data(Qt.UserRole)
+        X, y = self.deep_learning_data()
+        results_path = None
+        if self.models_dir is not None:
+            results_path = os.path.join(self.models_dir, f"sweep_{model_slug(model_config['model'])}.jsonl")
+        self.sweep_item = item
+        self.progress_bar.setValue(0)
+        sfreq, store = self.deep_learning_inputs()
+        self.search_worker = DeepSweepWorker(model_config, X, y, results_path, sfreq, store, parent=self)
+        self.search_worker.trialFinished.connect(self.on_trial_finished)
+        self.search_worker.sweepFinished.connect(self.on_sweep_finished)
+        self.search_worker.sweepFailed.connect(lambda error: self.status_label.setText(f"Sweep failed: {error}"))
+        self.search_worker.start()
+        self.status_label.setText(f"Sweeping hyperparameters of {model_config['model']}...")
+
+    def on_trial_finished(self, record):
+        """Show the progress of the sweep trial by trial."""
+        self.progress_bar.setMaximum(record["n_trials"])
+        self.progress_bar.setValue(record["done"])
+        if record["error"] is not None:
+            outcome = f"failed: {record['error']}"
+        else:
+            outcome = f"val_loss={record['score']:.3f} after {record['epochs_run']} epochs" + (" (pruned)" if record["pruned"] else "")
+        self.status_label.setText(f"Trial {record['done']}/{record['n_trials']} {record['params']}: {outcome}")
+
+    def on_sweep_finished(self, result):
+        """Put the best hyperparameters into the pipeline item and save them as a loadable configuration."""
+        best_config = result["best_config"]
+        model_config = {"model": best_config["model"], "input_shape": best_config["input_shape"],
+                        "params": {**best_config["hyperparams"], "architecture": best_config["architecture"]}}
+        self.sweep_item.setData(Qt.UserRole, model_config)
+        self.sweep_item.setText(f"{model_config['model']}: {model_config['params']}")
+        saved = ""
+        if self.models_dir is not None:
+            file_name = save_deep_config(os.path.join(self.models_dir, f"sweep_{model_slug(best_config['model'])}_best.json"),
+                                         best_config)
+            saved = f", saved to {file_name}"
+        self.progress_bar.setValue(self.progress_bar.maximum())
+        self.status_label.setText(f"Best val_loss {result['best_score']:.3f} with {result['best_params']} "
+                                  f"({result['n_pruned']} trials pruned){saved}")
+
+    def on_candidate_finished(self, record):
+        """Show the progress of the search rung by rung."""
+        self.progress_bar.setMaximum(record["n_rungs"])
+        self.progress_bar.setValue(record["rung"])
+        score = "failed" if record["score"] is None else f"{record['score']:.3f}"
+        self.status_label.setText(f"Rung {record['rung'] + 1}/{record['n_rungs']} ({record['n_samples']} samples): "
+                                  f"{record['params']} -> {score}")
+
+    def on_search_finished(self, result):
+        """Load the best hyperparameters into the inputs of the searched model so it can be added to the pipeline."""
+        model_name = result["model"]  # The combo may have changed while the search ran in the background
+        inputs = self.hyperparam_inputs.get(model_name, {})
+        for param, value in result["best_params"].items():
+            widget = inputs.get(param)
+            if isinstance(widget, QComboBox):
+                widget.setCurrentText(str(value))
+            elif isinstance(widget, QLineEdit):
+                widget.setText(str(value))
+        if result["estimator"] is not None:
+            self.trained_models[model_name] = result["estimator"]
+        self.progress_bar.setValue(self.progress_bar.maximum())
+        self.status_label.setText(f"Best score {result['best_score']:.3f} with {result['best_params']}")
+
+    def on_fold_finished(self, result):
+        """Update progress, metrics and the time estimate as folds finish."""
+        self.progress_bar.setMaximum(result["n_tasks"])
+        self.progress_bar.setValue(self.progress_bar.value() + 1)
+        fold = "full data" if result["fold"] is None else f"fold {result['fold'] + 1}/{result['n_folds']}"
+        if result["error"] is not None:
+            self.status_label.setText(f"{result['model']} ({fold}) failed: {result['error']}")
+            return
+        self.fold_times.append(result["fit_time"])
+        metrics = ", ".join(f"{name}={value:.3f}" for name, value in result.get("metrics", {}).items())
+        self.status_label.setText(f"{result['model']} ({fold}) trained in {result['fit_time']:.2f} s {metrics}")
+        remaining = result["n_tasks"] - self.progress_bar.value()
+        estimate = remaining * sum(self.fold_times) / len(self.fold_times) / QThread.idealThreadCount()
+        self.estimated_time_label.setText(f"Estimated Time to Finish Training: {estimate:.0f} s")
+
+    def on_training_finished(self, summaries):
+        """Keep the refit models and show the cross-validated scores."""
+        for summary in summaries:
+            if summary["estimator"] is not None:
+                self.trained_models[summary["model"]] = summary["estimator"]
+                if self.models_dir is not None and hasattr(summary["estimator"], "checkpoint"):
+                    # Online models save themselves here while they adapt during a session
+                    summary["estimator"].checkpoint_path = os.path.join(
+                        self.models_dir, f"{model_slug(summary['model'])}_checkpoint.joblib")
+                if self.registry is not None:
+                    self.registry.save(summary["model"], summary["estimator"],
+                                       {"metrics": summary["mean_metrics"], "fit_time": summary["mean_fit_time"],
+                                        "n_samples": len(self.training_data[0])}, X=self.training_data[0])
+                    self.saved_models[summary["model"]] = id(summary["estimator"])
+        scores = "; ".join(f"{summary['model']}: {summary['mean_metrics']}" for summary in summaries if summary["mean_metrics"])
+        self.status_label.setText(f"Training finished. {scores}" if scores else "Training finished with errors")
+        self.estimated_time_label.setText("Estimated Time to Finish Training: Done")
+        self.train_deep_models()
+
+    def train_deep_models(self):
+        """Train the deep learning models of the pipeline in the background."""
+        configs, self.pending_deep_configs = self.pending_deep_configs, []
+        if not configs:
+            return
+        X, y = self.deep_learning_data()
+        if y is None:
+            self.status_label.setText("Deep learning models need labelled training data")
+            return
+        if self.models_dir is not None:
+            work_dir = os.path.join(os.path.dirname(self.models_dir), 'data', 'epochs')
+            # Interrupted runs resume from here when the same model is trained again
+            checkpoint_dir = os.path.join(self.models_dir, 'checkpoints')
+        else:
+            work_dir = tempfile.mkdtemp(prefix="pybci_epochs_")
+            checkpoint_dir = None
+        self.epoch_times = []
+        self.progress_bar.setValue(0)
+        sfreq, store = self.deep_learning_inputs()
+        self.deep_training_worker = DeepTrainingWorker(configs, X, y, work_dir, checkpoint_dir, sfreq, store, parent=self)
+        self.deep_training_worker.epochFinished.connect(self.on_epoch_finished)
+        self.deep_training_worker.modelTrained.connect(self.on_deep_model_trained)
+        self.deep_training_worker.trainingFailed.connect(lambda error: self.status_label.setText(f"Training failed: {error}"))
+        self.deep_training_worker.trainingInterrupted.connect(self.on_deep_training_interrupted)
+        self.deep_training_worker.start()
+        self.status_label.setText(f"Training {', '.join(config['model'] for config in configs)}...")
+
+    def on_deep_training_interrupted(self, model, checkpointed):
+        if checkpointed:
+            self.status_label.setText(f"{model} stopped, train it again to resume from the checkpoint")
+        else:
+            self.status_label.setText(f"{model} stopped without a checkpoint, training it again starts over")
+
+    def stop_training(self):
+        """Stop every background task, e.g. before the window closes. Deep learning training stops after the
+        current batch with its progress checkpointed, searches and sweeps keep their finished evaluations to
+        resume from, cross-validation drops its folds and retraining stops after the current model."""
+        workers = [worker for worker in (self.deep_training_worker, self.training_worker, self.search_worker,
+                                         self.retrain_worker, self.feature_worker)
+                   if worker is not None and worker.isRunning()]
+        for worker in workers:
+            worker.requestInterruption()
+        for worker in workers:
+            worker.wait()  # Tasks already running in worker processes finish first
+
+    def on_epoch_finished(self, report):
+        """Show the epoch progress, throughput and time estimate of the deep learning model in training."""
+        if report["epoch"] == 1:
+            self.epoch_times = []
+        self.epoch_times.append(report["epoch_time"])
+        self.progress_bar.setMaximum(report["epochs"])
+        self.progress_bar.setValue(report["epoch"])
+        self.status_label.setText(f"{report['model']} epoch {report['epoch']}/{report['epochs']}: "
+                                  f"loss={report['train_loss']:.3f}, val_loss={report['val_loss']:.3f}, "
+                                  f"val_accuracy={report['val_accuracy']:.3f} "
+                                  f"({report['samples_per_sec']:.0f} samples/s, {report['epoch_time']:.2f} s/epoch)")
+        # Upper bound, early stopping may end training sooner
+        estimate = (report["epochs"] - report["epoch"]) * sum(self.epoch_times) / len(self.epoch_times)
+        self.estimated_time_label.setText(f"Estimated Time to Finish Training: {estimate:.0f} s")
+
+    def on_deep_model_trained(self, result):
+        """Keep the trained deep learning model and register it."""
+        model = result["estimator"]
+        self.trained_models[result["model"]] = model
+        history = model.history_
+        if self.registry is not None:
+            self.registry.save(result["model"], model,
+                               {"metrics": {"val_accuracy": history[model.best_epoch_ - 1]["val_accuracy"]} if history else {},
+                                "fit_time": sum(report["epoch_time"] for report in history),
+                                "n_samples": len(self.deep_learning_data()[0]), "config": model.config},
+                               X=self.deep_learning_data()[0])
+            self.saved_models[result["model"]] = id(model)
+        self.progress_bar.setValue(self.progress_bar.maximum())
+        self.status_label.setText(f"{result['model']} trained for {len(history)} epochs, "
+                                  f"weights of epoch {model.best_epoch_} kept")
+        self.estimated_time_label.setText("Estimated Time to Finish Training: Done")
+
     def plot_confusion_matrix(self):
         self.status_label.setText("Displaying confusion matrix")
 
@@ -224,8 +772,24 @@ class MLPageWidget(QWidget, ModelConfigWidget):
         self.status_label.setText("Displaying topographic map")
 
     def save_model(self):
-        """Save the trained model weights."""
+        """Save the trained models to the project's model registry, or to a file outside a project."""
+        if not self.trained_models:
+            self.status_label.setText("No trained models to save")
+            return
+        if self.registry is not None:
+            saved = []
+            for model_name, model in self.trained_models.items():
+                if self.saved_models.get(model_name) == id(model):
+                    continue  # Already registered after training or retraining
+                X = self.training_data[0] if self.training_data is not None else None
+                version, _ = self.registry.save(model_name, model, X=X)
+                self.saved_models[model_name] = id(model)
+                saved.append(f"{model_name} v{version}")
+            self.saveModelRequested.emit(self.models_dir)
+            self.status_label.setText(f"Saved {', '.join(saved)}" if saved else "All trained models are already saved")
+            return
         file_name, _ = QFileDialog.getSaveFileName(self, "Save Model Weights", "", "Pickle files (*.pkl)")
         if file_name:
+            joblib.dump(self.trained_models, file_name, compress=0)
             self.saveModelRequested.emit(file_name)
             self.status_label.setText(f"Model saved to {file_name}")
\ No newline at end of file
@@ -0,0 +1,286 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import joblib
+try:
+    import fcntl
+except ImportError:    #Windows
+    fcntl = None
+    import msvcrt
+from contextlib import contextmanager
+import numpy as np
+from datetime import datetime
+
+"""
+Registry of trained models in the project's models/ folder:
+
+project
+|
+|-models--index.json
+|       |-<model>_v1.joblib
+|       |-<model>_v2.joblib
+|       ...
+
+Models are written with joblib without compression, so their numpy arrays (coefficients, support
+vectors, mixture covariances...) are stored as raw buffers. Inference-only loads (batch prediction,
+streaming) memory-map them read-only instead of reading them into RAM, loads of models that are updated
+afterwards (retraining, online models) read them into RAM. index.json holds the metadata of every version
+(feature hash, metrics, training time), so models can be listed and compared without opening them. A
+retrained model is saved as the next version next to the previous ones, never over them.
+
+Saves are serialized per models folder, across threads and processes, so concurrent saves (e.g. a
+retraining worker and the GUI) never pick the same version or lose an index entry.
+"""
+
+INDEX_FILE = "index.json"
+LOCK_FILE = "index.lock"
+
+_dir_locks = {}
+_dir_locks_guard = threading.Lock()
+
+@contextmanager
+def _models_dir_lock(models_dir):
+    """Exclusive lock on a models folder: a thread lock shared by every registry of the folder plus an OS file lock."""
+    key = os.path.abspath(models_dir)
+    with _dir_locks_guard:
+        lock = _dir_locks.setdefault(key, threading.Lock())
+    with lock:
+        with open(os.path.join(key, LOCK_FILE), 'a+b') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+def model_slug(model_name):
+    """Helper function that turns a model name into a file name, e.g. 'Random Forest' -> 'random_forest'."""
+    name = model_name.split(' (')[0]
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+def feature_hash(X):
+    """Identity of the feature matrix a model was trained on.
+
+    FeatureStore matrices are named after a hash of their source and parameters (<name>_<16 hex digits>.npy),
+    so that name is used as is. Other arrays, including other memory-mapped files such as an EpochStore's
+    X.npy, are hashed (sha1 of their bytes, read block by block).
+    """
+    if X is None:
+        return None
+    filename = getattr(X, 'filename', None)
+    if isinstance(X, np.memmap) and filename and re.search(r'_[0-9a-f]{16}\.npy$', str(filename)):
+        return os.path.splitext(os.path.basename(str(filename)))[0]
+    X = np.asarray(X)
+    rows = X.reshape(1, -1) if X.ndim == 0 else X
+    step = max(1, (16 << 20) // max(rows[:1].nbytes, 1))
+    digest = hashlib.sha1()
+    for start in range(0, len(rows), step):
+        digest.update(np.ascontiguousarray(rows[start:start + step]).data)
+    return digest.hexdigest()[:16]
+
+class LazyModel:
+    """Placeholder for a registered model that is only loaded on first use.
+
+    Attribute access (predict, classes_...) loads the model memory-mapped and forwards to it.
+    """
+
+    def __init__(self, registry, entry):
+        self._registry = registry
+        self._entry = entry
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def metadata(self):
+        return dict(self._entry)
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def load(self):
+        with self._load_lock:
+            if self._model is None:
+                self._model = self._registry.load_entry(self._entry)
+        return self._model
+
+    def unload(self):
+        """Drop the loaded model, the pages of its memory-mapped arrays are released with it."""
+        self._model = None
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"LazyModel({self._entry['model']} v{self._entry['version']}, {state})"
+
+class ModelRegistry:
+    """Versioned store of trained models with a JSON index.
+
+    Parameters:
+    models_dir (str): The project's models/ folder.
+    mmap_mode (str or None): Memory-mapping mode for numpy arrays on load. None reads them into RAM and is
+        needed for models that are updated after loading (partial_fit, warm starts), 'r' maps them read-only
+        for inference-only loads.
+    """
+
+    def __init__(self, models_dir, mmap_mode=None):
+        self.models_dir = models_dir
+        self.mmap_mode = mmap_mode
+        os.makedirs(models_dir, exist_ok=True)
+
+    ### Index ###
+
+    @property
+    def index_path(self):
+        return os.path.join(self.models_dir, INDEX_FILE)
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return {"models": []}
+        with open(self.index_path, 'r') as f:
+            return json.load(f)
+
+    def _write_index(self, index):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f, indent=4, default=str)
+        os.replace(tmp_path, self.index_path)
+
+    def entries(self, model_name=None):
+        """Index entries of every saved version, or of one model, oldest first."""
+        entries = self._read_index()["models"]
+        if model_name is not None:
+            entries = [entry for entry in entries if entry["model"] == model_name]
+        return sorted(entries, key=lambda entry: (entry["model"], entry["version"]))
+
+    def versions(self, model_name):
+        return [entry["version"] for entry in self.entries(model_name)]
+
+    def entry(self, model_name, version=None):
+        """Index entry of a model version, the latest when version is None.
+
+        Raises:
+        FileNotFoundError: If the version is not registered.
+        """
+        entries = self.entries(model_name)
+        if version is not None:
+            entries = [entry for entry in entries if entry["version"] == version]
+        if not entries:
+            raise FileNotFoundError(f"No saved version {version or ''} of {model_name} in {self.models_dir}")
+        return entries[-1]
+
+    ### Saving and loading ###
+
+    def save(self, model_name, model, metadata=None, X=None):
+        """Save a model as the next version and add it to the index.
+
+        Parameters:
+        model_name (str): Name of the model (as in MLPageWidget.hyperparam_config).
+        model (object): The trained model.
+        metadata (dict or None): Extra information, e.g. "metrics", "fit_time", "parent_version".
+        X (array-like or None): Training features, only used to compute the feature hash.
+
+        Returns:
+        tuple: (version, filepath) of the saved model.
+        """
+        with _models_dir_lock(self.models_dir):
+            # The index is re-read under the lock, another registry may have saved since it was last read
+            index = self._read_index()
+            versions = [entry["version"] for entry in index["models"] if entry["model"] == model_name]
+            version = max(versions) + 1 if versions else 1
+            # Reserve the file name, skipping files left by an interrupted save
+            while True:
+                file_name = f"{model_slug(model_name)}_v{version}.joblib"
+                path = os.path.join(self.models_dir, file_name)
+                try:
+                    os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                    break
+                except FileExistsError:
+                    version += 1
+            start = time.perf_counter()
+            # No compression: arrays stay raw buffers inside the file so they can be memory-mapped
+            joblib.dump(model, path + ".tmp", compress=0)
+            os.replace(path + ".tmp", path)
+            entry = {
+                "model": model_name,
+                "version": version,
+                "file": file_name,
+                "saved": datetime.now().isoformat(),
+                "size_mb": os.path.getsize(path) / 1e6,
+                "save_time": time.perf_counter() - start,
+                "feature_hash": feature_hash(X) if X is not None else None,
+                **(metadata or {})
+            }
+            index["models"].append(entry)
+            self._write_index(index)
+        return version, path
+
+    def load_entry(self, entry):
+        return joblib.load(os.path.join(self.models_dir, entry["file"]), mmap_mode=self.mmap_mode)
+
+    def load(self, model_name, version=None):
+        """Load a model now (numpy arrays memory-mapped when mmap_mode is set), the latest version when version is None.
+
+        Returns:
+        tuple: (model, metadata).
+        """
+        entry = self.entry(model_name, version)
+        return self.load_entry(entry), entry
+
+    def lazy(self, model_name, version=None):
+        """Return a LazyModel that loads the model on first use."""
+        return LazyModel(self, self.entry(model_name, version))
+
+    def latest_models(self):
+        """Lazy handles of the latest version of every registered model, none of them loaded yet."""
+        latest = {}
+        for entry in self.entries():
+            latest[entry["model"]] = entry
+        return {name: LazyModel(self, entry) for name, entry in latest.items()}
+
+    def find(self, X=None, model_name=None):
+        """Entries of the models trained on the same features as X (by feature hash)."""
+        target = feature_hash(X)
+        return [entry for entry in self.entries(model_name) if entry.get("feature_hash") == target]
+
+def list_model_versions(models_dir, model_name):
+    """Returns the saved version numbers of a model in ascending order."""
+    if not os.path.exists(os.path.join(models_dir, INDEX_FILE)):
+        return []
+    return ModelRegistry(models_dir).versions(model_name)
+
+def save_model_version(models_dir, model_name, model, metadata=None, X=None):
+    """Saves a model as the next version in the models folder, see ModelRegistry.save.
+
+    Returns:
+    tuple: (version, filepath) of the saved model.
+    """
+    return ModelRegistry(models_dir).save(model_name, model, metadata, X)
+
+def load_model_version(models_dir, model_name, version=None, mmap_mode=None):
+    """Loads a saved model and its metadata, the latest version when version is None.
+
+    The model's arrays are read into RAM so it can be updated (retraining, partial_fit), pass mmap_mode='r'
+    for inference only.
+
+    Returns:
+    tuple: (model, metadata).
+
+    Raises:
+    FileNotFoundError: If no saved version exists.
+    """
+    return ModelRegistry(models_dir, mmap_mode).load(model_name, version)
@@ -0,0 +1,231 @@
+import os
+import threading
+import joblib
+import numpy as np
+from scipy.special import softmax
+
+"""
+Online classifiers for adaptive BCI sessions. The model keeps learning from every labelled window
+during a live session while the inference path keeps predicting from another thread.
+"""
+
+class AdaptiveLDA:
+    """Linear discriminant analysis updated one labelled window at a time.
+
+    The class means and the pooled within-class scatter are running (optionally exponentially
+    forgotten) statistics. The inverse of the scatter matrix is kept up to date with the
+    Sherman-Morrison formula, so every update costs O(n_features^2) instead of a new O(n_features^3)
+    inversion. The inverse is recomputed exactly every refresh_every updates to stop round-off drift.
+
+    All public methods hold the same lock, so partial_fit can run on the acquisition thread while
+    predict runs on the inference thread.
+
+    Parameters:
+    forgetting (float): Weight kept by the past statistics at every update, 1.0 weighs all windows
+        equally (the batch LDA solution), values such as 0.99 track non-stationary EEG.
+    reg (float): Ridge added to the scatter matrix before the first inversion (fades with forgetting).
+    refresh_every (int): Number of updates between exact re-inversions of the scatter matrix.
+    checkpoint_path (str or None): File the model is saved to every checkpoint_every updates.
+    checkpoint_every (int): Number of updates between checkpoints.
+    """
+
+    def __init__(self, forgetting=1.0, reg=1e-3, refresh_every=1000, checkpoint_path=None, checkpoint_every=100):
+        if not 0.0 < forgetting <= 1.0:
+            raise ValueError(f"forgetting must be in (0, 1], got {forgetting}")
+        self.forgetting = forgetting
+        self.reg = reg
+        self.refresh_every = refresh_every
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.classes_ = None
+        self.n_updates_ = 0
+        self._lock = threading.RLock()
+        self._checkpoint_thread = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_lock', None)
+        state.pop('_checkpoint_thread', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+        self._checkpoint_thread = None
+
+    def get_params(self, deep=True):
+        return {"forgetting": self.forgetting, "reg": self.reg, "refresh_every": self.refresh_every,
+                "checkpoint_path": self.checkpoint_path, "checkpoint_every": self.checkpoint_every}
+
+    def set_params(self, **params):
+        for name, value in params.items():
+            setattr(self, name, value)
+        return self
+
+    ### Statistics ###
+
+    def _initialize(self, n_features, classes):
+        self.classes_ = np.asarray(classes)
+        self.weights_ = np.zeros(len(self.classes_))
+        self.means_ = np.zeros((len(self.classes_), n_features))
+        self.scatter_ = self.reg * np.eye(n_features)
+        self.precision_ = np.eye(n_features) / self.reg  # Inverse of scatter_
+        self._dirty = True
+
+    def _class_index(self, label):
+        index = np.flatnonzero(self.classes_ == label)
+        if index.size:
+            return index[0]
+        # A class seen for the first time mid-session gets an empty mean
+        self.classes_ = np.append(self.classes_, label)
+        self.weights_ = np.append(self.weights_, 0.0)
+        self.means_ = np.vstack([self.means_, np.zeros(self.means_.shape[1])])
+        return len(self.classes_) - 1
+
+    def _update(self, x, label):
+        """Add one window: decay the statistics, update the class mean and the inverse scatter (rank one)."""
+        k = self._class_index(label)
+        if self.forgetting < 1.0:
+            self.weights_ *= self.forgetting
+            self.scatter_ *= self.forgetting
+            self.precision_ /= self.forgetting
+        weight = self.weights_[k]
+        diff = x - self.means_[k]
+        self.means_[k] += diff / (weight + 1.0)
+        self.weights_[k] = weight + 1.0
+        if weight > 0:
+            # Weighted Welford update of the pooled within-class scatter
+            c = weight / (weight + 1.0)
+            self.scatter_ += c * np.outer(diff, diff)
+            p_diff = self.precision_ @ diff
+            self.precision_ -= (c / (1.0 + c * diff @ p_diff)) * np.outer(p_diff, p_diff)
+        self.n_updates_ += 1
+        if self.n_updates_ % self.refresh_every == 0:
+            self.precision_ = np.linalg.inv(self.scatter_)
+        self._dirty = True
+
+    def _coefficients(self):
+        """Linear discriminant weights, recomputed lazily after updates."""
+        if self._dirty:
+            n_effective = self.weights_.sum()
+            seen = self.weights_ > 0
+            # Inverse of the pooled covariance scatter_ / n, the estimate LinearDiscriminantAnalysis uses
+            precision = self.precision_ * n_effective
+            coef = self.means_ @ precision
+            intercept = -0.5 * np.einsum('kf,kf->k', coef, self.means_)
+            with np.errstate(divide='ignore'):
+                intercept += np.log(self.weights_ / n_effective)
+            # Classes without windows (or forgotten to nothing) can never be predicted
+            intercept[~seen] = -np.inf
+            self.coef_, self.intercept_ = coef, intercept
+            self._dirty = False
+        return self.coef_, self.intercept_
+
+    ### Public interface ###
+
+    def fit(self, X, y):
+        """Fit on a calibration run, computing the statistics in one pass and inverting once.
+
+        Parameters:
+        X (array-like): Feature matrix of shape (n_samples, n_features).
+        y (array-like): Labels.
+
+        Returns:
+        AdaptiveLDA: self.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y)
+        with self._lock:
+            classes = np.unique(y)
+            self._initialize(X.shape[1], classes)
+            for k, label in enumerate(classes):
+                members = X[y == label]
+                self.weights_[k] = len(members)
+                self.means_[k] = members.mean(axis=0)
+                centered = members - self.means_[k]
+                self.scatter_ += centered.T @ centered
+            self.precision_ = np.linalg.inv(self.scatter_)
+            self.n_updates_ = len(X)
+            self._dirty = True
+        return self
+
+    def partial_fit(self, X, y, classes=None):
+        """Update the model with new labelled windows.
+
+        Parameters:
+        X (array-like): Windows of shape (n_samples, n_features), or a single window of shape (n_features,).
+        y (array-like or scalar): Labels.
+        classes (array-like or None): All labels of the task, only used on the first call.
+
+        Returns:
+        AdaptiveLDA: self.
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        y = np.atleast_1d(np.asarray(y))
+        with self._lock:
+            if self.classes_ is None:
+                self._initialize(X.shape[1], np.unique(y) if classes is None else classes)
+            for x, label in zip(X, y):
+                self._update(x, label)
+                if self.checkpoint_path and self.n_updates_ % self.checkpoint_every == 0:
+                    self.checkpoint()
+        return self
+
+    def decision_function(self, X):
+        """Discriminant scores, of shape (n_samples,) for two classes like LinearDiscriminantAnalysis."""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        with self._lock:
+            coef, intercept = self._coefficients()
+            scores = X @ coef.T + intercept
+        return scores[:, 1] - scores[:, 0] if scores.shape[1] == 2 else scores
+
+    def predict_proba(self, X):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        with self._lock:
+            coef, intercept = self._coefficients()
+            return softmax(X @ coef.T + intercept, axis=1)
+
+    def predict(self, X):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        with self._lock:
+            coef, intercept = self._coefficients()
+            return self.classes_[np.argmax(X @ coef.T + intercept, axis=1)]
+
+    def score(self, X, y):
+        return float(np.mean(self.predict(X) == np.asarray(y)))
+
+    def checkpoint(self, path=None, block=False):
+        """Save the model atomically (write to a temporary file, then rename).
+
+        The state is copied under the lock and written on a background thread, so neither updates
+        nor predictions wait for the disk. A checkpoint is skipped while the previous one is still writing.
+
+        Parameters:
+        path (str or None): Destination, defaults to checkpoint_path.
+        block (bool): Wait for the write to finish.
+
+        Returns:
+        str or None: The checkpoint path, None if skipped.
+        """
+        path = path or self.checkpoint_path
+        if self._checkpoint_thread is not None and self._checkpoint_thread.is_alive():
+            if not block:
+                return None
+            self._checkpoint_thread.join()
+        with self._lock:
+            state = {name: value.copy() if isinstance(value, np.ndarray) else value
+                     for name, value in self.__getstate__().items()}
+        snapshot = AdaptiveLDA.__new__(AdaptiveLDA)
+        snapshot.__setstate__(state)
+
+        def write():
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp_path = path + ".tmp"
+            joblib.dump(snapshot, tmp_path)
+            os.replace(tmp_path, path)
+
+        self._checkpoint_thread = threading.Thread(target=write, daemon=True)
+        self._checkpoint_thread.start()
+        if block:
+            self._checkpoint_thread.join()
+        return path
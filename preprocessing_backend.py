@@ -1,6 +1,8 @@
 import mne
 import os
 
+from Backend.ica_backend import score_ica_components, fit_or_update_ica
+
 def process_edf_file(filepath, transformation_func):
     """
     Helper function to read an EDF file, apply a transformation, and overwrite the file.
@@ -68,17 +70,22 @@ def notch_filter(filepath, freq):
         return raw
     process_edf_file(filepath, transformation)
 
-def ica(filepath):
+def ica(filepath, ica_file=None):
     """
     Apply Independent Component Analysis (ICA) to remove artifacts from the EEG data.
     
     Parameters:
     filepath (str): Path to the EDF file.
+    ica_file (str or None): ICA stored by a previous file of the project (name ending in -ica.fif). When it
+        matches, it is updated from its unmixing matrix instead of refitted, and the result is stored back.
     """
     def transformation(raw):
-        ica = mne.preprocessing.ICA(n_components=15, random_state=97)
-        ica.fit(raw)
-        eog_indices, _ = ica.find_bads_eog(raw)
+        ica, _ = fit_or_update_ica(raw, 15, ica_file, random_state=97)
+        try:
+            eog_indices, _ = ica.find_bads_eog(raw)
+        except RuntimeError:
+            # No EOG channel, label the components from their own features instead
+            eog_indices = score_ica_components(ica, raw)["exclude"]
         ica.exclude = eog_indices
         ica.apply(raw)
         return raw
@@ -7,15 +7,20 @@ from PyQt5.QtCore import Qt, pyqtSignal
 from matplotlib.backends.backend_qt5agg import FigureCanvas
 from matplotlib.figure import Figure
 from ICA_widget import IcaWidget
+import os
 import mne
 import numpy as np
 
 class PreprocessingPageWidget(QWidget):
     preprocessRequested = pyqtSignal(list)  # Signal emits a list of transformation dictionaries
 
-    def __init__(self, parent=None):
+    def __init__(self, project_json_filepath=None, parent=None):
         super().__init__(parent)
         self.raw = None  # To store MNE Raw object
+        # The project's ICA is stored so that newly added recordings update it instead of refitting from scratch,
+        # every accepted decomposition is also snapshotted so pipeline steps keep the one their indices refer to
+        self.ica_file = os.path.join(os.path.dirname(project_json_filepath), 'data', 'project-ica.fif') if project_json_filepath else None
+        self.ica_snapshot_dir = os.path.join(os.path.dirname(project_json_filepath), 'data', 'ica') if project_json_filepath else None
         
         # Main layout with scroll area
         main_layout = QVBoxLayout(self)
@@ -349,15 +354,21 @@ class PreprocessingPageWidget(QWidget):
         else:
             n_components = min(int(n_components), n_channels)
 
-        self.ica_widget = IcaWidget(raw=self.raw, num_channels=n_components, parent=self)
+        if self.ica_file is not None:
+            os.makedirs(os.path.dirname(self.ica_file), exist_ok=True)
+        self.ica_widget = IcaWidget(raw=self.raw, num_channels=n_components, parent=self, ica_file=self.ica_file,
+                                    snapshot_dir=self.ica_snapshot_dir)
         self.ica_widget.icaComponentsSelected.connect(self.handle_ica_components)
         self.ica_widget.show()
 
-    def handle_ica_components(self, selected_components):
+    def handle_ica_components(self, selected_components, snapshot_file=""):
         """Handle selected ICA components and add to pipeline."""
         if self.ica_cb.isChecked():
             item = QListWidgetItem(f"ICA: exclude components {selected_components}")
-            item.setData(Qt.UserRole, {"type": "ica", "params": {"exclude": selected_components, "n_components": self.n_components_combo.currentText()}})
+            params = {"exclude": selected_components, "n_components": self.n_components_combo.currentText()}
+            if snapshot_file:
+                params["ica_file"] = snapshot_file   #The decomposition these indices belong to, for the streaming chain
+            item.setData(Qt.UserRole, {"type": "ica", "params": params})
             self.transform_list.addItem(item)
         self.status_label.setText(f"ICA components {selected_components} added to pipeline")
 
@@ -10,7 +10,7 @@ from datapage_widget import DataPageWidget
 from preprocessingpage_widget import PreprocessingPageWidget
 from mlpage_widget import MLPageWidget
 from visualization_widget import VisualizationPageWidget
-from Backend.data_backend import get_project_info, enumerate_progress
+from Backend.data_backend import get_project_info, enumerate_progress, concatenate
 
 class ProjectWindow(QMainWindow):
     def __init__(self, project_filepath):    #These parameters will be passed from the menu-page (currently main.py)
@@ -34,16 +34,18 @@ class ProjectWindow(QMainWindow):
         self.data_page = DataPageWidget()   #Guess which file this is calling the class form [Rolls Eyes]
         self.tabs.addTab(self.data_page, "Data Management")
         self.data_page.uploadRequested.connect(self.data_page.on_upload_eeg)
+        self.data_page.uploadRequested.connect(self.load_selected_data)
         self.data_page.livestreamRequested.connect(self.data_page.on_livestream_eeg)
 
         #Add Preprocessing Tab
-        self.preprocessing_page = PreprocessingPageWidget()
+        self.preprocessing_page = PreprocessingPageWidget(project_filepath)
         self.tabs.addTab(self.preprocessing_page, "Preprocessing")
         self.preprocessing_page.preprocessRequested.connect(self.preprocessing_page.on_preprocess)
 
         #Add Ml/Deep Learning Tab
-        self.ml_deeplearning_page = MLPageWidget()
+        self.ml_deeplearning_page = MLPageWidget(project_filepath)
         self.tabs.addTab(self.ml_deeplearning_page, "ML/Deep Learning")
+        self.ml_deeplearning_page.trainRequested.connect(self.ml_deeplearning_page.on_train)
 
         #Add Visualization Tab
         self.visualization_page = VisualizationPageWidget()
@@ -52,6 +54,21 @@ class ProjectWindow(QMainWindow):
         # Add other tabs
         self.tabs.addTab(self.create_pubish_page(), "Share/Publish")
 
+    def load_selected_data(self, filepaths):
+        """Pass the recordings confirmed on the data page to the preprocessing and visualization pages."""
+        try:
+            raw = concatenate(filepaths)
+        except Exception as e:
+            self.visualization_page.status_label.setText(f"Error loading EDF files: {e}")
+            return
+        self.preprocessing_page.set_raw_data(raw)
+        self.visualization_page.set_raw_data(raw)
+
+    def closeEvent(self, event):
+        # Checkpoint running deep learning training so it resumes next time instead of being lost
+        self.ml_deeplearning_page.stop_training()
+        super().closeEvent(event)
+
     #Temporary functions for pages
     def create_pubish_page(self):
         widget = QWidget()
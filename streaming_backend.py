@@ -0,0 +1,477 @@
+import os
+import json
+import time
+import queue
+import socket
+import struct
+import threading
+from collections import OrderedDict
+import numpy as np
+from scipy import signal
+
+from Backend.model_backend import ModelRegistry
+from Backend.inference_backend import export_linear_model
+
+"""
+Live inference for a trained project. EEG arrives in chunks, goes through the project's preprocessing
+chain (the transformation dictionaries of the preprocessing page) with filters that keep their state
+between chunks, is buffered in a ring buffer and every sliding window is classified by the saved model.
+
+Chunks can be submitted from the same process (InferenceService.submit) or over a localhost socket
+(InferenceService.serve). Each socket message is a header of two little-endian uint32 (n_channels,
+n_samples) followed by the float32 samples, channel by channel; every prediction is sent back as one
+JSON line.
+
+Streaming filters are causal (one forward pass), unlike the zero-phase filters applied offline.
+"""
+
+### Stateful preprocessing stages ###
+
+class SosFilterStage:
+    """IIR filter in second-order sections whose state is carried over from chunk to chunk."""
+
+    def __init__(self, sos, n_channels):
+        self.sos = sos
+        self.zi = np.zeros((sos.shape[0], n_channels, 2))
+
+    def process(self, chunk):
+        out, self.zi = signal.sosfilt(self.sos, chunk, axis=-1, zi=self.zi)
+        return out
+
+class FirFilterStage:
+    """FIR filter whose last n_taps - 1 input samples are carried over from chunk to chunk."""
+
+    def __init__(self, taps, n_channels):
+        self.taps = taps
+        self.zi = np.zeros((n_channels, len(taps) - 1))
+
+    def process(self, chunk):
+        out, self.zi = signal.lfilter(self.taps, [1.0], chunk, axis=-1, zi=self.zi)
+        return out
+
+class RereferenceStage:
+    """Subtract the common average or the mean of reference channels."""
+
+    REFERENCE_CHANNELS = {"Cz": ["Cz"], "Mastoid": ["M1", "M2", "A1", "A2", "TP9", "TP10"]}
+
+    def __init__(self, ref_type, ch_names):
+        if ref_type in ("Common Average", "average"):
+            self.picks = np.arange(len(ch_names))
+        else:
+            names = self.REFERENCE_CHANNELS.get(ref_type, [ref_type])
+            self.picks = np.array([i for i, name in enumerate(ch_names) if name in names])
+            if not len(self.picks):
+                raise ValueError(f"No reference channel for {ref_type} in {ch_names}")
+
+    def process(self, chunk):
+        return chunk - chunk[self.picks].mean(axis=0)
+
+class DecimateStage:
+    """Anti-aliasing low-pass followed by keeping every factor-th sample, aligned across chunks."""
+
+    def __init__(self, factor, sfreq, n_channels):
+        self.factor = factor
+        self.filter = SosFilterStage(signal.butter(8, 0.45 * sfreq / factor, output='sos', fs=sfreq), n_channels)
+        self.phase = 0  # Index in the next chunk of the next sample to keep
+
+    def process(self, chunk):
+        filtered = self.filter.process(chunk)
+        out = filtered[:, self.phase::self.factor]
+        self.phase = (self.phase - chunk.shape[1]) % self.factor
+        return out
+
+class LinearProjectionStage:
+    """Fixed affine map of the channels, used to apply a fitted ICA with components excluded."""
+
+    def __init__(self, matrix, offset):
+        self.matrix = matrix
+        self.offset = offset[:, None]
+
+    def process(self, chunk):
+        return self.matrix @ chunk + self.offset
+
+def _fir_taps(l_freq, h_freq, sfreq, params):
+    """Hamming-window FIR design with MNE's default transition bandwidths."""
+    transitions = []
+    if l_freq is not None:
+        transitions.append(min(max(0.25 * l_freq, 2.0), l_freq))
+    if h_freq is not None:
+        transitions.append(min(max(0.25 * h_freq, 2.0), sfreq / 2.0 - h_freq))
+    n_taps = params.get("fir_length") or int(round(3.3 / min(transitions) * sfreq))
+    n_taps += 1 - n_taps % 2  # Odd length for a symmetric, linear phase filter
+    if l_freq is not None and h_freq is not None:
+        return signal.firwin(n_taps, [l_freq, h_freq], pass_zero=False, window=params.get("fir_window", "hamming"), fs=sfreq)
+    if l_freq is not None:
+        return signal.firwin(n_taps, l_freq, pass_zero=False, window=params.get("fir_window", "hamming"), fs=sfreq)
+    return signal.firwin(n_taps, h_freq, window=params.get("fir_window", "hamming"), fs=sfreq)
+
+def _iir_sos(l_freq, h_freq, sfreq, params):
+    iir_params = params.get("iir_params", {"ftype": "butter", "order": 4})
+    if "roll_off" in params and params["roll_off"] > 0:
+        iir_params = {**iir_params, "order": max(1, int(params["roll_off"] / 6))}   #Same rule as on_preprocess
+    if l_freq is not None and h_freq is not None:
+        freqs, btype = [l_freq, h_freq], 'bandpass'
+    elif l_freq is not None:
+        freqs, btype = l_freq, 'highpass'
+    else:
+        freqs, btype = h_freq, 'lowpass'
+    return signal.iirfilter(iir_params.get("order", 4), freqs, rp=iir_params.get("rp"), rs=iir_params.get("rs"),
+                            btype=btype, ftype=iir_params.get("ftype", "butter"), output='sos', fs=sfreq)
+
+def _ica_projection(ica, ch_names, exclude):
+    """Affine map applied by ica.apply, obtained by applying it to the identity and to zeros."""
+    import mne
+    info = mne.create_info(ch_names, 1.0, 'eeg')
+    n_channels = len(ch_names)
+    probe = mne.io.RawArray(np.hstack([np.eye(n_channels), np.zeros((n_channels, 1))]), info, verbose=False)
+    cleaned = ica.apply(probe, exclude=exclude, verbose=False).get_data()
+    offset = cleaned[:, -1]
+    return cleaned[:, :-1] - offset[:, None], offset
+
+def build_stream_chain(transformations, sfreq, ch_names, ica=None):
+    """Turn the transformation dictionaries of the preprocessing page into streaming stages.
+
+    Parameters:
+    transformations (list): [{"type": "filter" | "notch" | "ica" | "asr" | "reref" | "resample", "params": {...}}].
+    sfreq (float): Sampling frequency of the incoming stream in Hz.
+    ch_names (list): Channel names of the incoming stream.
+    ica (mne.preprocessing.ICA or None): Fitted ICA for "ica" steps whose params give no "ica_file". A step's
+        "ica_file" (a snapshot saved with ica_backend.save_ica_snapshot) takes precedence, since its
+        "exclude" indices refer to that decomposition.
+
+    Returns:
+    tuple: (stages, sfreq) where sfreq is the sampling frequency after the chain.
+
+    Raises:
+    ValueError: If a step cannot run on a stream.
+    """
+    stages = []
+    n_channels = len(ch_names)
+    for transformation in transformations:
+        kind, params = transformation["type"], transformation.get("params", {})
+        if kind == "filter":
+            l_freq, h_freq = params.get("l_freq"), params.get("h_freq")
+            if params.get("method") == "fir":
+                stages.append(FirFilterStage(_fir_taps(l_freq, h_freq, sfreq, params), n_channels))
+            else:
+                stages.append(SosFilterStage(_iir_sos(l_freq, h_freq, sfreq, params), n_channels))
+        elif kind == "notch":
+            for freq in params.get("freqs", []):
+                b, a = signal.iirnotch(freq, 30.0, fs=sfreq)
+                stages.append(SosFilterStage(signal.tf2sos(b, a), n_channels))
+        elif kind == "reref":
+            stages.append(RereferenceStage(params.get("ref_type", "Common Average"), ch_names))
+        elif kind == "resample":
+            factor = sfreq / params["rate"]
+            if abs(factor - round(factor)) > 1e-9 or factor < 1:
+                raise ValueError(f"Streaming resampling needs an integer decimation factor, got {sfreq} -> {params['rate']} Hz")
+            if round(factor) > 1:
+                stages.append(DecimateStage(int(round(factor)), sfreq, n_channels))
+            sfreq = params["rate"]
+        elif kind == "ica":
+            step_ica = ica
+            if params.get("ica_file"):
+                import mne
+                step_ica = mne.preprocessing.read_ica(params["ica_file"], verbose=False)
+            if step_ica is None:
+                raise ValueError("The chain contains ICA but no fitted ICA was given")
+            exclude = params.get("exclude", step_ica.exclude)
+            stages.append(LinearProjectionStage(*_ica_projection(step_ica, ch_names, exclude)))
+        elif kind == "asr":
+            continue    #ASR is still a placeholder in preprocessing_backend, the data passes through unchanged
+        else:
+            raise ValueError(f"Unknown transformation {kind}")
+    return stages, sfreq
+
+### Buffering and measurements ###
+
+class RingBuffer:
+    """Fixed-size multichannel sample buffer, windows are copied out into a preallocated array."""
+
+    def __init__(self, n_channels, capacity, window):
+        self.capacity = capacity
+        self.data = np.zeros((n_channels, capacity))
+        self.window = np.empty((n_channels, window))
+        self.n_written = 0  # Total number of samples written since the start
+
+    def write(self, chunk):
+        n = chunk.shape[1]
+        start = self.n_written % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[:, start:start + first] = chunk[:, :first]
+        self.data[:, :n - first] = chunk[:, first:]
+        self.n_written += n
+
+    def read_window(self, end):
+        """Copy the samples [end - window, end) into the window array and return it."""
+        length = self.window.shape[1]
+        start = (end - length) % self.capacity
+        first = min(length, self.capacity - start)
+        self.window[:, :first] = self.data[:, start:start + first]
+        self.window[:, first:] = self.data[:, :length - first]
+        return self.window
+
+class LatencyHistogram:
+    """Histogram of latencies on log-spaced bins from 1 us to 100 s, recording costs one binary search."""
+
+    def __init__(self, n_bins=500):
+        self.edges = np.geomspace(1e-6, 100.0, n_bins + 1)
+        self.counts = np.zeros(n_bins + 2, dtype=np.int64)  # Plus underflow and overflow bins
+        self.total = 0.0
+        self.count = 0
+
+    def record(self, seconds):
+        self.counts[np.searchsorted(self.edges, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def percentile(self, q):
+        """Upper edge of the bin holding the q-th percentile, in seconds."""
+        if not self.count:
+            return float('nan')
+        index = int(np.searchsorted(np.cumsum(self.counts), q / 100.0 * self.count))
+        return float(self.edges[min(index, len(self.edges) - 1)])
+
+def log_variance(window):
+    """Default window features: log-variance of every channel."""
+    return np.log(window.var(axis=1) + np.finfo(float).tiny)
+
+### Service ###
+
+class InferenceService:
+    """Sliding-window classifier for a live EEG stream.
+
+    Parameters:
+    model (object): Trained classifier. Linear models are exported to a LinearPredictor, except adaptive ones
+        (with partial_fit) which keep predicting live, so the updates of feedback are used at once.
+    sfreq (float): Sampling frequency of the incoming stream in Hz.
+    ch_names (list): Channel names of the incoming stream.
+    transformations (list): Preprocessing chain, see build_stream_chain.
+    window (float): Window length in seconds.
+    step (float): Time between consecutive windows in seconds.
+    features (callable): Maps a window of shape (n_channels, n_times) to the model's feature vector.
+    max_latency (float): Windows older than this many seconds when they are due are dropped instead of predicted.
+    max_queue (int): Number of chunks that can wait, further chunks are dropped.
+    ica (mne.preprocessing.ICA or None): Fitted ICA for an "ica" step.
+    feedback_windows (int): Number of recent windows whose features are kept for feedback.
+
+    Raises:
+    ValueError: If the window or the step is shorter than one sample after the preprocessing chain.
+    """
+
+    def __init__(self, model, sfreq, ch_names, transformations=(), window=1.0, step=0.1, features=log_variance,
+                 max_latency=0.5, max_queue=64, ica=None, feedback_windows=256):
+        self.stages, self.sfreq = build_stream_chain(list(transformations), sfreq, ch_names, ica)
+        self.n_channels = len(ch_names)
+        self.window = int(round(window * self.sfreq))
+        self.step = int(round(step * self.sfreq))
+        if self.window < 1 or self.step < 1:
+            raise ValueError(f"window ({window} s) and step ({step} s) must each span at least one sample "
+                             f"at {self.sfreq} Hz")
+        self.buffer = RingBuffer(self.n_channels, self.window + 2 * self.step, self.window)
+        self.next_end = self.window  # Sample index (after the chain) at which the next window ends
+        self.features = features
+        self.max_latency = max_latency
+        self.model = model
+        self.partial_fit = getattr(model, 'partial_fit', None)
+        try:
+            # An adaptive model is not frozen into a LinearPredictor, its updates must reach the predictions
+            self.predict = model.predict if self.partial_fit is not None else export_linear_model(model, max_batch=1).predict
+        except (ValueError, AttributeError):
+            self.predict = model.predict
+        self.feedback_windows = feedback_windows
+        self._recent = OrderedDict()  # Window end sample -> features, for feedback to an adaptive model
+        self.n_feedback = 0
+        self.latency = LatencyHistogram()
+        self.n_windows = 0
+        self.dropped_windows = 0
+        self.dropped_chunks = 0
+        self.inputs = queue.Queue(maxsize=max_queue)
+        self.results = queue.Queue()
+        self._callbacks = []
+        self._thread = None
+        self._server = None
+        self._running = threading.Event()
+        self._lock = threading.Lock()  # Socket and queue chunks share the filter states and the buffer
+
+    ### Processing ###
+
+    def process_chunk(self, chunk, arrival=None):
+        """Run one chunk through the chain and classify every window it completes.
+
+        Parameters:
+        chunk (np.ndarray): Samples of shape (n_channels, n_samples).
+        arrival (float or None): time.perf_counter() when the chunk arrived, defaults to now.
+
+        Returns:
+        list: One {"sample", "label", "latency"} dict per predicted window.
+        """
+        arrival = time.perf_counter() if arrival is None else arrival
+        with self._lock:
+            chunk = np.asarray(chunk, dtype=np.float64)
+            for stage in self.stages:
+                chunk = stage.process(chunk)
+            predictions = []
+            # Write at most step samples at a time, so windows are read before the ring buffer overwrites them
+            for start in range(0, chunk.shape[1], self.step):
+                self.buffer.write(chunk[:, start:start + self.step])
+                while self.buffer.n_written >= self.next_end:
+                    end = self.next_end
+                    self.next_end += self.step
+                    if time.perf_counter() - arrival > self.max_latency:
+                        self.dropped_windows += 1
+                        continue
+                    features = self.features(self.buffer.read_window(end))
+                    label = self.predict(features.reshape(1, -1))[0]
+                    if self.partial_fit is not None:
+                        self._recent[end] = features
+                        if len(self._recent) > self.feedback_windows:
+                            self._recent.popitem(last=False)
+                    latency = time.perf_counter() - arrival
+                    self.latency.record(latency)
+                    self.n_windows += 1
+                    predictions.append({"sample": end, "label": label.item() if hasattr(label, 'item') else label,
+                                        "latency": latency})
+            return predictions
+
+    def feedback(self, sample, label):
+        """Update an adaptive model with the true label of a predicted window, e.g. the cue shown during it.
+
+        The features of the window are taken from the recent predictions, so the label can arrive later
+        and from another thread. Later windows are predicted by the updated model.
+
+        Parameters:
+        sample (int): "sample" of the window's prediction.
+        label (object): True label of the window.
+
+        Raises:
+        ValueError: If the model has no partial_fit or the window is no longer kept.
+        """
+        if self.partial_fit is None:
+            raise ValueError(f"{type(self.model).__name__} cannot be updated during a session")
+        with self._lock:
+            features = self._recent.pop(sample, None)
+        if features is None:
+            raise ValueError(f"The window ending at sample {sample} is not among the last {self.feedback_windows}")
+        self.partial_fit(features.reshape(1, -1), [label])
+        self.n_feedback += 1
+
+    def stats(self):
+        """Latency percentiles (ms) and counters since the service started."""
+        return {
+            "windows": self.n_windows,
+            "feedback": self.n_feedback,
+            "dropped_windows": self.dropped_windows,
+            "dropped_chunks": self.dropped_chunks,
+            "p50_ms": self.latency.percentile(50) * 1e3,
+            "p99_ms": self.latency.percentile(99) * 1e3,
+            "mean_ms": self.latency.total / max(self.latency.count, 1) * 1e3
+        }
+
+    ### In-process queue ###
+
+    def add_callback(self, callback):
+        """Call callback(prediction) on the worker thread for every prediction."""
+        self._callbacks.append(callback)
+
+    def submit(self, chunk):
+        """Queue a chunk for the worker thread, returns False (and counts it) if the queue is full."""
+        try:
+            self.inputs.put_nowait((np.asarray(chunk), time.perf_counter()))
+            return True
+        except queue.Full:
+            self.dropped_chunks += 1
+            return False
+
+    def _run(self):
+        while self._running.is_set():
+            try:
+                chunk, arrival = self.inputs.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            for prediction in self.process_chunk(chunk, arrival):
+                self.results.put(prediction)
+                for callback in self._callbacks:
+                    callback(prediction)
+
+    def start(self):
+        """Start the worker thread that consumes submitted chunks."""
+        if self._thread is None or not self._thread.is_alive():
+            self._running.set()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._running.clear()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join()
+
+    ### Localhost socket ###
+
+    def serve(self, port=0):
+        """Accept chunks over a localhost TCP socket, one client at a time.
+
+        Parameters:
+        port (int): Port to listen on, 0 picks a free port.
+
+        Returns:
+        int: The port the service listens on.
+        """
+        self.start()
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(("127.0.0.1", port))
+        self._server.listen(1)
+        threading.Thread(target=self._accept, args=(self._server,), daemon=True).start()
+        return self._server.getsockname()[1]
+
+    def _accept(self, server):
+        while self._running.is_set():
+            try:
+                connection, _ = server.accept()
+            except OSError:
+                return
+            with connection:
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                reader = connection.makefile('rb')
+                while True:
+                    header = reader.read(8)
+                    if len(header) < 8:
+                        break
+                    n_channels, n_samples = struct.unpack('<II', header)
+                    payload = reader.read(4 * n_channels * n_samples)
+                    chunk = np.frombuffer(payload, dtype='<f4').reshape(n_channels, n_samples)
+                    for prediction in self.process_chunk(chunk):
+                        connection.sendall((json.dumps(prediction, default=str) + "\n").encode())
+
+def send_chunk(connection, chunk):
+    """Client side of InferenceService.serve: send one chunk of shape (n_channels, n_samples)."""
+    chunk = np.ascontiguousarray(chunk, dtype='<f4')
+    connection.sendall(struct.pack('<II', *chunk.shape) + chunk.tobytes())
+
+def load_inference_service(project_json_filepath, model_name, sfreq, ch_names, version=None, **kwargs):
+    """Build an InferenceService from a project's preprocessing settings and a registered model.
+
+    Parameters:
+    project_json_filepath (str): Path to the project.json file.
+    model_name (str): Name of the model in the project's registry.
+    sfreq (float): Sampling frequency of the incoming stream in Hz.
+    ch_names (list): Channel names of the incoming stream.
+    version (int or None): Model version, the latest when None.
+    **kwargs: Passed to InferenceService (window, step, features...).
+
+    Returns:
+    InferenceService: The service, call start() or serve() to run it.
+    """
+    with open(project_json_filepath, 'r') as f:
+        project_data = json.load(f)
+    registry = ModelRegistry(os.path.join(os.path.dirname(project_json_filepath), 'models'), mmap_mode='r')
+    model, entry = registry.load(model_name, version)
+    if hasattr(model, 'partial_fit'):
+        # Adaptive models are updated in place by feedback, which read-only mapped arrays would refuse
+        model = ModelRegistry(registry.models_dir).load_entry(entry)
+    return InferenceService(model, sfreq, ch_names, project_data.get("preprocessing_settings", []), **kwargs)
@@ -0,0 +1,59 @@
+import os
+import sys
+import types
+import atexit
+import shutil
+import tempfile
+
+# The application imports this folder as the Backend package (from Backend.<module> import ...)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if "Backend" not in sys.modules:
+    package = types.ModuleType("Backend")
+    package.__path__ = [ROOT]
+    sys.modules["Backend"] = package
+    # Processes started with spawn import Backend from sys.path, where a link named Backend points here
+    PACKAGES = tempfile.mkdtemp(prefix="pybci_tests_")
+    os.symlink(ROOT, os.path.join(PACKAGES, "Backend"))
+    sys.path.append(PACKAGES)
+    atexit.register(shutil.rmtree, PACKAGES, True)
+
+import numpy as np
+import pytest
+
+def _field(value, width):
+    return str(value).ljust(width)[:width].encode('ascii')
+
+def _write_edf(path, data, sfreq, ch_names=None, annotations=()):
+    """Write an EDF+ file with 1 s records. data is in volts, annotations are (onset, description) pairs."""
+    n_channels, n_times = data.shape
+    ch_names = ch_names or [f"EEG{i}" for i in range(n_channels)]
+    record = int(sfreq)
+    n_records = n_times // record
+    tals = [f"+{onset:g}\x14\x14\x00".encode() for onset in range(n_records)]
+    for onset, description in annotations:
+        tals[int(onset)] += f"+{onset:g}\x15{0:g}\x14{description}\x14\x00".encode()
+    n_annotation = (max(len(tal) for tal in tals) + 1) // 2 + 1
+    labels = list(ch_names) + ["EDF Annotations"]
+    peak = float(np.abs(data).max() * 1e6) or 1.0
+    header = b"".join([_field(0, 8), _field("X X X X", 80), _field("Startdate 01-JAN-2020 X X X", 80),
+                       _field("01.01.20", 8), _field("00.00.00", 8), _field(256 * (len(labels) + 1), 8),
+                       _field("EDF+C", 44), _field(n_records, 8), _field(1, 8), _field(len(labels), 4)])
+    columns = [
+        (16, labels), (80, [""] * len(labels)), (8, ["uV"] * n_channels + [""]),
+        (8, [-peak] * n_channels + [-1]), (8, [peak] * n_channels + [1]),
+        (8, [-32768] * len(labels)), (8, [32767] * len(labels)), (80, [""] * len(labels)),
+        (8, [record] * n_channels + [n_annotation]), (32, [""] * len(labels))]
+    for width, values in columns:
+        header += b"".join(_field(f"{v:.6g}" if isinstance(v, float) else v, width) for v in values)
+    digital = np.round((data[:, :n_records * record] * 1e6 + peak) / (2 * peak) * 65535 - 32768)
+    digital = np.clip(digital, -32768, 32767).astype('<i2')
+    with open(path, 'wb') as f:
+        f.write(header)
+        for r in range(n_records):
+            f.write(digital[:, r * record:(r + 1) * record].tobytes())
+            f.write(tals[r].ljust(2 * n_annotation, b"\x00"))
+    return str(path)
+
+@pytest.fixture
+def write_edf():
+    return _write_edf
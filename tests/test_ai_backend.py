@@ -0,0 +1,50 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.datasets import make_circles, make_classification
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.linear_model import SGDClassifier
+
+from Backend.ai_backend import (gradient_boosting_machine, model_size_mb, random_forest, random_forest_report,
+                                save_compact_model, support_vector_machine, svm_approximation_gap)
+
+def _features(n_samples=600, n_features=10, seed=0):
+    return make_classification(n_samples=n_samples, n_features=n_features, n_informative=5, random_state=seed)
+
+def test_histogram_gbm_stops_early_with_exact_accuracy():
+    X, y = _features()
+    train, test = slice(0, 450), slice(450, None)
+    exact = gradient_boosting_machine((X[train], y[train]), 100, 0.1, 3, 2, 1.0)
+    histogram = gradient_boosting_machine((X[train], y[train]), 100, 0.1, 3, 2, 1.0, engine='histogram')
+    assert isinstance(histogram, HistGradientBoostingClassifier)
+    assert histogram.n_iter_ <= 100
+    assert abs(histogram.score(X[test], y[test]) - exact.score(X[test], y[test])) < 0.05
+    # Labels without signal stop training as soon as the validation loss stops improving
+    noise = np.random.default_rng(0).integers(0, 2, 450)
+    assert gradient_boosting_machine((X[train], noise), 1000, 0.1, 3, 2, 1.0, engine='histogram').n_iter_ < 100
+
+def test_kernel_approximations_match_the_exact_svm():
+    # Concentric circles are not linearly separable, so only a working rbf map classifies them
+    X, y = make_circles(n_samples=800, noise=0.1, factor=0.5, random_state=0)
+    for approximation in ('nystroem', 'random_fourier'):
+        report = svm_approximation_gap((X, y), 'rbf', 1.0, 'scale', approximation, n_components=200)
+        assert report["exact_accuracy"] > 0.9 and report["gap"] < 0.05
+    assert isinstance(support_vector_machine((X, y), 'linear', 1.0, 'scale', 'nystroem'), SGDClassifier)
+    with pytest.raises(ValueError):
+        support_vector_machine((X, y), 'poly', 1.0, 'scale', 'random_fourier')
+
+def test_lean_forest_is_smaller_with_similar_accuracy(tmp_path):
+    X, y = _features(n_samples=1000)
+    params = dict(n_estimators=30, max_depth=None, min_samples_split=2, min_samples_leaf=1, max_features='sqrt')
+    standard, standard_report = random_forest_report((X, y), **params)
+    lean, lean_report = random_forest_report((X, y), mode='lean', **params)
+    assert lean.max_samples == 0.5 and lean.n_jobs == -1
+    assert lean_report["size_mb"] < standard_report["size_mb"]
+    assert abs(lean_report["accuracy"] - standard_report["accuracy"]) < 0.05
+    assert standard_report["compressed_size_mb"] < standard_report["size_mb"]
+    # Pruning removes nodes
+    pruned = random_forest((X, y), ccp_alpha=0.01, **params)
+    assert model_size_mb(pruned) < model_size_mb(random_forest((X, y), **params))
+    filepath = save_compact_model(standard, str(tmp_path / "forest.joblib"))
+    assert (tmp_path / "forest.joblib").stat().st_size < standard_report["size_mb"] * 1e6
+    np.testing.assert_array_equal(joblib.load(filepath).predict(X), standard.predict(X))
@@ -0,0 +1,42 @@
+import json
+import numpy as np
+from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
+
+from Backend.batch_backend import batch_predict, load_predictions
+from Backend.model_backend import ModelRegistry
+
+def _project(tmp_path, write_edf):
+    recordings = tmp_path / "data" / "input_data"
+    recordings.mkdir(parents=True)
+    rng = np.random.default_rng(0)
+    for name in ("session1", "session2"):
+        write_edf(recordings / f"{name}.edf", rng.standard_normal((2, 640)) * 1e-5, 64)
+    (tmp_path / "project.json").write_text(json.dumps({"project_files": ["data/input_data"], "preprocessing_settings": []}))
+    # Log-variance features of the two channels
+    X = np.log(rng.uniform(0.5, 2.0, (20, 2))) + np.log(1e-10)
+    model = LinearDiscriminantAnalysis().fit(X, np.repeat(["rest", "move"], 10))
+    ModelRegistry(str(tmp_path / "models")).save("LDA", model)
+    return str(tmp_path / "project.json"), recordings
+
+def test_batch_predict_resumes_with_the_files_left(tmp_path, write_edf):
+    project, recordings = _project(tmp_path, write_edf)
+    first = batch_predict(project, "LDA", window=1.0, step=0.5, n_jobs=1)
+    assert sorted(record["n_windows"] for record in first["files"]) == [19, 19] and not first["skipped"]
+    columns = load_predictions(first["output_dir"], str(recordings / "session1.edf"))
+    np.testing.assert_array_equal(columns["sample"], np.arange(64, 641, 32))
+    assert set(columns["label"]) <= {"rest", "move"}
+
+    # Only the recording that changed is predicted again
+    write_edf(recordings / "session2.edf", np.zeros((2, 640)), 64)
+    second = batch_predict(project, "LDA", window=1.0, step=0.5, n_jobs=1)
+    assert [record["file"] for record in second["files"]] == [str(recordings / "session2.edf")]
+    assert second["skipped"] == [str(recordings / "session1.edf")]
+
+    # Other settings give other predictions, so nothing is skipped
+    third = batch_predict(project, "LDA", window=1.0, step=0.25, n_jobs=1)
+    assert len(third["files"]) == 2 and not third["skipped"]
+
+def test_missing_recording_is_reported_not_raised(tmp_path, write_edf):
+    project, recordings = _project(tmp_path, write_edf)
+    result = batch_predict(project, "LDA", files=[str(recordings / "missing.edf")], n_jobs=1)
+    assert result["files"][0]["error"] is not None and result["files"][0]["output"] is None
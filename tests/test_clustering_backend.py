@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from Backend.clustering_backend import streaming_kmeans, StreamingGaussianMixture
+from Backend.feature_backend import iter_batches
+
+@pytest.mark.parametrize("random_state", [3, 4, 5])
+def test_streaming_kmeans_short_tail_batch(random_state):
+    # len(X) % batch_size (5) < n_clusters (8): the tail batch must never initialize the model
+    X = np.random.default_rng(random_state).standard_normal((10005, 4))
+    model = streaming_kmeans(X, 8, batch_size=10000, n_passes=1, random_state=random_state)
+    assert model.cluster_centers_.shape == (8, 4)
+
+def test_streaming_gaussian_mixture_short_tail_batch():
+    X = np.random.default_rng(0).standard_normal((2003, 3))
+    model = StreamingGaussianMixture(n_components=4, batch_size=1000, max_iter=5, random_state=3).fit(X)
+    assert np.isfinite(model.score(X))
+
+def test_iter_batches_shuffle_keeps_tail_last():
+    X = np.arange(25).reshape(-1, 1)
+    for seed in range(10):
+        batches = list(iter_batches(X, 10, shuffle=True, random_state=seed))
+        assert [len(batch) for batch in batches] == [10, 10, 5]
+        assert np.array_equal(np.sort(np.concatenate(batches).ravel()), np.arange(25))
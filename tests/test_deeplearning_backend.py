@@ -0,0 +1,196 @@
+import os
+import numpy as np
+import pytest
+import torch
+
+from Backend.deeplearning_backend import (PrefetchLoader, build_network, checkpoint_directory, estimate_cost, iter_minibatches,
+                                          model_inputs, quantize_model, quantize_registered_model, train_data_parallel,
+                                          train_deep_model)
+from Backend.feature_backend import FeatureStore
+from Backend.model_backend import ModelRegistry
+from Backend.tfr_backend import spectrogram_input
+
+def _epochs(n_epochs=40, n_channels=3, n_times=256, seed=0):
+    # Class 1 epochs carry a 20 Hz rhythm on the first channel
+    rng = np.random.default_rng(seed)
+    epochs = rng.standard_normal((n_epochs, n_channels, n_times))
+    y = np.arange(n_epochs) % 2
+    epochs[y == 1, 0] += 3 * np.sin(2 * np.pi * 20 * np.arange(n_times) / 128.0)
+    return epochs, y
+
+def _cnn(input_shape, epochs=5):
+    return {"model": "Convolutional Neural Network", "input_shape": input_shape,
+            "params": {"learning_rate": 0.01, "batch_size": 8, "epochs": epochs, "optimizer": "adam",
+                       "architecture": [{"layer_type": "Conv2D Layer", "parameters": {"filters": 4, "activation": "relu"}},
+                                        {"layer_type": "MaxPooling2D Layer", "parameters": {"pool_size": 4, "strides": 4}},
+                                        {"layer_type": "Flatten Layer", "parameters": {}}]}}
+
+def test_spectrogram_config_trains_on_spectrograms_of_the_epochs(tmp_path):
+    X, y = _epochs()
+    config = _cnn("(channels, 16, 32)")
+    store = FeatureStore(str(tmp_path))
+    inputs = model_inputs(config, X, 128.0, store=store)
+    np.testing.assert_allclose(inputs, spectrogram_input(X, 128.0, n_freqs=16, n_times_out=32))
+    assert estimate_cost(config, X.shape[1:])["layers"][0]["output_shape"] == (3, 16, 32)
+    # (channels, time) configs take the epochs as they are
+    assert model_inputs(_cnn("(channels, time_steps)"), X) is X
+
+    model = train_deep_model(config, inputs, y, n_workers=0)
+    model.sfreq = 128.0
+    assert model.sample_shape == (3, 16, 32)
+    np.testing.assert_array_equal(model.predict(X), model.predict(inputs))  # Epochs are transformed at prediction
+
+def _mlp(epochs=4):
+    return {"model": "Multi-layer Perceptron", "input_shape": "(channels, time_steps)",
+            "params": {"learning_rate": 0.01, "batch_size": 8, "epochs": epochs, "optimizer": "adam",
+                       "architecture": [{"layer_type": "Dense Layer", "parameters": {"units": 16, "activation": "relu"}}]}}
+
+def test_interrupted_training_resumes_like_an_uninterrupted_run(tmp_path):
+    X, y = _epochs()
+    X = X.astype(np.float32)
+    uninterrupted = train_deep_model(_mlp(), X, y, n_workers=0)
+    reports = []
+    stopped = train_deep_model(_mlp(), X, y, n_workers=0, checkpoint_dir=str(tmp_path), callback=reports.append,
+                               stop_requested=lambda: len(reports) == 2)
+    assert len(stopped.history_) == 2 and os.listdir(tmp_path)
+    resumed_reports = []
+    resumed = train_deep_model(_mlp(), X, y, n_workers=0, checkpoint_dir=str(tmp_path), callback=resumed_reports.append)
+    assert [report["epoch"] for report in resumed_reports] == [3, 4]  # Only the epochs left were run
+    assert [report["val_loss"] for report in resumed.history_] == [report["val_loss"] for report in uninterrupted.history_]
+    for resumed_weights, weights in zip(resumed.network.state_dict().values(), uninterrupted.network.state_dict().values()):
+        torch.testing.assert_close(resumed_weights, weights)
+    assert not os.path.exists(checkpoint_directory(str(tmp_path), _mlp(), X, y))  # A finished run removes its checkpoints
+
+def test_checkpoints_are_keyed_by_the_data(tmp_path):
+    X, y = _epochs()
+    other, _ = _epochs(seed=1)
+    assert checkpoint_directory(str(tmp_path), _mlp(), X, y) != checkpoint_directory(str(tmp_path), _mlp(), other, y)
+    np.save(tmp_path / "X.npy", X)
+    mapped = np.load(tmp_path / "X.npy", mmap_mode='r')
+    assert checkpoint_directory(str(tmp_path), _mlp(), mapped, y) == checkpoint_directory(str(tmp_path), _mlp(), X, y)
+
+def test_trial_is_scored_by_its_best_epoch(tmp_path):
+    from Backend.deeplearning_backend import EpochStore, normalize_config, _run_trial
+    X, y = _epochs()
+    store = EpochStore.create(str(tmp_path), X, y)
+    config = normalize_config(_mlp(epochs=6))
+    config["hyperparams"]["learning_rate"] = 0.1  # Overfits, so the last epoch is not the best one
+    curves = {}
+    record = _run_trial(0, config, store.directory, 1, 0, curves, 3, 3)
+    assert record["error"] is None and record["score"] == min(curves[0])
+
+def test_sweep_resumes_only_on_the_same_data(tmp_path):
+    from Backend.deeplearning_backend import EpochStore, sweep_deep_model
+    X, y = _epochs(n_epochs=24)
+    results_path = str(tmp_path / "sweep.jsonl")
+    sweep = lambda X, y, trials: sweep_deep_model(_mlp(epochs=2), X, y, n_trials=2, cpu_budget=1,
+                                                  results_path=results_path, callback=trials.append)
+    first = []
+    result = sweep(X, y, first)
+    resumed = []
+    assert sweep(X, y, resumed)["best_score"] == result["best_score"] and not resumed
+    # A store holding other labels is not reused, and the results of other labels are not either
+    store = EpochStore.create(str(tmp_path / "epochs"), X, y)
+    relabelled = []
+    sweep(store.X, 1 - y, relabelled)
+    assert len(relabelled) == len(first) == 2
+
+def _passes(loader, indices, n_passes=1, **kwargs):
+    # The yielded tensors are views of reused buffers, so each batch is copied
+    return [[(inputs.numpy().copy(), targets.numpy().copy()) for inputs, targets in loader.batches(indices, **kwargs)]
+            for _ in range(n_passes)]
+
+def test_prefetch_loader_yields_the_minibatches_in_order(tmp_path):
+    X, y = _epochs(n_epochs=37)
+    np.save(tmp_path / "X.npy", X)
+    mapped = np.load(tmp_path / "X.npy", mmap_mode='r')
+    indices = np.random.default_rng(0).permutation(len(X))
+    expected = [(inputs.numpy(), targets.numpy()) for inputs, targets in iter_minibatches(mapped, y, indices, 8)]
+    for data in (mapped, X.astype(np.float32)):
+        batches, = _passes(PrefetchLoader(data, y, 8, n_workers=3, prefetch=2, noise_std=1.0), indices, augment=False)
+        assert len(batches) == len(expected) == 5
+        for (inputs, targets), (expected_inputs, expected_targets) in zip(batches, expected):
+            np.testing.assert_array_equal(inputs, expected_inputs)
+            np.testing.assert_array_equal(targets, expected_targets)
+
+def test_prefetch_loader_augmentation_is_deterministic():
+    X, y = _epochs(n_epochs=37)
+    X = X.astype(np.float32)
+    indices = np.arange(len(X))
+    augmentation = dict(time_shift=10, noise_std=0.5, channel_dropout=0.3, random_state=1)
+    first, second = _passes(PrefetchLoader(X, y, 8, n_workers=3, **augmentation), indices, n_passes=2)
+    assert [inputs.tolist() for inputs, _ in first] == \
+        [inputs.tolist() for inputs, _ in _passes(PrefetchLoader(X, y, 8, n_workers=1, **augmentation), indices)[0]]
+    assert not np.array_equal(first[0][0], second[0][0])  # Every pass gets new augmentation
+    # A resumed pass continues with the augmentation of the interrupted one
+    resumed = PrefetchLoader(X, y, 8, **augmentation)
+    resumed.n_passes = 1
+    resumed_batches, = _passes(resumed, indices, first_batch=2)
+    np.testing.assert_array_equal(resumed_batches[0][0], second[2][0])
+    # A circular shift without noise or dropout only reorders the samples of each epoch
+    shifted, = _passes(PrefetchLoader(X, y, 8, time_shift=10), indices)
+    np.testing.assert_array_equal(np.sort(shifted[0][0], axis=-1), np.sort(X[:8], axis=-1))
+    assert not np.array_equal(shifted[0][0], X[:8])
+
+def _layer(layer_type, **parameters):
+    return {"layer_type": layer_type, "parameters": parameters}
+
+ARCHITECTURES = {
+    "Multi-layer Perceptron": [_layer("Dense Layer", units=32, activation="relu"), _layer("Dropout Layer", rate=0.5),
+                               _layer("Batch Normalization"), _layer("Dense Layer", units=8)],
+    "Convolutional Neural Network": [_layer("Conv2D Layer", filters=6, kernel_size=5, padding="valid"),
+                                     _layer("Batch Normalization"), _layer("DepthwiseConv2D Layer", kernel_size=3),
+                                     _layer("AveragePooling2D Layer", pool_size=4, strides=3),
+                                     _layer("LayerNormalization"), _layer("Flatten Layer"), _layer("Dense Layer", units=10)],
+    "LSTM Network": [_layer("LSTM Layer", units=12, return_sequences="True"), _layer("LayerNormalization"),
+                     _layer("Dense Layer", units=7), _layer("Attention Layer", units=8),
+                     _layer("GRU Layer", units=5, return_sequences=True), _layer("SimpleRNN Layer", units=4, activation="relu")],
+}
+
+@pytest.mark.parametrize("model", sorted(ARCHITECTURES))
+def test_cost_estimate_matches_the_built_network(model):
+    config = {"model": model, "input_shape": "(channels, time_steps)", "architecture": ARCHITECTURES[model]}
+    network, layers = build_network(config, (5, 40), 3)
+    cost = estimate_cost(config, (5, 40), n_classes=3)
+    assert cost["params"] == sum(parameter.numel() for parameter in network.parameters())
+    # The estimate follows the network layer by layer, recurrent models after turning the epoch into a sequence
+    estimated = [tuple(layer["output_shape"]) for layer in cost["layers"]]
+    assert estimated == [tuple(shape) for _, shape in layers]
+
+def test_quantized_model_keeps_its_accuracy_and_round_trips(tmp_path):
+    X, y = _epochs(n_epochs=80)
+    X = X.astype(np.float32)
+    labels = np.array(["left", "right"])[y]
+    config = {"model": "LSTM Network", "input_shape": "(channels, time_steps)",
+              "params": {"learning_rate": 0.01, "batch_size": 16, "epochs": 3, "optimizer": "adam",
+                         "architecture": [_layer("Dense Layer", units=16, activation="relu"), _layer("LSTM Layer", units=8)]}}
+    model = train_deep_model(config, X[:60], labels[:60], n_workers=0)
+    quantized, report = quantize_model(model, X[60:], labels[60:], max_accuracy_drop=0.05)
+    assert sorted(quantized.quantized_layers_) == sorted(layer["layer"] for layer in report["layers"] if layer["quantized"])
+    assert {layer["type"] for layer in report["layers"]} == {"Linear", "LSTM"} and quantized.quantized_layers_
+    assert report["float"] - report["int8"] <= 0.05
+    assert report["int8"] == np.mean(quantized.predict(X[60:]) == labels[60:])
+    assert np.mean(quantized.predict(X) == model.predict(X)) > 0.9
+    # Nothing can be quantized when no accuracy may be lost on a layer that changes a prediction
+    unchanged, strict = quantize_model(model, X[60:], max_accuracy_drop=-1)
+    assert unchanged.quantized_layers_ == [] and strict["int8"] == strict["float"] == 1.0
+
+    registry = ModelRegistry(str(tmp_path))
+    registry.save("lstm", model)
+    saved = quantize_registered_model(str(tmp_path), "lstm", X[60:], labels[60:], max_accuracy_drop=0.05)
+    loaded, entry = ModelRegistry(str(tmp_path), mmap_mode=None).load("lstm")
+    assert entry["version"] == saved["version"] == 2 and entry["parent_version"] == 1
+    np.testing.assert_array_equal(loaded.predict(X), saved["model"].predict(X))
+
+def test_data_parallel_training_learns_and_stops_on_request():
+    X, y = _epochs(n_epochs=80)
+    X = X.astype(np.float32)
+    reports = []
+    model = train_data_parallel(_mlp(epochs=6), X, y, n_workers=2, threads_per_worker=1, callback=reports.append)
+    assert [report["epoch"] for report in reports] == list(range(1, 7)) and reports[0]["workers"] == 2
+    assert model.sample_shape == (3, 256) and len(model.history_) == 6
+    assert np.mean(model.predict(X) == y) > 0.9
+    stopped_reports = []
+    stopped = train_data_parallel(_mlp(epochs=6), X, y, n_workers=2, threads_per_worker=1, callback=stopped_reports.append,
+                                  stop_requested=lambda: len(stopped_reports) > 0)
+    assert len(stopped.history_) < 6
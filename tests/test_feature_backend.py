@@ -0,0 +1,94 @@
+import numpy as np
+from scipy import linalg
+
+from Backend import feature_backend
+from Backend.feature_backend import (FeatureStore, RiemannianMean, epoch_covariances, recording_epochs, source_fingerprint,
+                                     tangent_space, tangent_space_features)
+from Backend.ai_backend import edf_to_datafile
+
+def _epochs(n_epochs=30, n_channels=4, n_times=200, seed=0):
+    rng = np.random.default_rng(seed)
+    mixing = rng.standard_normal((n_channels, n_channels))
+    return mixing @ rng.standard_normal((n_epochs, n_channels, n_times))
+
+def test_tangent_space_matches_scipy_at_the_karcher_mean():
+    covs = epoch_covariances(_epochs())
+    reference = RiemannianMean().fit(covs).mean_
+    isqrt = linalg.inv(linalg.sqrtm(reference)).real
+    logs = np.array([linalg.logm(isqrt @ cov @ isqrt).real for cov in covs])
+    rows, cols = np.triu_indices(4)
+    expected = logs[:, rows, cols] * np.where(rows == cols, 1.0, np.sqrt(2))
+    np.testing.assert_allclose(tangent_space(covs, reference), expected, atol=1e-8)
+    # The Karcher mean is the point where the tangent vectors average to zero
+    np.testing.assert_allclose(logs.mean(axis=0), 0.0, atol=1e-6)
+
+def test_cache_hit_skips_covariances_and_mean(tmp_path, monkeypatch):
+    np.save(tmp_path / "epochs.npy", _epochs())
+    epochs = np.load(tmp_path / "epochs.npy", mmap_mode='r')
+    store = FeatureStore(str(tmp_path / "features"))
+    X, reference = tangent_space_features(epochs, store=store)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("recomputed on a cache hit")
+
+    monkeypatch.setattr(feature_backend, "epoch_covariances", fail)
+    monkeypatch.setattr(RiemannianMean, "fit", fail)
+    X_cached, reference_cached = tangent_space_features(epochs, store=store)
+    np.testing.assert_array_equal(X_cached, X)
+    np.testing.assert_array_equal(reference_cached, reference)
+
+def test_memmap_fingerprint_does_not_hash_the_file(tmp_path):
+    array = _epochs()
+    np.save(tmp_path / "epochs.npy", array)
+    mapped = np.load(tmp_path / "epochs.npy", mmap_mode='r')
+    assert source_fingerprint(mapped)["path"] == str(tmp_path / "epochs.npy")
+    # Slices of a mapped file and in-memory arrays are hashed by content, the same way block by block
+    assert source_fingerprint(mapped[:10]) == source_fingerprint(np.array(array[:10]))
+    assert source_fingerprint(array)["sha1"] != source_fingerprint(array[:10])["sha1"]
+
+def test_edf_datafile_has_one_labelled_row_per_annotation(tmp_path, write_edf):
+    data = _epochs(1, 3, 1280)[0] * 1e-5
+    filepath = write_edf(tmp_path / "session.edf", data, 128, annotations=[(1, "left"), (3, "right"), (9.5, "left")])
+    epochs, labels, sfreq = recording_epochs(filepath, window=1.0)
+    assert sfreq == 128 and epochs.shape == (2, 3, 128)
+    np.testing.assert_allclose(epochs[1], data[:, 384:512], atol=1e-8)  # The window past the end is dropped
+    X, y = edf_to_datafile(filepath, True, features='tangent_space')
+    assert X.shape == (2, 6) and list(y) == ["left", "right"]
+
+def _reference_connectivity(epochs, sfreq, band, method):
+    # Cross-spectra of every pair from scipy, one Hann-windowed segment per epoch
+    from scipy import signal
+    n_times = epochs.shape[2]
+    values = []
+    for epoch in epochs:
+        row = []
+        for i, j in zip(*np.triu_indices(len(epoch), k=1)):
+            freqs, cross = signal.csd(epoch[i], epoch[j], sfreq, window=np.hanning(n_times), nperseg=n_times)
+            _, power_i = signal.welch(epoch[i], sfreq, window=np.hanning(n_times), nperseg=n_times)
+            _, power_j = signal.welch(epoch[j], sfreq, window=np.hanning(n_times), nperseg=n_times)
+            bins = (freqs >= band[0]) & (freqs <= band[1])
+            if method == 'plv':
+                row.append(np.abs(np.mean(cross[bins] / np.abs(cross[bins]))))
+            else:
+                row.append(np.abs(cross[bins].sum()) / np.sqrt(power_i[bins].sum() * power_j[bins].sum()))
+        values.append(row)
+    return np.array(values)
+
+def test_connectivity_matches_scipy_cross_spectra():
+    epochs = _epochs(6, 4, 256)
+    for method, name in (('coh', 'coherence'), ('plv', 'plv')):
+        X = feature_backend.epoch_features(epochs, 128.0, name)
+        n_pairs = 6
+        for b, band in enumerate(((8, 13), (13, 30))):
+            expected = _reference_connectivity(epochs, 128.0, band, method)
+            np.testing.assert_allclose(X[:, b * n_pairs:(b + 1) * n_pairs], expected, rtol=1e-8)
+
+def test_connectivity_of_a_scaled_copy_is_one(tmp_path):
+    rng = np.random.default_rng(1)
+    source = rng.standard_normal((5, 1, 256))
+    epochs = np.concatenate([source, 3 * source, rng.standard_normal((5, 1, 256))], axis=1)
+    store = FeatureStore(str(tmp_path))
+    for method in ('coh', 'plv'):
+        X = feature_backend.connectivity_features(epochs, 128.0, bands=[(8, 30)], method=method, store=store)
+        np.testing.assert_allclose(X[:, 0], 1.0)  # Pair (0, 1)
+        assert np.all(X[:, 1:] < 0.9)
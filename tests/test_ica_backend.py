@@ -0,0 +1,97 @@
+import numpy as np
+import mne
+
+from Backend.ica_backend import IcaComponentCache, fit_or_update_ica, save_ica_snapshot, score_ica_components
+from Backend.streaming_backend import build_stream_chain, _ica_projection
+
+def _raw(seed, n_channels=6):
+    data = np.random.default_rng(seed).laplace(size=(n_channels, 5000)) * 1e-6
+    return mne.io.RawArray(data, mne.create_info(n_channels, 250.0, 'eeg'), verbose=False)
+
+def _montage_raw(seed):
+    raw = _raw(seed)
+    raw.rename_channels(dict(zip(raw.ch_names, ["Fp1", "Fp2", "C3", "C4", "O1", "O2"])))
+    return raw.set_montage("easycap-M1")
+
+def test_pipeline_step_keeps_its_snapshot(tmp_path):
+    working_file = str(tmp_path / "project-ica.fif")
+    ica, _ = fit_or_update_ica(_raw(0), 4, working_file)
+    snapshot = save_ica_snapshot(ica, str(tmp_path / "ica"), exclude=[1])
+    expected = _ica_projection(ica, ica.ch_names, [1])[0]
+    # A later run refits the working file with another component count
+    other, _ = fit_or_update_ica(_raw(1), 3, working_file)
+    assert save_ica_snapshot(other, str(tmp_path / "ica"), exclude=[0]) != snapshot
+
+    step = {"type": "ica", "params": {"exclude": [1], "ica_file": snapshot}}
+    stages, _ = build_stream_chain([step], 250.0, ica.ch_names, ica=other)
+    assert mne.preprocessing.read_ica(snapshot, verbose=False).exclude == [1]
+    np.testing.assert_allclose(stages[0].matrix, expected)
+
+def test_cancelled_fit_leaves_the_stored_ica(tmp_path):
+    from Backend.ica_backend import fit_or_update_ica_cancellable
+    working_file = str(tmp_path / "project-ica.fif")
+    ica, report = fit_or_update_ica_cancellable(_raw(0), 4, working_file)
+    expected, _ = fit_or_update_ica(_raw(0), 4)
+    assert report is None and ica.n_components_ == 4
+    np.testing.assert_allclose(ica.unmixing_matrix_, expected.unmixing_matrix_)
+    assert mne.preprocessing.read_ica(working_file, verbose=False).n_components_ == 4
+    # A refit with another component count is cancelled right away
+    assert fit_or_update_ica_cancellable(_raw(1), 3, working_file, stop_requested=lambda: True) is None
+    assert mne.preprocessing.read_ica(working_file, verbose=False).n_components_ == 4
+
+def test_online_report_saves_no_batch_iterations():
+    from Backend.ica_backend import OnlineIca
+    ica, _ = fit_or_update_ica(_raw(0), 4)
+    online = OnlineIca(ica)
+    online.partial_fit(_raw(1).get_data())
+    report = online.report()
+    assert report["iterations_saved"] is None and report["reference_iter"] == ica.n_iter_
+
+def test_component_thumbnails_are_cached_per_size():
+    raw = _montage_raw(0)
+    ica, _ = fit_or_update_ica(raw, 4)
+    cache = IcaComponentCache(ica, raw, trace_seconds=4.0, max_thumbnails=2)
+    assert cache.sources.shape == (4, 1000) and cache.topomaps.shape == (4, 48, 48)
+    image = cache.thumbnail(0, 200, 60)
+    assert image.shape == (60, 200, 4) and image.dtype == np.uint8
+    assert cache.thumbnail(0, 200, 60) is image and cache.has_thumbnail(0, 200, 60)
+    assert not np.array_equal(cache.thumbnail(1, 200, 60), image)
+    # Beyond max_thumbnails the least recently used one is dropped
+    cache.thumbnail(0, 200, 60)
+    cache.thumbnail(2, 200, 60)
+    assert cache.has_thumbnail(0, 200, 60) and not cache.has_thumbnail(1, 200, 60)
+    # Channels without positions get the trace only
+    plain = IcaComponentCache(*fit_or_update_ica(_raw(0), 4)[:1], _raw(0))
+    assert plain.topomaps is None and plain.thumbnail(3, 200, 60).shape == (60, 200, 4)
+
+def _artifact_raw(seed, sfreq=250.0, seconds=60):
+    # Four brain sources mixed everywhere, blinks on the frontal channels, 50 Hz line noise and a noisy O2 electrode
+    rng = np.random.default_rng(seed)
+    n_times = int(sfreq * seconds)
+    times = np.arange(n_times) / sfreq
+    brain = np.cumsum(rng.standard_normal((4, n_times)), axis=1)
+    brain -= np.array([np.convolve(source, np.ones(250) / 250, mode='same') for source in brain])
+    brain /= brain.std(axis=1, keepdims=True)
+    brain[0] += np.sin(2 * np.pi * 10 * times)
+    blinks = np.zeros(n_times)
+    for onset in rng.choice(n_times - 100, 40, replace=False):
+        blinks[onset:onset + 100] += 5 * np.hanning(100)
+    sources = np.vstack([brain, blinks, np.sin(2 * np.pi * 50 * times), rng.standard_normal(n_times)])
+    mixing = np.c_[rng.uniform(0.5, 1.0, (8, 4)) * rng.choice([-1, 1], (8, 4)), [3, 3, 0.5, 0.5, 0.1, 0.1, 0.05, 0.05],
+                   np.full(8, 0.5), np.eye(8)[7] * 2]
+    data = (mixing @ sources + 0.01 * rng.standard_normal((8, n_times))) * 1e-5
+    info = mne.create_info(["Fp1", "Fp2", "F3", "F4", "C3", "C4", "O1", "O2"], sfreq, 'eeg')
+    return mne.io.RawArray(data, info, verbose=False).filter(1.0, None, verbose=False), sources
+
+def test_synthetic_artifacts_get_their_labels():
+    raw, sources = _artifact_raw(0)
+    ica, _ = fit_or_update_ica(raw, 7)
+    scores = score_ica_components(ica, raw)
+    # The component of every artifact is the one that recovers its source
+    correlations = np.abs(np.corrcoef(sources[4:], ica.get_sources(raw).get_data())[:3, 3:])
+    artifacts = list(correlations.argmax(axis=1))
+    assert [scores["labels"][i] for i in artifacts] == ["eye", "line_noise", "channel_noise"]
+    assert sorted(scores["exclude"]) == sorted(artifacts)
+    assert scores["labels"].count("brain") == 4
+    strict = score_ica_components(ica, raw, thresholds={"eye": ("frontal_correlation", 1.1)})
+    assert strict["labels"][artifacts[0]] != "eye"
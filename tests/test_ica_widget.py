@@ -0,0 +1,40 @@
+import os
+import numpy as np
+import mne
+import pytest
+
+pytest.importorskip("PyQt5")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication
+
+from ICA_widget import THUMBNAIL_SIZE, IcaComponentModel
+from Backend.ica_backend import IcaComponentCache, fit_or_update_ica
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+def test_thumbnails_are_rendered_lazily_for_the_requested_rows(app):
+    data = np.random.default_rng(0).laplace(size=(6, 5000)) * 1e-6
+    raw = mne.io.RawArray(data, mne.create_info(6, 250.0, 'eeg'), verbose=False)
+    ica, _ = fit_or_update_ica(raw, 4)
+    model = IcaComponentModel(IcaComponentCache(ica, raw), labels=["eye", "brain", "brain", "line_noise"])
+    size = (THUMBNAIL_SIZE.width(), THUMBNAIL_SIZE.height())
+    changed = []
+    model.dataChanged.connect(lambda first, last, roles: changed.append((first.row(), list(roles))))
+    assert model.rowCount() == 4 and model.data(model.index(3)) == "IC 3: line_noise"
+
+    # Painting rows only queues them, the placeholder is shown until the event loop renders them
+    assert model.data(model.index(1), Qt.DecorationRole) is model.placeholder
+    assert model.data(model.index(2), Qt.DecorationRole) is model.placeholder
+    assert model.pending == [1, 2] and not model.cache.has_thumbnail(1, *size)
+    model.render_next()
+    assert changed == [(2, [Qt.DecorationRole])]  # The most recently requested row comes first
+    while model.pending:
+        app.processEvents()
+    assert [model.cache.has_thumbnail(row, *size) for row in range(4)] == [False, True, True, False]
+    assert model.data(model.index(1), Qt.DecorationRole).size() == THUMBNAIL_SIZE
+
+    assert model.setData(model.index(0), Qt.Unchecked, Qt.CheckStateRole)
+    assert model.checked_components() == [1, 2, 3]
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from sklearn import svm
+from sklearn.datasets import make_classification
+from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+
+from Backend.inference_backend import export_linear_model
+from Backend.online_backend import AdaptiveLDA
+
+def _features(n_classes, seed=0):
+    X, y = make_classification(n_samples=300, n_features=8, n_informative=6, n_classes=n_classes, random_state=seed)
+    return X, np.array(["left", "right", "rest", "feet"])[y]
+
+@pytest.mark.parametrize("n_classes", [2, 4])
+@pytest.mark.parametrize("model", [LinearDiscriminantAnalysis(), LogisticRegression(max_iter=1000),
+                                   SGDClassifier(random_state=0), svm.SVC(kernel='linear', decision_function_shape='ovo')],
+                         ids=lambda model: type(model).__name__)
+def test_exported_predictor_matches_sklearn(model, n_classes):
+    X, y = _features(n_classes)
+    model.fit(X[:200], y[:200])
+    predictor = export_linear_model(model, max_batch=8)
+    X_test = X[200:]  # Larger than max_batch, so the buffers grow
+    np.testing.assert_array_equal(predictor.predict(X_test), model.predict(X_test))
+    scores = model.decision_function(X_test)
+    np.testing.assert_allclose(predictor.decision_function(X_test), scores.reshape(len(X_test), -1), atol=1e-8)
+    assert predictor.predict_one(X_test[0]) == model.predict(X_test[:1])[0]
+
+def test_adaptive_lda_and_nonlinear_models():
+    X, y = _features(4)
+    adaptive = AdaptiveLDA().partial_fit(X, y, classes=np.unique(y))
+    np.testing.assert_array_equal(export_linear_model(adaptive).predict(X), adaptive.predict(X))
+    with pytest.raises(ValueError):
+        export_linear_model(svm.SVC(kernel='rbf').fit(X, y))
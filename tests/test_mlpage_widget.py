@@ -0,0 +1,67 @@
+import os
+import json
+import numpy as np
+import pytest
+
+pytest.importorskip("PyQt5")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt5.QtWidgets import QApplication
+
+import mlpage_widget
+from mlpage_widget import MLPageWidget
+from Backend.model_backend import ModelRegistry
+
+LDA = "Linear Discriminant Analysis (LDA)"
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+def _recording(path, write_edf, seed):
+    # 'left' epochs have three times the amplitude on the first channel
+    rng = np.random.default_rng(seed)
+    data = rng.standard_normal((3, 1280)) * 1e-5
+    labels = ["left" if second % 2 == 0 else "right" for second in range(10)]
+    for second, label in enumerate(labels):
+        if label == "left":
+            data[0, second * 128:(second + 1) * 128] *= 3
+    return write_edf(path, data, 128, annotations=list(enumerate(labels)))
+
+def _wait(app, worker):
+    worker.wait()
+    app.processEvents()  # Deliver the signals the worker queued for the GUI thread
+
+def test_train_button_cross_validates_the_project_recordings(app, tmp_path, write_edf, monkeypatch):
+    recordings = tmp_path / "data" / "preprocessed_data"
+    recordings.mkdir(parents=True)
+    (tmp_path / "models").mkdir()
+    (tmp_path / "project.json").write_text(json.dumps({"project_name": "test", "preprocessing_settings": []}))
+    for seed in range(2):
+        _recording(recordings / f"session{seed}.edf", write_edf, seed)
+    calls = []
+    cross_validate = mlpage_widget.cross_validate_pipeline
+    monkeypatch.setattr(mlpage_widget, "cross_validate_pipeline",
+                        lambda pipeline, X, y, groups, **kwargs: calls.append((X, y, groups)) or
+                        cross_validate(pipeline, X, y, groups, **kwargs))
+
+    widget = MLPageWidget(str(tmp_path / "project.json"))
+    widget.trainRequested.connect(widget.on_train)
+    widget.load_project_data()
+    _wait(app, widget.feature_worker)
+    widget.model_combo.setCurrentText(LDA)
+    widget.add_model_to_pipeline()
+    widget.train_pipeline()
+    _wait(app, widget.training_worker)
+
+    X, y, groups = calls[0]
+    assert X.shape == (20, 3) and sorted(set(y)) == ["left", "right"] and len(set(groups)) == 2
+    assert LDA in widget.trained_models
+    assert ModelRegistry(str(tmp_path / "models")).versions(LDA) == [1]
+
+    # A recording added to the project only extends the data and warm-starts the saved model
+    _recording(recordings / "session2.edf", write_edf, 2)
+    widget.load_project_data()
+    _wait(app, widget.feature_worker)
+    _wait(app, widget.retrain_worker)
+    assert len(widget.training_data[0]) == 30
+    assert ModelRegistry(str(tmp_path / "models")).versions(LDA) == [1, 2]
@@ -0,0 +1,32 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from Backend.model_backend import ModelRegistry, save_model_version, load_model_version
+from Backend.online_backend import AdaptiveLDA
+
+def _save(args):
+    models_dir, i = args
+    return save_model_version(models_dir, "LDA", {"weights": np.full(1000, i)})[0]
+
+def test_loaded_online_model_can_be_updated(tmp_path):
+    rng = np.random.default_rng(0)
+    X, y = rng.standard_normal((40, 3)), np.repeat([0, 1], 20)
+    save_model_version(str(tmp_path), "Adaptive LDA", AdaptiveLDA().fit(X, y))
+    model, _ = load_model_version(str(tmp_path), "Adaptive LDA")
+    model.partial_fit(X[:5], y[:5])
+    read_only, _ = ModelRegistry(str(tmp_path), mmap_mode='r').load("Adaptive LDA")
+    assert not read_only.means_.flags.writeable
+
+def test_concurrent_saves_get_distinct_versions(tmp_path):
+    models_dir = str(tmp_path)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        thread_versions = list(executor.map(_save, [(models_dir, i) for i in range(16)]))
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        process_versions = list(executor.map(_save, [(models_dir, i) for i in range(8)]))
+    versions = thread_versions + process_versions
+    assert sorted(versions) == list(range(1, 25))
+    registry = ModelRegistry(models_dir)
+    assert registry.versions("LDA") == list(range(1, 25))
+    for version in versions:
+        model, entry = registry.load("LDA", version)
+        assert len(model["weights"]) == 1000
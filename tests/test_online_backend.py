@@ -0,0 +1,50 @@
+import joblib
+import numpy as np
+from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
+
+from Backend.online_backend import AdaptiveLDA
+
+MIXING = np.random.default_rng(42).standard_normal((4, 4))
+
+def _data(n_samples=300, seed=0, shift=0.0):
+    rng = np.random.default_rng(seed)
+    y = rng.integers(0, 3, n_samples)
+    X = rng.standard_normal((n_samples, 4)) @ MIXING + np.eye(3, 4)[y] * 1.5 + shift
+    return X, y
+
+def test_online_updates_match_batch_lda():
+    X, y = _data()
+    batch = LinearDiscriminantAnalysis(solver='lsqr').fit(X, y)
+    online = AdaptiveLDA(reg=1e-9, refresh_every=50)
+    for start in range(0, len(X), 7):
+        online.partial_fit(X[start:start + 7], y[start:start + 7], classes=[0, 1, 2])
+    fitted = AdaptiveLDA(reg=1e-9).fit(X, y)
+    for model in (online, fitted):
+        np.testing.assert_allclose(model.predict_proba(X), batch.predict_proba(X), atol=1e-6)
+        np.testing.assert_array_equal(model.predict(X), batch.predict(X))
+
+def test_two_class_decision_function_matches_batch_lda():
+    X, y = _data()
+    X, y = X[y < 2], y[y < 2]
+    batch = LinearDiscriminantAnalysis(solver='lsqr').fit(X, y)
+    online = AdaptiveLDA(reg=1e-9).partial_fit(X, y)
+    np.testing.assert_allclose(online.decision_function(X), batch.decision_function(X), rtol=1e-6, atol=1e-6)
+
+def test_forgetting_follows_a_drifting_session():
+    X, y = _data()
+    forgetful = AdaptiveLDA(forgetting=0.98).fit(X, y)
+    stationary = AdaptiveLDA().fit(X, y)
+    # Every feature of the new session is offset, as after an electrode impedance change
+    X_drift, y_drift = _data(seed=1, shift=3.0)
+    for model in (forgetful, stationary):
+        model.partial_fit(X_drift[:200], y_drift[:200])
+    assert forgetful.score(X_drift[200:], y_drift[200:]) > stationary.score(X_drift[200:], y_drift[200:])
+
+def test_checkpoint_restores_the_model(tmp_path):
+    X, y = _data()
+    model = AdaptiveLDA().fit(X[:100], y[:100])
+    path = model.checkpoint(str(tmp_path / "adaptive.joblib"), block=True)
+    restored = joblib.load(path)
+    restored.partial_fit(X[100:], y[100:])
+    model.partial_fit(X[100:], y[100:])
+    np.testing.assert_allclose(restored.predict_proba(X), model.predict_proba(X))
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
+
+from Backend.streaming_backend import InferenceService
+
+def _model():
+    rng = np.random.default_rng(0)
+    return LinearDiscriminantAnalysis().fit(rng.standard_normal((20, 2)), np.repeat([0, 1], 10))
+
+def test_step_shorter_than_a_sample_is_rejected():
+    with pytest.raises(ValueError, match="at least one sample"):
+        InferenceService(_model(), 250.0, ["C3", "C4"], step=0.001)
+
+def test_one_sample_step():
+    service = InferenceService(_model(), 250.0, ["C3", "C4"], window=0.2, step=0.004, max_latency=float('inf'))
+    predictions = service.process_chunk(np.random.default_rng(1).standard_normal((2, 100)))
+    assert len(predictions) == 100 - 50 + 1
+
+def _adaptive_project(tmp_path):
+    import json
+    from Backend.model_backend import ModelRegistry
+    from Backend.online_backend import AdaptiveLDA
+    rng = np.random.default_rng(0)
+    # Log-variance features: "high" windows have ten times the power on C3
+    X = np.log(rng.uniform(0.5, 2.0, (40, 2)))
+    y = np.repeat(["low", "high"], 20)
+    X[y == "high", 0] += np.log(10)
+    (tmp_path / "project.json").write_text(json.dumps({"preprocessing_settings": []}))
+    ModelRegistry(str(tmp_path / "models")).save("Adaptive LDA", AdaptiveLDA().fit(X, y))
+    return str(tmp_path / "project.json")
+
+def test_feedback_updates_the_live_adaptive_model(tmp_path):
+    from Backend.streaming_backend import load_inference_service
+    service = load_inference_service(_adaptive_project(tmp_path), "Adaptive LDA", 100.0, ["C3", "C4"], window=1.0,
+                                     step=1.0, max_latency=float('inf'))
+    rng = np.random.default_rng(1)
+    quiet = rng.standard_normal((2, 1000))
+    assert {prediction["label"] for prediction in service.process_chunk(quiet)} == {"low"}
+    # After the user teaches it that quiet windows are now "high", the same input is predicted "high"
+    for _ in range(5):
+        for prediction in service.process_chunk(rng.standard_normal((2, 1000))):
+            service.feedback(prediction["sample"], "high")
+    assert service.stats()["feedback"] == 50
+    assert {prediction["label"] for prediction in service.process_chunk(quiet)} == {"high"}
+    with pytest.raises(ValueError):
+        service.feedback(0, "low")  # No window ends there
+
+def test_feedback_needs_an_adaptive_model():
+    service = InferenceService(_model(), 250.0, ["C3", "C4"], window=0.2, step=0.2, max_latency=float('inf'))
+    prediction = service.process_chunk(np.zeros((2, 50)))[0]
+    with pytest.raises(ValueError, match="cannot be updated"):
+        service.feedback(prediction["sample"], 1)
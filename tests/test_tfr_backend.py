@@ -0,0 +1,30 @@
+import numpy as np
+import mne
+
+from Backend.tfr_backend import tfr_morlet, _wavelet_half_length
+
+def test_tfr_morlet_matches_mne_on_short_window():
+    rng = np.random.default_rng(0)
+    sfreq = 250.0
+    data = rng.standard_normal((2, 3, 300))
+    freqs = np.array([4.0, 8.0, 20.0, 40.0])
+    n_cycles = np.array([3.0, 4.0, 7.0, 7.0])
+    ours = tfr_morlet(data, sfreq, freqs, n_cycles, dtype=np.float64)
+    # The 4 Hz wavelet (299 samples) nearly fills the 300 sample window; our wavelets are not zero-mean
+    theirs = mne.time_frequency.tfr_array_morlet(data, sfreq, freqs, n_cycles, zero_mean=False, output='power',
+                                                 verbose=False)
+    np.testing.assert_allclose(ours, theirs, rtol=0, atol=1e-9 * theirs.max())
+
+def test_tfr_morlet_wavelet_longer_than_signal():
+    # 1 Hz with 3 cycles at 250 Hz spans ~4.8 s, far longer than the 0.4 s window (MNE refuses this case)
+    rng = np.random.default_rng(1)
+    sfreq, freq, n_cycles, n_times = 250.0, 1.0, 3.0, 100
+    data = rng.standard_normal(n_times)
+    coefs = tfr_morlet(data[np.newaxis], sfreq, [freq], n_cycles, output='complex', dtype=np.float64)[0, 0, 0]
+    half = _wavelet_half_length(sfreq, freq, n_cycles)
+    sigma_t = n_cycles / (2.0 * np.pi * freq)
+    t = np.arange(-half, half + 1) / sfreq
+    wavelet = np.exp(2j * np.pi * freq * t) * np.exp(-t ** 2 / (2.0 * sigma_t ** 2))
+    wavelet /= np.sqrt(0.5) * np.linalg.norm(wavelet)
+    expected = np.convolve(data, wavelet)[half:half + n_times]
+    np.testing.assert_allclose(coefs, expected, atol=1e-12)
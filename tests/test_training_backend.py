@@ -0,0 +1,82 @@
+import json
+import numpy as np
+import pytest
+
+from Backend.training_backend import (SEARCH_SPACES, make_candidates, successive_halving_search, warm_start_retrain,
+                                      retrain_with_new_sessions)
+
+def _effective_lda_params(params):
+    # LinearDiscriminantAnalysis ignores shrinkage with the 'svd' solver
+    return {**params, "Shrinkage": "None"} if params["Solver"] == "svd" else params
+
+def test_lda_search_space_has_no_duplicate_models():
+    for mode in ('grid', 'random'):
+        candidates = make_candidates(SEARCH_SPACES["Linear Discriminant Analysis (LDA)"], mode)
+        keys = [json.dumps(_effective_lda_params(c), sort_keys=True) for c in candidates]
+        assert len(keys) == len(set(keys)) == 9
+
+def test_search_result_names_the_searched_model():
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((120, 4))
+    y = (X[:, 0] > 0).astype(int)
+    result = successive_halving_search("Linear Discriminant Analysis (LDA)", X, y, mode='grid', n_jobs=1, refit=False)
+    assert result["model"] == "Linear Discriminant Analysis (LDA)"
+    assert result["best_params"] in make_candidates(SEARCH_SPACES["Linear Discriminant Analysis (LDA)"], 'grid')
+
+def test_search_resumes_only_on_the_same_data(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((120, 4))
+    y = (X[:, 0] > 0).astype(int)
+    results_path = str(tmp_path / "search.jsonl")
+    search = lambda X, y, evaluated: successive_halving_search("Linear Discriminant Analysis (LDA)", X, y, mode='grid',
+                                                               n_jobs=1, refit=False, results_path=results_path,
+                                                               callback=evaluated.append)
+    first = []
+    result = search(X, y, first)
+    resumed = []
+    assert search(X, y, resumed)["best_score"] == result["best_score"] and not resumed
+    # Same shape and parameters, different labels: nothing is reused
+    relabelled = []
+    search(X, 1 - y, relabelled)
+    assert len(relabelled) == len(first)
+
+def test_warm_start_grows_the_forest_with_the_new_sessions():
+    from sklearn.ensemble import RandomForestClassifier
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((200, 4))
+    y = (X[:, 0] > 0).astype(int)
+    forest = RandomForestClassifier(n_estimators=8, random_state=0).fit(X[:150], y[:150])
+    model, strategy = warm_start_retrain(forest, X, y, X[150:], y[150:])
+    assert strategy == 'warm_start' and len(model.estimators_) == 10
+    for kept, tree in zip(model.estimators_, forest.estimators_):
+        np.testing.assert_array_equal(kept.tree_.value, tree.tree_.value)
+    assert len(forest.estimators_) == 8  # The given model is left as it was
+
+def test_partial_fit_learns_the_labels_of_the_new_sessions(tmp_path):
+    from sklearn.linear_model import SGDClassifier
+    from Backend.model_backend import save_model_version
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((400, 2))
+    y = (X[:, 0] > 0).astype(int)
+    X_new = rng.standard_normal((400, 2))
+    y_new = (X_new[:, 1] > 0).astype(int)  # The new sessions follow another rule
+    model = SGDClassifier(random_state=0).fit(X, y)
+    with pytest.raises(ValueError):
+        warm_start_retrain(model, np.concatenate([X, X_new]), np.concatenate([y, y_new]), X_new)
+    save_model_version(str(tmp_path), "SGD", model)
+    result = retrain_with_new_sessions(str(tmp_path), "SGD", np.concatenate([X, X_new]), np.concatenate([y, y_new]),
+                                       X_new, y_new)
+    assert result["strategy"] == 'partial_fit'
+    assert result["model"].score(X_new, y_new) > model.score(X_new, y_new)
+    assert result["metrics"]["accuracy"] == pytest.approx(result["model"].score(X_new, y_new))
+
+def test_stop_requested_cancels_the_folds_left():
+    from Backend.training_backend import cross_validate_pipeline
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((100, 4))
+    y = (X[:, 0] > 0).astype(int)
+    finished = []
+    with pytest.raises(InterruptedError):
+        cross_validate_pipeline([{"model": "Linear Discriminant Analysis (LDA)", "params": {}}] * 4, X, y, n_jobs=1,
+                                callback=finished.append, stop_requested=lambda: len(finished) > 0)
+    assert len(finished) < 4 * 6
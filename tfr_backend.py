@@ -0,0 +1,192 @@
+import numpy as np
+from functools import lru_cache
+from scipy import fft as sp_fft
+
+"""
+Time-frequency representations (Morlet wavelets) for the "Spectrogram" plot and for deep-learning
+inputs shaped (channels, freq, time). Convolution is done in the frequency domain and the FFTs of the
+wavelets are cached, so repeated calls with the same settings only transform the data.
+"""
+
+def _as_tuple(values, n):
+    values = np.atleast_1d(np.asarray(values, dtype=float))
+    if values.size == 1:
+        values = np.repeat(values, n)
+    return tuple(float(v) for v in values)
+
+def _wavelet_half_length(sfreq, freq, n_cycles):
+    """Number of samples on each side of the wavelet centre (the Gaussian is cut before 5 sigma, as in MNE)."""
+    sigma_t = n_cycles / (2.0 * np.pi * freq)
+    return len(np.arange(0.0, 5.0 * sigma_t, 1.0 / sfreq)) - 1
+
+@lru_cache(maxsize=32)
+def _cached_wavelet_spectra(sfreq, freqs, n_cycles, n_fft):
+    spectra = np.zeros((len(freqs), n_fft), dtype=np.complex128)
+    for k, (freq, cycles) in enumerate(zip(freqs, n_cycles)):
+        half = _wavelet_half_length(sfreq, freq, cycles)
+        t = np.arange(-half, half + 1) / sfreq
+        sigma_t = cycles / (2.0 * np.pi * freq)
+        wavelet = np.exp(2j * np.pi * freq * t) * np.exp(-t ** 2 / (2.0 * sigma_t ** 2))
+        wavelet /= np.sqrt(0.5) * np.linalg.norm(wavelet)
+        # Centre the wavelet on sample 0 (negative times wrap to the end) so every frequency
+        # lines up with the signal without a per-wavelet offset
+        kernel = np.zeros(n_fft, dtype=np.complex128)
+        kernel[:half + 1] = wavelet[half:]
+        kernel[n_fft - half:] = wavelet[:half]
+        spectra[k] = sp_fft.fft(kernel)
+    spectra.setflags(write=False)
+    return spectra
+
+def wavelet_spectra(sfreq, freqs, n_cycles, n_fft):
+    """Return the FFTs of the Morlet wavelets, cached by (sfreq, freqs, n_cycles, n_fft).
+
+    Parameters:
+    sfreq (float): Sampling frequency in Hz.
+    freqs (array-like): Wavelet frequencies in Hz.
+    n_cycles (float or array-like): Number of cycles per wavelet, a single value or one per frequency.
+    n_fft (int): FFT length.
+
+    Returns:
+    np.ndarray: Read-only complex array of shape (n_freqs, n_fft).
+    """
+    freqs = _as_tuple(freqs, 1)
+    return _cached_wavelet_spectra(float(sfreq), freqs, _as_tuple(n_cycles, len(freqs)), int(n_fft))
+
+def tfr_n_fft(sfreq, freqs, n_cycles, n_times):
+    """Smallest fast FFT length that avoids circular wrap-around for signals of n_times samples.
+
+    Both halves of the longest wavelet are padded, so the wavelet never overlaps itself in the FFT buffer
+    even when it is longer than the signal (short windows at low frequencies).
+    """
+    freqs = _as_tuple(freqs, 1)
+    n_cycles = _as_tuple(n_cycles, len(freqs))
+    longest = max(_wavelet_half_length(sfreq, f, c) for f, c in zip(freqs, n_cycles))
+    return sp_fft.next_fast_len(n_times + 2 * longest)
+
+def iter_tfr(data, sfreq, freqs, n_cycles=7.0, decim=1, output='power', chunk_size=8, dtype=np.float32, workers=None):
+    """Compute a Morlet time-frequency transform chunk by chunk.
+
+    Parameters:
+    data (array-like): EEG of shape (n_epochs, n_channels, n_times) or (n_channels, n_times), may be a memmap.
+    sfreq (float): Sampling frequency in Hz.
+    freqs (array-like): Wavelet frequencies in Hz.
+    n_cycles (float or array-like): Number of cycles per wavelet.
+    decim (int): Keep every decim-th time sample of the output.
+    output (str): 'power' for squared magnitude or 'complex' for the complex coefficients.
+    chunk_size (int): Number of epochs transformed at a time, all of their channels are batched together.
+    dtype (np.dtype): Precision of the yielded blocks (complex output uses the matching complex type).
+    workers (int or None): Number of threads used by scipy.fft.
+
+    Yields:
+    tuple: (start_epoch, block) where block has shape (n_chunk_epochs, n_channels, n_freqs, n_out_times).
+    """
+    if output not in ('power', 'complex'):
+        raise ValueError(f"Unknown TFR output {output}")
+    if data.ndim == 2:
+        data = data[np.newaxis]
+    n_epochs, n_channels, n_times = data.shape
+    n_fft = tfr_n_fft(sfreq, freqs, n_cycles, n_times)
+    spectra = wavelet_spectra(sfreq, freqs, n_cycles, n_fft)
+    out_dtype = np.dtype(dtype) if output == 'power' else np.result_type(dtype, np.complex64)
+
+    n_out = len(range(0, n_times, decim))
+
+    for start in range(0, n_epochs, chunk_size):
+        block = np.asarray(data[start:start + chunk_size], dtype=np.float64)
+        signal_fft = sp_fft.fft(block, n=n_fft, axis=-1, workers=workers)
+        out = np.empty((len(block), n_channels, len(spectra), n_out), dtype=out_dtype)
+        # One frequency at a time keeps the complex intermediate at (epochs, channels, n_fft)
+        for k, wavelet_fft in enumerate(spectra):
+            coefs = sp_fft.ifft(signal_fft * wavelet_fft, axis=-1, workers=workers)[..., :n_times:decim]
+            out[:, :, k] = coefs.real ** 2 + coefs.imag ** 2 if output == 'power' else coefs
+        yield start, out
+
+def tfr_morlet(data, sfreq, freqs, n_cycles=7.0, decim=1, output='power', chunk_size=8, dtype=np.float32,
+               store=None, source=None, workers=None):
+    """Morlet time-frequency transform of every channel of every epoch.
+
+    When a FeatureStore is given the result is streamed into it chunk by chunk and returned as a
+    read-only memmap, so large spectrogram tensors never have to be held in RAM.
+
+    Parameters:
+    data (array-like): EEG of shape (n_epochs, n_channels, n_times) or (n_channels, n_times).
+    sfreq (float): Sampling frequency in Hz.
+    freqs (array-like): Wavelet frequencies in Hz.
+    n_cycles (float or array-like): Number of cycles per wavelet.
+    decim (int): Keep every decim-th time sample of the output.
+    output (str): 'power' or 'complex'.
+    chunk_size (int): Number of epochs transformed at a time.
+    dtype (np.dtype): Output precision.
+    store (FeatureStore or None): Feature store the result is written to.
+    source (str or None): Identity of the data for the cache, e.g. the .edf filepath. Defaults to hashing data.
+    workers (int or None): Number of threads used by scipy.fft.
+
+    Returns:
+    np.ndarray: Array of shape (n_epochs, n_channels, n_freqs, n_out_times), a memmap when store is given.
+    """
+    if data.ndim == 2:
+        data = data[np.newaxis]
+    n_epochs, n_channels, n_times = data.shape
+    n_out = len(range(0, n_times, decim))
+    out_dtype = np.dtype(dtype) if output == 'power' else np.result_type(dtype, np.complex64)
+    shape = (n_epochs, n_channels, len(np.atleast_1d(freqs)), n_out)
+    chunks = iter_tfr(data, sfreq, freqs, n_cycles, decim, output, chunk_size, dtype, workers)
+
+    if store is None:
+        tfr = np.empty(shape, dtype=out_dtype)
+        for start, block in chunks:
+            tfr[start:start + len(block)] = block
+        return tfr
+
+    source = data if source is None else source
+    params = {"sfreq": sfreq, "freqs": list(_as_tuple(freqs, 1)), "n_cycles": list(_as_tuple(n_cycles, shape[2])),
+              "decim": decim, "output": output, "dtype": out_dtype.name}
+    key = store.key("tfr_morlet", source, params)
+    if store.contains(key):
+        return store.load(key)
+    return store.write_chunks(key, shape, out_dtype, chunks)
+
+def spectrogram_input(epochs, sfreq, n_freqs=128, n_times_out=128, fmin=1.0, fmax=None, n_cycles=None,
+                      store=None, source=None):
+    """Build deep-learning inputs shaped (channels, freq, time), e.g. "(channels, 128, 128)".
+
+    Parameters:
+    epochs (array-like): Epoched EEG of shape (n_epochs, n_channels, n_times).
+    sfreq (float): Sampling frequency in Hz.
+    n_freqs (int): Number of log-spaced frequencies.
+    n_times_out (int): Number of time samples kept per epoch.
+    fmin (float): Lowest frequency in Hz.
+    fmax (float or None): Highest frequency in Hz, defaults to 0.45 * sfreq.
+    n_cycles (float, array-like or None): Cycles per wavelet, defaults to freqs / 2 bounded below by 3.
+    store (FeatureStore or None): Feature store the tensor is written to.
+    source (str or None): Identity of the data for the cache.
+
+    Returns:
+    np.ndarray: float32 log-power array of shape (n_epochs, n_channels, n_freqs, n_times_out).
+    """
+    fmax = fmax or 0.45 * sfreq
+    freqs = np.geomspace(fmin, fmax, n_freqs)
+    if n_cycles is None:
+        n_cycles = np.maximum(freqs / 2.0, 3.0)
+    n_epochs, n_channels, n_times = epochs.shape
+    if n_times < n_times_out:
+        raise ValueError(f"Epochs have {n_times} samples, fewer than the {n_times_out} requested time steps")
+    decim = n_times // n_times_out
+    tiny = np.finfo(np.float32).tiny
+    chunks = ((start, np.log10(block[..., :n_times_out] + tiny))
+              for start, block in iter_tfr(epochs, sfreq, freqs, n_cycles, decim=decim))
+    shape = (n_epochs, n_channels, n_freqs, n_times_out)
+
+    if store is None:
+        spectrograms = np.empty(shape, dtype=np.float32)
+        for start, block in chunks:
+            spectrograms[start:start + len(block)] = block
+        return spectrograms
+
+    source = epochs if source is None else source
+    params = {"sfreq": sfreq, "freqs": freqs.tolist(), "n_cycles": list(_as_tuple(n_cycles, n_freqs)),
+              "n_times_out": n_times_out}
+    key = store.key("spectrogram_input", source, params)
+    if store.contains(key):
+        return store.load(key)
+    return store.write_chunks(key, shape, np.float32, chunks)
@@ -0,0 +1,505 @@
+import os
+import json
+import math
+import mmap
+import time
+import tempfile
+import copy
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from sklearn.model_selection import KFold, StratifiedKFold, GroupKFold
+from sklearn import metrics
+from sklearn.base import clone
+from sklearn.cluster import KMeans
+from sklearn.mixture import GaussianMixture
+
+from Backend.ai_backend import train_model, is_supervised
+from Backend.clustering_backend import partial_fit_batches
+from Backend.model_backend import save_model_version, load_model_version, feature_hash
+
+"""
+Cross-validated training of the MLPageWidget pipeline. Every (model, fold) pair is an independent
+task on a process pool. The training matrix is written once to a .npy file and every worker opens it
+with memory-mapping, so it is never pickled to the workers.
+"""
+
+def share_array(array, directory, name):
+    """Helper function that makes an array available to worker processes as a .npy file.
+
+    Arrays that are already memory-mapped .npy files (e.g. from the FeatureStore) are reused in place.
+
+    Parameters:
+    array (array-like): The array to share.
+    directory (str): Directory for the file if one has to be written.
+    name (str): File name (without extension) if one has to be written.
+
+    Returns:
+    str: Path of a .npy file holding the array.
+    """
+    # Only a whole mapped file (not a slice of one) can be reopened from its filename
+    if isinstance(array, np.memmap) and isinstance(array.base, mmap.mmap) and str(array.filename).endswith('.npy'):
+        return str(array.filename)
+    path = os.path.join(directory, f"{name}.npy")
+    np.save(path, np.asarray(array))
+    return path
+
+def completed_until_stopped(futures, stop_requested=None, poll=0.2):
+    """Helper function that yields futures as they complete, like as_completed, until stop_requested() is True.
+
+    The futures that have not started are then cancelled and InterruptedError is raised, leaving the
+    running ones to finish when the executor shuts down.
+    """
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=None if stop_requested is None else poll, return_when=FIRST_COMPLETED)
+        yield from done
+        if pending and stop_requested is not None and stop_requested():
+            for future in pending:
+                future.cancel()
+            raise InterruptedError("Stopped before every task finished")
+
+def make_splits(n_samples, y=None, groups=None, n_splits=5, random_state=0):
+    """Build the cross-validation folds.
+
+    Parameters:
+    n_samples (int): Number of rows in the training matrix.
+    y (array-like or None): Labels, folds are stratified when given.
+    groups (array-like or None): Group of every row (e.g. subject or session), uses group k-fold when given.
+        With fewer groups than n_splits every group is held out once, a single group is ignored.
+    n_splits (int): Number of folds.
+    random_state (int): Seed used to shuffle rows before splitting.
+
+    Returns:
+    list: (train_indices, test_indices) pairs.
+    """
+    placeholder = np.zeros((n_samples, 1))
+    n_groups = len(np.unique(groups)) if groups is not None else 0
+    if n_groups >= 2:
+        return list(GroupKFold(n_splits=min(n_splits, n_groups)).split(placeholder, y, groups))
+    if y is not None:
+        return list(StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state).split(placeholder, y))
+    return list(KFold(n_splits=n_splits, shuffle=True, random_state=random_state).split(placeholder))
+
+def score_model(model, X, y=None):
+    """Evaluate a trained model on held-out data.
+
+    Returns:
+    dict: accuracy, balanced accuracy and macro F1 for classifiers, the model's own score for clustering models.
+    """
+    if y is None:
+        return {"score": float(model.score(X))}
+    y_pred = model.predict(X)
+    return {
+        "accuracy": float(metrics.accuracy_score(y, y_pred)),
+        "balanced_accuracy": float(metrics.balanced_accuracy_score(y, y_pred)),
+        "f1_macro": float(metrics.f1_score(y, y_pred, average='macro'))
+    }
+
+def _run_fold(model_index, model_config, X_path, y_path, train_idx, test_idx, fold):
+    """Worker task: train one model on one fold. With fold=None the model is refit on all rows."""
+    result = {"model_index": model_index, "model": model_config["model"], "fold": fold, "error": None}
+    try:
+        X = np.load(X_path, mmap_mode='r')
+        y = np.load(y_path, mmap_mode='r') if (y_path and is_supervised(model_config["model"])) else None
+        train_idx = np.arange(len(X)) if train_idx is None else train_idx
+        datafile = (X[train_idx], y[train_idx]) if y is not None else X[train_idx]
+        start = time.perf_counter()
+        model = train_model(model_config, datafile)
+        result["fit_time"] = time.perf_counter() - start
+        if fold is None:
+            result["estimator"] = model
+        else:
+            start = time.perf_counter()
+            result["metrics"] = score_model(model, X[test_idx], y[test_idx] if y is not None else None)
+            result["score_time"] = time.perf_counter() - start
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+def cross_validate_pipeline(pipeline, X, y=None, groups=None, n_splits=5, n_jobs=None, refit=True,
+                            random_state=0, callback=None, work_dir=None, stop_requested=None):
+    """Run k-fold (or group k-fold) cross-validation for every model in the pipeline in parallel.
+
+    Parameters:
+    pipeline (list): Model configs as emitted by MLPageWidget.trainRequested.
+    X (array-like): Feature matrix of shape (n_samples, n_features), may be a memmap.
+    y (array-like or None): Labels, needed by the supervised models.
+    groups (array-like or None): Group of every row, switches to group k-fold.
+    n_splits (int): Number of folds.
+    n_jobs (int or None): Number of worker processes, defaults to the number of CPUs.
+    refit (bool): Also train every model on all rows and return it.
+    random_state (int): Seed used to build the folds.
+    callback (function or None): Called with each fold result as soon as it finishes.
+    work_dir (str or None): Directory for the shared training matrix, defaults to the system temp directory.
+    stop_requested (function or None): Polled while waiting, the folds not started yet are cancelled once it returns True.
+
+    Returns:
+    list: One summary dict per pipeline entry with keys "model", "folds", "mean_metrics",
+    "mean_fit_time" and "estimator" (None when refit is False or the refit failed).
+
+    Raises:
+    InterruptedError: If stop_requested stopped the training.
+    """
+    splits = make_splits(len(X), y, groups, n_splits, random_state)
+    summaries = [{"model": config["model"], "folds": [], "mean_metrics": {}, "mean_fit_time": None, "estimator": None}
+                 for config in pipeline]
+
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        X_path = share_array(X, tmp_dir, "X")
+        y_path = share_array(y, tmp_dir, "y") if y is not None else None
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = []
+            for model_index, config in enumerate(pipeline):
+                for fold, (train_idx, test_idx) in enumerate(splits):
+                    futures.append(executor.submit(_run_fold, model_index, config, X_path, y_path, train_idx, test_idx, fold))
+                if refit:
+                    futures.append(executor.submit(_run_fold, model_index, config, X_path, y_path, None, None, None))
+            for future in completed_until_stopped(futures, stop_requested):
+                result = future.result()
+                summary = summaries[result["model_index"]]
+                if result["fold"] is None:
+                    summary["estimator"] = result.pop("estimator", None)
+                else:
+                    summary["folds"].append(result)
+                if callback is not None:
+                    callback({**result, "n_folds": len(splits), "n_tasks": len(futures)})
+
+    for summary in summaries:
+        folds = [fold for fold in summary["folds"] if fold["error"] is None]
+        summary["folds"].sort(key=lambda fold: fold["fold"])
+        if folds:
+            summary["mean_fit_time"] = float(np.mean([fold["fit_time"] for fold in folds]))
+            summary["mean_metrics"] = {name: float(np.mean([fold["metrics"][name] for fold in folds]))
+                                       for name in folds[0]["metrics"]}
+    return summaries
+
+### Hyperparameter search ###
+
+#Search spaces over the hyperparameters of MLPageWidget.hyperparam_config. A list is a set of choices,
+#("log", low, high), ("uniform", low, high) and ("int", low, high) are ranges. A space can also be a list
+#of such dicts when some hyperparameters only matter for some values of another (the union is searched)
+SEARCH_SPACES = {
+    "Linear Discriminant Analysis (LDA)": [
+        #The 'svd' solver forces shrinkage to None, searching it there would only repeat the same model
+        {"Solver": ["svd"], "Shrinkage": ["None"], "n_components": ["None"]},
+        {"Solver": ["lsqr", "eigen"], "Shrinkage": ["auto", 0.01, 0.1, 0.5], "n_components": ["None"]}
+    ],
+    "Support Vector Machine (SVM)": {
+        "Kernel": ["linear", "rbf", "poly", "sigmoid"],
+        "C": ("log", 1e-3, 1e3),
+        "Gamma": ("log", 1e-4, 10.0)
+    },
+    "Random Forest": {
+        "n_estimators": ("int", 50, 500),
+        "max_depth": ["None", 5, 10, 20, 40],
+        "min_samples_split": ("int", 2, 20),
+        "min_samples_leaf": ("int", 1, 10),
+        "max_features": ["sqrt", "log2"]
+    },
+    "Gradient Boosting Machine (GBM)": {
+        "n_estimators": ("int", 50, 500),
+        "learning_rate": ("log", 0.01, 0.3),
+        "max_depth": ("int", 2, 8),
+        "min_samples_split": ("int", 2, 20),
+        "subsample": ("uniform", 0.5, 1.0)
+    },
+    "Adaptive LDA (Online)": {
+        "forgetting": ("uniform", 0.95, 1.0),
+        "reg": ("log", 1e-6, 1e-1)
+    }
+}
+
+def _grid_values(spec, n_grid):
+    if isinstance(spec, list):
+        return spec
+    kind, low, high = spec
+    if kind == "log":
+        return [float(v) for v in np.geomspace(low, high, n_grid)]
+    if kind == "int":
+        return sorted({int(round(v)) for v in np.linspace(low, high, n_grid)})
+    return [float(v) for v in np.linspace(low, high, n_grid)]
+
+def _sample_value(spec, rng):
+    if isinstance(spec, list):
+        return spec[rng.integers(len(spec))]
+    kind, low, high = spec
+    if kind == "log":
+        return float(np.exp(rng.uniform(np.log(low), np.log(high))))
+    if kind == "int":
+        return int(rng.integers(low, high + 1))
+    return float(rng.uniform(low, high))
+
+def make_candidates(search_space, mode='random', n_candidates=27, n_grid=3, random_state=0):
+    """Build the hyperparameter candidates of a search.
+
+    Parameters:
+    search_space (dict or list): GUI hyperparameter name -> choices list or (kind, low, high) range, or a list
+        of such dicts whose candidates are pooled.
+    mode (str): 'grid' for every combination (ranges get n_grid points) or 'random' for n_candidates samples.
+    n_candidates (int): Number of random samples.
+    n_grid (int): Number of grid points per range in grid mode.
+    random_state (int): Seed for random sampling.
+
+    Returns:
+    list: Unique candidate dicts of GUI hyperparameter name -> value.
+    """
+    spaces = search_space if isinstance(search_space, list) else [search_space]
+    if mode == 'grid':
+        candidates = []
+        for space in spaces:
+            names = list(space)
+            grids = [_grid_values(space[name], n_grid) for name in names]
+            candidates.extend(dict(zip(names, values)) for values in itertools.product(*grids))
+        return candidates
+    rng = np.random.default_rng(random_state)
+    candidates, seen = [], set()
+    for _ in range(n_candidates * 20):
+        space = spaces[rng.integers(len(spaces))]
+        candidate = {name: _sample_value(spec, rng) for name, spec in space.items()}
+        key = json.dumps(candidate, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            candidates.append(candidate)
+        if len(candidates) == n_candidates:
+            break
+    return candidates
+
+def data_fingerprint(X, y=None):
+    """Identity of a training set (features and labels), so persisted results are only reused on the same data."""
+    return f"{feature_hash(X)}-{feature_hash(None if y is None else np.asarray(y).astype(str))}"
+
+def _load_search_results(results_path):
+    """Read the results a previous (possibly interrupted) search persisted, keyed by (params, n_samples, data)."""
+    done = {}
+    if results_path and os.path.exists(results_path):
+        with open(results_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue    #Last line of an interrupted write
+                done[(json.dumps(record["params"], sort_keys=True), record["n_samples"], record.get("data"))] = record
+    return done
+
+def _append_search_result(results_path, record):
+    with open(results_path, 'a') as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def successive_halving_search(model_name, X, y, search_space=None, mode='random', n_candidates=27, n_grid=3,
+                              factor=3, min_samples=None, n_splits=3, scoring='balanced_accuracy', n_jobs=None,
+                              random_state=0, results_path=None, refit=True, callback=None, work_dir=None,
+                              stop_requested=None):
+    """Search hyperparameters of an ai_backend model with successive halving.
+
+    All candidates are first cross-validated on a small subset of the rows. Only the best 1/factor of them
+    are promoted to the next rung, which uses factor times more rows, until the last rung uses all rows.
+    Candidate folds run in parallel on a process pool with the training matrix shared by memory-mapping.
+    Every evaluated (candidate, rung) is appended to results_path so an interrupted search resumes where it stopped.
+    Results are tagged with a fingerprint of X and y, so a search on changed data starts over.
+
+    Parameters:
+    model_name (str): Supervised model name as used in MLPageWidget.hyperparam_config.
+    X (array-like): Feature matrix of shape (n_samples, n_features), may be a memmap.
+    y (array-like): Labels.
+    search_space (dict, list or None): Search space, defaults to SEARCH_SPACES[model_name].
+    mode (str): 'grid' or 'random', see make_candidates.
+    n_candidates (int): Number of random candidates.
+    n_grid (int): Number of grid points per range in grid mode.
+    factor (int): Reduction factor between rungs.
+    min_samples (int or None): Rows used by the first rung, derived from factor and the number of candidates when None.
+    n_splits (int): Number of cross-validation folds per evaluation.
+    scoring (str): Metric from score_model used to rank candidates.
+    n_jobs (int or None): Number of worker processes.
+    random_state (int): Seed for sampling candidates and rows.
+    results_path (str or None): JSON lines file the results are persisted to (e.g. in the project's models/ folder).
+    refit (bool): Train the best candidate on all rows.
+    callback (function or None): Called with each candidate result as soon as it finishes.
+    work_dir (str or None): Directory for the shared training matrix.
+    stop_requested (function or None): Polled while waiting, the search stops once it returns True and a
+        later call with the same results_path resumes it.
+
+    Returns:
+    dict: "model" (model_name), "best_params", "best_score", "history" (every evaluation) and "estimator"
+        (None if refit is False).
+
+    Raises:
+    InterruptedError: If stop_requested stopped the search.
+    """
+    if not is_supervised(model_name):
+        raise ValueError(f"Hyperparameter search needs a supervised model, got {model_name}")
+    search_space = search_space or SEARCH_SPACES[model_name]
+    candidates = make_candidates(search_space, mode, n_candidates, n_grid, random_state)
+    n_samples = len(X)
+    n_rungs = max(1, math.ceil(math.log(len(candidates), factor)))
+    if min_samples is None:
+        min_samples = max(n_splits * len(np.unique(y)) * 4, n_samples // factor ** (n_rungs - 1))
+    # Rows are shuffled once so the subset of each rung contains the subset of the previous one
+    order = np.random.default_rng(random_state).permutation(n_samples)
+    done = _load_search_results(results_path)
+    data = data_fingerprint(X, y)
+    history = []
+
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        X_path = share_array(X, tmp_dir, "X")
+        y_path = share_array(y, tmp_dir, "y")
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            survivors = list(range(len(candidates)))
+            for rung in range(n_rungs):
+                rung_samples = n_samples if rung == n_rungs - 1 else min(n_samples, min_samples * factor ** rung)
+                subset = np.sort(order[:rung_samples])
+                splits = make_splits(rung_samples, np.asarray(y)[subset], None, n_splits, random_state)
+                rung_results, pending = {}, {}
+                for index in survivors:
+                    key = (json.dumps(candidates[index], sort_keys=True), rung_samples, data)
+                    if key in done:
+                        rung_results[index] = done[key]
+                        continue
+                    config = {"model": model_name, "params": candidates[index]}
+                    pending[index] = [executor.submit(_run_fold, index, config, X_path, y_path, subset[train], subset[test], fold)
+                                      for fold, (train, test) in enumerate(splits)]
+                futures = {future: index for index, fold_futures in pending.items() for future in fold_futures}
+                folds = {index: [] for index in pending}
+                for future in completed_until_stopped(futures, stop_requested):
+                    index = futures[future]
+                    folds[index].append(future.result())
+                    if len(folds[index]) < len(splits):
+                        continue
+                    errors = [fold["error"] for fold in folds[index] if fold["error"] is not None]
+                    record = {
+                        "rung": rung,
+                        "n_samples": rung_samples,
+                        "data": data,
+                        "params": candidates[index],
+                        "score": None if errors else float(np.mean([fold["metrics"][scoring] for fold in folds[index]])),
+                        "fit_time": float(sum(fold.get("fit_time", 0.0) for fold in folds[index])),
+                        "error": errors[0] if errors else None
+                    }
+                    if results_path:
+                        _append_search_result(results_path, record)
+                    rung_results[index] = record
+                    if callback is not None:
+                        callback({**record, "n_rungs": n_rungs, "n_candidates": len(survivors)})
+                history.extend(rung_results[index] for index in survivors)
+                ranked = sorted((index for index in survivors if rung_results[index]["score"] is not None),
+                                key=lambda index: rung_results[index]["score"], reverse=True)
+                if not ranked:
+                    raise RuntimeError(f"Every candidate failed, first error: {rung_results[survivors[0]]['error']}")
+                if rung < n_rungs - 1:
+                    survivors = ranked[:max(1, math.ceil(len(survivors) / factor))]
+
+            best = ranked[0]
+            result = {"model": model_name, "best_params": candidates[best], "best_score": rung_results[best]["score"], "history": history,
+                      "estimator": None}
+            if refit:
+                config = {"model": model_name, "params": candidates[best]}
+                result["estimator"] = executor.submit(_run_fold, best, config, X_path, y_path, None, None, None).result().get("estimator")
+    return result
+
+### Warm-start retraining ###
+
+def warm_start_retrain(model, X, y=None, X_new=None, y_new=None, n_new_estimators=None, batch_size=10000):
+    """Update a trained model with new sessions instead of training it again from scratch.
+
+    - Random forests and gradient boosting keep their trees and only grow n_new_estimators more
+      (warm_start), fitted on all of X.
+    - Models with partial_fit (SGD classifiers, mini-batch K-means, StreamingGaussianMixture) only read X_new.
+    - KMeans and GaussianMixture restart from their previous centres/components, so EM converges in a few iterations.
+    - Any other model (LDA, kernel SVM...) is refitted on all of X.
+
+    The given model is not modified, the updated model is a copy.
+
+    Parameters:
+    model (object): The trained model.
+    X (array-like): Features of all sessions (old and new), may be a memmap.
+    y (array-like or None): Labels of all sessions.
+    X_new (array-like or None): Features of the new sessions only, defaults to X.
+    y_new (array-like or None): Labels of the new sessions only, defaults to y. Required with X_new when y is given.
+    n_new_estimators (int or None): Trees/boosting stages to add, defaults to a quarter of the current number.
+    batch_size (int): Batch size for partial_fit models.
+
+    Returns:
+    tuple: (model, strategy) where strategy is 'warm_start', 'partial_fit' or 'refit'.
+
+    Raises:
+    ValueError: If X_new is given with y but without y_new.
+    """
+    if X_new is None:
+        X_new, y_new = X, y
+    elif y is not None and y_new is None:
+        # y labels all sessions, nothing tells which of its rows belong to X_new
+        raise ValueError("y_new is needed to update a model trained with labels on X_new")
+    elif y_new is not None and len(y_new) != len(X_new):
+        raise ValueError(f"X_new has {len(X_new)} rows but y_new has {len(y_new)} labels")
+    model = copy.deepcopy(model)
+    params = model.get_params() if hasattr(model, 'get_params') else {}
+
+    if hasattr(model, 'partial_fit'):
+        if y_new is None:
+            return partial_fit_batches(model, X_new, batch_size), 'partial_fit'
+        y_new = np.asarray(y_new)
+        for start in range(0, len(X_new), batch_size):
+            model.partial_fit(np.asarray(X_new[start:start + batch_size], dtype=np.float64), y_new[start:start + batch_size])
+        return model, 'partial_fit'
+
+    if 'warm_start' in params and ('n_estimators' in params or 'max_iter' in params) \
+            and not isinstance(model, GaussianMixture):
+        # HistGradientBoosting counts its stages with max_iter, the other ensembles with n_estimators
+        size_param = 'n_estimators' if 'n_estimators' in params else 'max_iter'
+        size = getattr(model, 'n_iter_', params[size_param]) if size_param == 'max_iter' else params[size_param]
+        n_new_estimators = n_new_estimators or max(1, size // 4)
+        model.set_params(warm_start=True, **{size_param: size + n_new_estimators})
+        if size_param == 'max_iter' and params.get('early_stopping') in ('auto', True):
+            # Early stopping would otherwise hold out a new validation split and may stop before adding stages
+            model.set_params(early_stopping=False)
+        model.fit(np.asarray(X), np.asarray(y))
+        return model, 'warm_start'
+
+    if isinstance(model, GaussianMixture):
+        model.set_params(warm_start=True)
+        model.fit(np.asarray(X))
+        return model, 'warm_start'
+
+    if isinstance(model, KMeans):
+        model.set_params(init=model.cluster_centers_, n_init=1)
+        model.fit(np.asarray(X))
+        return model, 'warm_start'
+
+    model = clone(model)
+    model.fit(np.asarray(X)) if y is None else model.fit(np.asarray(X), np.asarray(y))
+    return model, 'refit'
+
+def retrain_with_new_sessions(models_dir, model_name, X, y=None, X_new=None, y_new=None, version=None, **kwargs):
+    """Load the saved model, update it with new sessions and save it as the next version.
+
+    Parameters:
+    models_dir (str): The project's models/ folder.
+    model_name (str): Name of the model, as used by MLPageWidget.
+    X, y, X_new, y_new: See warm_start_retrain. FeatureStore.get_or_compute_sessions gives X and the new sessions.
+    version (int or None): Version to start from, the latest when None.
+    **kwargs: Passed to warm_start_retrain.
+
+    Returns:
+    dict: "model", "version", "path", "strategy", "fit_time" and "metrics" on the new sessions.
+
+    Raises:
+    ValueError: If X_new is given with y but without y_new.
+    """
+    previous, previous_metadata = load_model_version(models_dir, model_name, version)
+    start = time.perf_counter()
+    model, strategy = warm_start_retrain(previous, X, y, X_new, y_new, **kwargs)
+    fit_time = time.perf_counter() - start
+    X_eval, y_eval = (X, y) if X_new is None else (X_new, y_new)
+    metrics_new = score_model(model, np.asarray(X_eval), None if y_eval is None else np.asarray(y_eval))
+    new_version, path = save_model_version(models_dir, model_name, model, {
+        "parent_version": previous_metadata.get("version"),
+        "strategy": strategy,
+        "fit_time": fit_time,
+        "n_samples": len(X),
+        "n_new_samples": len(X if X_new is None else X_new),
+        "metrics": metrics_new
+    }, X=X)
+    return {"model": model, "version": new_version, "path": path, "strategy": strategy,
+            "fit_time": fit_time, "metrics": metrics_new}
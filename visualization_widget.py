@@ -6,12 +6,17 @@ from PyQt5.QtCore import pyqtSignal
 from matplotlib.backends.backend_qt5agg import FigureCanvas
 from matplotlib.figure import Figure
 import pyqtgraph.opengl as gl   #Added for 3D rendering
+import numpy as np
+
+#Import custom functions
+from Backend.tfr_backend import tfr_morlet
 
 class VisualizationPageWidget(QWidget):
     plotRequested = pyqtSignal(str, dict)  # Signal for plot requests (type, parameters)
 
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.raw = None  # MNE Raw object shown on the EEG tab
         main_layout = QVBoxLayout(self)
         scroll_area = QScrollArea()
         scroll_widget = QWidget()
@@ -182,8 +187,46 @@ class VisualizationPageWidget(QWidget):
             "freq_high": float(self.freq_high.text()) if self.freq_high.text() else None
         }
         self.plotRequested.emit("eeg", params)
+        if params["plot_type"] == "Spectrogram" and self.raw is not None:
+            self.plot_spectrogram(params)
         self.status_label.setText(f"Displaying {params['plot_type']}")
 
+    def set_raw_data(self, raw):
+        """Set the MNE Raw object to visualize and list its channels."""
+        self.raw = raw
+        self.channel_combo.clear()
+        if self.raw is not None:
+            self.channel_combo.addItems(self.raw.ch_names)
+            self.status_label.setText(f"Loaded data with {len(self.raw.ch_names)} channels")
+
+    def plot_spectrogram(self, params, n_freqs=40, max_columns=1000):
+        """Plot a Morlet spectrogram of the selected channel and time window on the EEG canvas."""
+        sfreq = self.raw.info['sfreq']
+        start = int(params["time_start"] * sfreq)
+        stop = min(int(params["time_end"] * sfreq), self.raw.n_times)
+        if stop <= start:
+            self.status_label.setText("Error: Invalid time window")
+            return
+        data = self.raw.get_data(picks=[params["channels"]], start=start, stop=stop)
+        freq_low = params["freq_low"] or 1.0
+        freq_high = params["freq_high"] or sfreq / 2.5
+        freqs = np.geomspace(freq_low, freq_high, n_freqs)
+        # Only keep about as many time points as the canvas can show
+        decim = max(1, (stop - start) // max_columns)
+        power = tfr_morlet(data, sfreq, freqs, n_cycles=np.maximum(freqs / 2.0, 3.0), decim=decim)[0, 0]
+
+        self.eeg_figure.clear()
+        ax = self.eeg_figure.add_subplot(111)
+        times = params["time_start"] + np.arange(power.shape[1]) * decim / sfreq
+        mesh = ax.pcolormesh(times, freqs, 10 * np.log10(power + np.finfo(power.dtype).tiny), shading='auto')
+        ax.set_yscale('log')
+        ax.set_xlabel('Time (s)')
+        ax.set_ylabel('Frequency (Hz)')
+        ax.set_title(f"Spectrogram: {params['channels']}")
+        self.eeg_figure.colorbar(mesh, ax=ax, label='Power (dB)')
+        self.eeg_figure.tight_layout()
+        self.eeg_canvas.draw()
+
     def update_model_plot(self):
         params = {
             "vis_type": self.vis_type_combo.currentText(),